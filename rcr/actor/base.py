@@ -2,43 +2,90 @@
 import logging
 import time
 from abc import ABCMeta, abstractmethod
-from queue import Empty, Queue
-from threading import Thread
-from typing import Dict, Union
+from threading import Thread, get_ident
+from typing import Deque, NamedTuple, Optional
+
+from rcr import config
+from rcr.type import MailboxPolicy
+
+from .mailbox import SHUTDOWN, Mailbox
 
 
 class Base(metaclass=ABCMeta):
-    """Base actor class."""
+    """Base actor class.
+
+    Its mailbox holds up to `config.ACTOR_MAILBOX_SIZE` messages. What happens
+    to a message which finds it full is `mailbox_policy`, or
+    `config.ACTOR_MAILBOX_POLICY` if an actor doesn't choose one.
+    """
 
-    def __init__(self, manager):
+    # Full mailbox policy of the actor, None uses the configured one.
+    mailbox_policy: Optional[MailboxPolicy] = None
+
+    def __init__(self, manager, name: Optional[str] = None):
         """Python Built-in method.
 
         Args:
             manager (Manager): manager instance.
+            name (Optional[str]): actor name in metrics and traces. Defaults to
+                None (the class name in lower case).
         """
         self.manager = manager
 
-        self._shutdown = False
-        self.inbox = Queue()
+        self.inbox = self._new_mailbox(
+            config.ACTOR_MAILBOX_SIZE, self.mailbox_policy or config.ACTOR_MAILBOX_POLICY
+        )
         self._start_thread = None
 
         self._log = logging.getLogger("actor")
 
+        # Metrics.
+        self.name = name or self.__class__.__name__.lower()
+        self._metrics = manager._metrics
+        self._metrics.gauge(
+            "rcr_actor_mailbox_depth", "Messages waiting in an actor's mailbox.", ("actor",)
+        ).labels(self.name, fn=self.inbox.qsize)
+        self._processed = self._metrics.counter(
+            "rcr_actor_messages_total", "Messages taken by an actor.", ("actor",)
+        ).labels(self.name)
+        self._metrics.counter(
+            "rcr_actor_mailbox_dropped_total",
+            "Messages dropped or rejected by a full actor mailbox.",
+            ("actor",),
+        ).labels(self.name, fn=lambda: self.inbox.dropped)
+        self._trace = manager._tracer.watch(self.name, self.inbox)
+
+    def _new_mailbox(self, maxsize: int, policy: MailboxPolicy) -> Mailbox:
+        """Create the actor's mailbox.
+
+        Args:
+            maxsize (int): maximum number of pending messages, 0 is unbounded.
+            policy (MailboxPolicy): what to do when it's full.
+
+        Returns:
+            Mailbox: the mailbox.
+        """
+        return Mailbox(maxsize=maxsize, policy=policy)
+
     def start(self):
         """Start running the actor."""
         self._start_thread = Thread(target=self.receiver)
         self._start_thread.start()
 
     def shutdown(self):
-        """Triggers the shutdown flag."""
-        self._shutdown = True
+        """Put the shutdown sentinel in the inbox.
+
+        Note:
+            Messages which are already in the inbox get processed first.
+        """
+        self.inbox.close()
 
     @abstractmethod
-    def process(self, msg: Dict[str, Union[str, int]]):
+    def process(self, msg: NamedTuple):
         """Message format logic.
 
         Args:
-            msg (Dict[str, Union[str, int]]): message.
+            msg (NamedTuple): message, one of the `rcr.actor.envelope` types.
 
         Note:
             It can put a message to other actors.
@@ -46,26 +93,59 @@ class Base(metaclass=ABCMeta):
 
     def receiver(self):
         """Receive message and pass it to process."""
-        while not self._shutdown:
-            try:
-                item = self.inbox.get_nowait()
-            except Empty:
-                time.sleep(0.1)
+        self._trace.thread_id = get_ident()
+        while True:
+            batch = self.inbox.get_batch()
+            self._processed.inc(len(batch))
+            stamps = self.inbox.batch_stamps
+            if stamps is not None:
+                if not self._receive_traced(batch, stamps):
+                    return
                 continue
 
-            # Ignore empty messages.
+            for item in batch:
+                # Actor should be stopped.
+                if item is SHUTDOWN:
+                    return
+
+                # Ignore empty messages.
+                if not item:
+                    continue
+
+                # Process a received message.
+                try:
+                    self.process(item)
+                except Exception as e:
+                    self._log.error(
+                        f"Process has failed on {self.__class__.__name__} actor: {e}"
+                    )
+                    raise
+
+    def _receive_traced(self, batch: Deque, stamps: Deque[float]) -> bool:
+        """Process a batch and record the queue wait and processing time of every message.
+
+        Args:
+            batch (Deque): messages.
+            stamps (Deque[float]): their enqueue times.
+
+        Returns:
+            bool: False if the actor should be stopped.
+        """
+        trace = self._trace
+        record = self.manager._tracer.record
+        monotonic = time.monotonic
+        for item, enqueued_at in zip(batch, stamps):
+            if item is SHUTDOWN:
+                return False
             if not item:
                 continue
 
-            # Actor should be stopped.
-            if item == "shutdown":
-                break
-
-            # Process a received message.
+            trace.current = (monotonic(), item)
             try:
                 self.process(item)
             except Exception as e:
-                self._log.error(
-                    f"Process has failed on {self.__class__.__name__} actor: {e}"
-                )
+                self._log.error(f"Process has failed on {self.__class__.__name__} actor: {e}")
                 raise
+            finally:
+                record(trace, enqueued_at, monotonic())
+        return True
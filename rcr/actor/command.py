@@ -1,14 +1,21 @@
 """Command actor implementation."""
-import re
-import urllib.request
-from typing import Any, Dict, Union
+import itertools
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from operator import attrgetter
+from typing import List, Optional, Tuple, Union
 
-from .base import Base
+from rcr import config
+from rcr.exception import IdentityError
+from rcr.rate_limit import RateLimiter
+from rcr.storage import HistoryEntry
+from rcr.type import MailboxPolicy, Opcode
 
-DIRECT_MESSAGE_PATTERN = re.compile("msg (?P<client_id>\\d+) (?P<message>.+)")
-BROADCAST_MESSAGE_PATTERN = re.compile("broadcast (?P<message>.+)")
-URL_MESSAGE_PATTERN = re.compile("url (?P<client_id>\\d+) (?P<url>.+)")
-FIB_MESSAGE_PATTERN = re.compile("fib (?P<client_id>\\d+) (?P<n>\\d+)")
+from .base import Base
+from .envelope import Inbound, Outbound
+from .fair_mailbox import FairMailbox
+from .registry import CLIENT_ID, IDENTITY, NUMBER, NUMBERS, TEXT, TOKEN, CommandRegistry
 
 
 class Command(Base):
@@ -16,178 +23,440 @@ class Command(Base):
 
     This actor is responsible to parse raw text (client text) and
     dispatch it to related actors.
+
+    Commands are looked up by their first word in `commands`. More commands can
+    be added with `Command.commands.register`, without touching `process`.
+
+    Its mailbox serves connections in turn, and cheap commands ahead of the
+    ones registered as expensive, so a client which floods the server with
+    `fib` doesn't hold up the `msg` of everybody else. With
+    `config.CLIENT_RATE_LIMIT` set, a client which sends commands faster than
+    that gets an error reply instead.
+
+    The manager can run several of them, and every connection sends its
+    commands to the same one, see `Manager.command_actor`.
     """
 
-    def _direct_message(self, text: str, sender_id: int) -> Dict[str, Union[str, int]]:
+    commands = CommandRegistry()
+
+    def __init__(self, manager, name: Optional[str] = None):
+        """Python Built-in method.
+
+        Args:
+            manager (Manager): manager instance.
+            name (Optional[str]): actor name in metrics and traces. Defaults to None.
+        """
+        super().__init__(manager, name)
+        self._durations = self._metrics.histogram(
+            "rcr_command_duration_seconds", "Time to handle a command.", ("command",)
+        )
+        self._invalid = self._metrics.counter(
+            "rcr_invalid_commands_total", "Commands which haven't been understood."
+        )
+        self._limiter = (
+            RateLimiter(config.CLIENT_RATE_LIMIT, config.CLIENT_RATE_BURST)
+            if config.CLIENT_RATE_LIMIT
+            else None
+        )
+        self._rate_limited = self._metrics.counter(
+            "rcr_rate_limited_commands_total", "Commands refused by the client rate limit."
+        )
+
+    def _new_mailbox(self, maxsize: int, policy: MailboxPolicy) -> FairMailbox:
+        """Create a mailbox which queues commands by connection.
+
+        Args:
+            maxsize (int): maximum number of pending commands, 0 is unbounded.
+            policy (MailboxPolicy): what to do when it's full.
+
+        Returns:
+            FairMailbox: the mailbox.
+        """
+        return FairMailbox(
+            attrgetter("conn"),
+            lambda data: self.commands.is_expensive(data.text),
+            maxsize=maxsize,
+            policy=policy,
+            key_high_water=config.CLIENT_PENDING_COMMANDS,
+        )
+
+    @commands.register(
+        "msg",
+        ("client_id", CLIENT_ID),
+        ("message", TEXT),
+        usage="invalid format to send a message!",
+        opcode=Opcode.MSG,
+    )
+    def _direct_message(
+        self, sender_id: int, client_id: int, message: str
+    ) -> Outbound:
         """Direct message handler.
 
         Args:
-            text (str): received direct text.
             sender_id (int): the client ID who sent the message.
+            client_id (int): the client ID who receives the message.
+            message (str): message text.
 
         Returns:
-            Dict[str, Union[str, int]]: genereted response message.
-
-        """
-        match = DIRECT_MESSAGE_PATTERN.match(text)
-        if match:
-            match_groups = match.groupdict()
-            return {
-                "client_id": int(match_groups["client_id"]),
-                "text": match_groups["message"],
-                "sender_id": sender_id,
-            }
-        return {
-            "client_id": sender_id,
-            "text": "invalid format to send a message!",
-        }
-
-    def _clients_list(self, sender_id: int) -> Dict[str, Union[str, int]]:
+            Outbound: generated response message.
+        """
+        return Outbound(client_id, message, sender_id)
+
+    @commands.register(
+        "tell",
+        ("identity", IDENTITY),
+        ("message", TEXT),
+        usage="invalid format to send a message!",
+    )
+    def _identity_message(self, sender_id: int, identity: str, message: str) -> Outbound:
+        """Identity message handler.
+
+        The message goes to the client which holds the identity, or it's stored
+        for the identity when the client is offline, even if its client ID has
+        been given to somebody else.
+
+        Args:
+            sender_id (int): the client ID who sent the message.
+            identity (str): the identity who receives the message.
+            message (str): message text.
+
+        Returns:
+            Outbound: generated response message.
+        """
+        store = self.manager._offline
+        if store is None:
+            return Outbound(sender_id, "offline messages are disabled!")
+        client_id = store.client_of(identity)
+        if client_id is not None and self.manager._contact.get(client_id) is not None:
+            return Outbound(client_id, message, sender_id)
+        if not store.known(identity):
+            return Outbound(sender_id, "identity {} is unknown!".format(identity))
+        try:
+            store.put(identity, sender_id, message)
+        except ValueError as e:
+            return Outbound(sender_id, "message can't be stored: {}".format(e))
+        return Outbound(sender_id, "{} is offline, the message has been stored".format(identity))
+
+    @commands.register("w", usage="invalid message!", opcode=Opcode.W)
+    def _clients_list(self, sender_id: int) -> Outbound:
         """Client list message handler.
 
         Args:
             sender_id (int): the client ID who sent the message.
 
         Returns:
-            Dict[str, Union[str, int]]: genereted response message.
+            Outbound: generated response message.
+        """
+        return Outbound(
+            sender_id,
+            "\r\n".join(
+                map(
+                    str,
+                    self.manager._contact.snapshot() + self.manager._router.remote_snapshot(),
+                )
+            ),
+        )
+
+    @commands.register("stats", usage="invalid message!")
+    def _stats(self, sender_id: int) -> Outbound:
+        """Server metrics message handler.
+
+        Args:
+            sender_id (int): the client ID who sent the message.
+
+        Returns:
+            Outbound: generated response message, a line per metric sample.
         """
-        return {
-            "client_id": sender_id,
-            "text": "\r\n".join(map(str, self.manager._contact.list())),
-        }
+        return Outbound(sender_id, "\r\n".join(self._metrics.summary()))
 
-    def _broadcast_message(
-        self, text: str, sender_id: int
-    ) -> Dict[str, Union[str, int]]:
+    @commands.register(
+        "identify",
+        ("identity", IDENTITY),
+        ("token", TOKEN),
+        usage="invalid format to identify yourself!",
+        expensive=True,
+    )
+    def _identify(
+        self, sender_id: int, identity: str, token: str
+    ) -> Union[Outbound, List[Outbound], None]:
+        """Identity message handler.
+
+        The client claims an identity with its token, and gets the messages
+        which have been stored for it. The first claim sets the token. The
+        token is hashed in the background.
+
+        Args:
+            sender_id (int): the client ID who sent the message.
+            identity (str): a name, which stays the same across connections.
+            token (str): secret of the identity.
+
+        Returns:
+            Union[Outbound, List[Outbound], None]: generated response messages.
+                It's None when the claim runs in the background.
+        """
+        if self.manager._offline is None:
+            return Outbound(sender_id, "offline messages are disabled!")
+        future = self.manager._identify_executor.submit(self._claim, sender_id, identity, token)
+        return self._respond(future, sender_id, sender_id, "identify has failed")
+
+    def _claim(self, sender_id: int, identity: str, token: str) -> List[Outbound]:
+        """Claim an identity for a client, it runs in a background thread.
+
+        Args:
+            sender_id (int): the client ID who sent the message.
+            identity (str): identity.
+            token (str): secret of the identity.
+
+        Returns:
+            List[Outbound]: the reply and the stored messages, or the reason why
+                the identity can't be claimed.
+        """
+        contact = self.manager._contact
+        try:
+            messages = self.manager._offline.claim(
+                sender_id, identity, token, lambda client_id: contact.get(client_id) is not None
+            )
+        except IdentityError as e:
+            return [Outbound(sender_id, str(e))]
+
+        return [
+            Outbound(sender_id, "you are {}, {} stored messages.".format(identity, len(messages)))
+        ] + [
+            Outbound(sender_id, message.text, message.sender_id, stored=True)
+            for message in messages
+        ]
+
+    @commands.register(
+        "history",
+        ("query", NUMBERS),
+        usage="invalid format to read the history!",
+        expensive=True,
+    )
+    def _history(self, sender_id: int, query: Tuple[int, ...]) -> Outbound:
+        """History message handler.
+
+        `history <n>` returns the last n messages the client can see, and
+        `history <client id> <since>` the messages between the client and
+        another one since a Unix time. A client only gets the direct messages
+        of its own connection, not the ones of earlier clients of its ID.
+        Messages are sent as they're read, up to `config.HISTORY_QUERY_LIMIT`.
+
+        Args:
+            sender_id (int): the client ID who sent the message.
+            query (Tuple[int, ...]): a count, or a client ID and a time.
+
+        Returns:
+            Outbound: generated response message, the end of the history.
+        """
+        history = self.manager._history
+        if history is None:
+            return Outbound(sender_id, "history is disabled!")
+        if len(query) == 1:
+            entries = iter(history.recent(sender_id, min(query[0], config.HISTORY_QUERY_LIMIT)))
+        elif len(query) == 2:
+            entries = itertools.islice(
+                history.conversation(sender_id, *query), config.HISTORY_QUERY_LIMIT
+            )
+        else:
+            return Outbound(sender_id, "invalid format to read the history!")
+
+        inbox = self.manager._message_actor.inbox
+        count = 0
+        for entry in entries:
+            inbox.put(Outbound(sender_id, self._history_line(entry)))
+            count += 1
+        return Outbound(sender_id, "end of history, {} messages.".format(count))
+
+    @staticmethod
+    def _history_line(entry: HistoryEntry) -> str:
+        """Format a history message.
+
+        Args:
+            entry (HistoryEntry): message.
+
+        Returns:
+            str: its time, sender, recipient ("all" for a broadcast) and text.
+        """
+        return "{} {} > {}: {}".format(
+            datetime.fromtimestamp(entry.created_at),
+            entry.sender_id,
+            entry.client_id or "all",
+            entry.text,
+        )
+
+    @commands.register(
+        "broadcast",
+        ("message", TEXT),
+        usage="invalid format to broadcast a message!",
+        opcode=Opcode.BROADCAST,
+    )
+    def _broadcast_message(self, sender_id: int, message: str) -> Outbound:
         """Broadcast message handler.
 
         Args:
-            text (str): received broadcast text.
             sender_id (int): the client ID who sent the message.
+            message (str): message text.
 
         Returns:
-            Dict[str, Union[str, int]]: genereted response message.
-        """
-        match = BROADCAST_MESSAGE_PATTERN.match(text)
-        if match:
-            match_groups = match.groupdict()
-            return {
-                "client_id": "",
-                "text": match_groups["message"],
-                "sender_id": sender_id,
-            }
-        return {
-            "client_id": sender_id,
-            "text": "invalid format to broadcast a message!",
-        }
-
-    def _url_message(self, text: str, sender_id: int) -> Dict[str, Union[str, int]]:
+            Outbound: generated response message.
+        """
+        return Outbound(0, message, sender_id)
+
+    @commands.register(
+        "url",
+        ("client_id", CLIENT_ID),
+        ("url", TEXT),
+        usage="invalid message format to send url size!",
+        opcode=Opcode.URL,
+        expensive=True,
+    )
+    def _url_message(
+        self, sender_id: int, client_id: int, url: str
+    ) -> Optional[Outbound]:
         """URL message handler.
 
         Args:
-            text (str): received URL text.
             sender_id (int): the client ID who sent the message.
+            client_id (int): the client ID who receives the page size.
+            url (str): page URL.
 
         Returns:
-            Dict[str, Union[str, int]]: genereted response message.
-        """
-        match = URL_MESSAGE_PATTERN.match(text)
-        if match:
-            match_groups = match.groupdict()
-            try:
-                request = urllib.request.Request(match_groups["url"], method="GET")
-            except Exception as e:
-                return {
-                    "client_id": sender_id,
-                    "text": "request has failed: {}".format(e),
-                }
-            with urllib.request.urlopen(request) as resp:
-                return {
-                    "client_id": int(match_groups["client_id"]),
-                    "text": str(len(resp.read())),
-                    "sender_id": sender_id,
-                }
-        return {
-            "client_id": sender_id,
-            "text": "invalid message format to send url size!",
-        }
+            Optional[Outbound]: generated response message. It's None
+                when the page is fetched in the background.
+        """
+        try:
+            future = self.manager._fetcher.submit(url)
+        except ValueError as e:
+            return Outbound(sender_id, "request has failed: {}".format(e))
+        return self._respond(future, client_id, sender_id, "request has failed")
 
-    @staticmethod
-    def _fib_impl1(n: int) -> int:
-        """Fibonacci calculation - another implementation.
+    def _future_response(
+        self, future: Future, client_id: int, sender_id: int, error: str
+    ) -> Union[Outbound, List[Outbound]]:
+        """Build the response message of a done background task.
+
+        A task which returns messages itself gets them sent as they are.
 
         Args:
-            n (int): nth number of Fibonacci's series.
+            future (Future): a done task.
+            client_id (int): the client ID who receives the result.
+            sender_id (int): the client ID who sent the message.
+            error (str): error message prefix, in case the task has failed.
 
         Returns:
-            int: calculated nth number of the Fibonacci's series.
+            Union[Outbound, List[Outbound]]: generated response messages.
         """
-        first = 0
-        second = 1
-        while n >= 2:
-            second, first = first + second, second
-            n -= 1
-        return second
+        try:
+            result = future.result()
+        except Exception as e:
+            return Outbound(sender_id, "{}: {}".format(error, e))
+        if isinstance(result, (Outbound, list)):
+            return result
+        return Outbound(client_id, str(result), sender_id)
 
-    @staticmethod
-    def _fib(n: int, first: int = 0, second: int = 1) -> int:
-        """Fibonacci calculation.
+    def _reply(self, response: Union[Outbound, List[Outbound], None]):
+        """Send response messages to the Message actor.
 
         Args:
-            n (int): nth number of Fibonacci's series.
-            first (int): first number.
-            second (int): second number.
+            response (Union[Outbound, List[Outbound], None]): a message, several
+                ones in order, or None.
+        """
+        inbox = self.manager._message_actor.inbox
+        if isinstance(response, list):
+            for message in response:
+                inbox.put(message)
+        elif response:
+            inbox.put(response)
+
+    def _respond(
+        self, future: Future, client_id: int, sender_id: int, error: str
+    ) -> Union[Outbound, List[Outbound], None]:
+        """Respond to a command which is handled by a background task.
+
+        Args:
+            future (Future): the task.
+            client_id (int): the client ID who receives the result.
+            sender_id (int): the client ID who sent the message.
+            error (str): error message prefix, in case the task fails.
 
         Returns:
-            int: calculated nth number of the Fibonacci's series.
+            Union[Outbound, List[Outbound], None]: generated response messages if
+                the task is already done, otherwise None and the response is sent to
+                the message actor once it's done.
         """
-        if n < 2:
-            return second
-        return Command._fib(n - 1, second, first + second)
+        if future.done():
+            return self._future_response(future, client_id, sender_id, error)
+        future.add_done_callback(
+            lambda f: self._reply(self._future_response(f, client_id, sender_id, error))
+        )
+        return None
 
-    def _fib_message(self, text: str, sender_id: int) -> Dict[str, Union[str, int]]:
+    @commands.register(
+        "fib",
+        ("client_id", CLIENT_ID),
+        ("n", NUMBER),
+        usage="invalid message format to calculate fibonacci!",
+        opcode=Opcode.FIB,
+        expensive=True,
+    )
+    def _fib_message(
+        self, sender_id: int, client_id: int, n: int
+    ) -> Optional[Outbound]:
         """Fibonacci message handler.
 
         Args:
-            text (str): received fibonacci text.
             sender_id (int): the client ID who sent the message.
+            client_id (int): the client ID who receives the result.
+            n (int): nth number of Fibonacci's series.
 
         Returns:
-            Dict[str, Union[str, int]]: genereted response message.
-        """
-        match = FIB_MESSAGE_PATTERN.match(text)
-        if match:
-            match_groups = match.groupdict()
-            return {
-                "client_id": int(match_groups["client_id"]),
-                "text": str(self._fib(int(match_groups["n"]))),
-                "sender_id": sender_id,
-            }
-        return {
-            "client_id": sender_id,
-            "text": "invalid message format to calculate fibonacci!",
-        }
-
-    def process(self, data: Dict[str, Union[str, Any]]):
+            Optional[Outbound]: generated response message. It's None
+                when the calculation runs in the background.
+        """
+        try:
+            future = self.manager._fibonacci.submit(n)
+        except ValueError as e:
+            return Outbound(sender_id, "invalid fibonacci number: {}".format(e))
+        return self._respond(future, client_id, sender_id, "fibonacci calculation has failed")
+
+    def process(self, data: Inbound):
         """Message format logic.
 
         Args:
-            data (Dict[str, str]): data.
-                schema: {"text": "str", "conn": Any}.
+            data (Inbound): a received command.
         """
-        sender_id = self.manager._contact.get_by_connection(data["conn"])
+        try:
+            sender_id = self.manager._contact.get_by_connection(data.conn)
+        except ValueError:
+            if not data.deferred:
+                # The client's join is still in the Session actor's mailbox, and
+                # it's FIFO, so the message comes back once the client has an ID.
+                self.manager._session_actor.inbox.put(
+                    data._replace(deferred=True), force=True
+                )
+            return
 
-        if data["text"].startswith("msg"):
-            response = self._direct_message(data["text"], sender_id)
-        elif data["text"] == "w":
-            response = self._clients_list(sender_id)
-        elif data["text"].startswith("broadcast"):
-            response = self._broadcast_message(data["text"], sender_id)
-        elif data["text"].startswith("url"):
-            response = self._url_message(data["text"], sender_id)
-        elif data["text"].startswith("fib"):
-            response = self._fib_message(data["text"], sender_id)
+        if self._limiter is not None and not self._limiter.allow(sender_id, time.monotonic()):
+            self._rate_limited.inc()
+            self.manager._message_actor.inbox.put(
+                Outbound(sender_id, "rate limit exceeded, slow down!")
+            )
+            return
+
+        started_at = time.perf_counter()
+        text = data.text
+        if isinstance(text, str):
+            spec, args = self.commands.parse(text)
+        else:
+            spec, args = self.commands.parse_frame(text)
+        if spec is None:
+            self._invalid.inc()
+            response = Outbound(sender_id, "invalid message!")
+        elif args is None:
+            self._invalid.inc()
+            response = Outbound(sender_id, spec.usage)
         else:
-            response = {"client_id": sender_id, "text": "invalid message!"}
+            response = spec.handler(self, sender_id, *args)
+            self._durations.labels(spec.verb).observe(time.perf_counter() - started_at)
 
-        self.manager._message_actor.inbox.put(response)
+        self._reply(response)
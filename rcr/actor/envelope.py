@@ -0,0 +1,55 @@
+"""Actor message envelopes.
+
+Actors pass these immutable tuples to each other instead of dicts. They are
+smaller than dicts, cheap to create, and their fields are checked when they are
+created instead of when a key is missing at the other end.
+"""
+from typing import Any, NamedTuple, Tuple, Union
+
+from rcr.connection.binary import Frame
+
+
+class Join(NamedTuple):
+    """A new client connection, for the Session actor."""
+
+    addr: Tuple[str, int]
+    conn: Any
+
+
+class Leave(NamedTuple):
+    """A closed connection, for the Session actor."""
+
+    conn: Any
+
+
+class Inbound(NamedTuple):
+    """A received command, for the Command actor."""
+
+    conn: Any
+    # A text line or a binary frame.
+    text: Union[str, Frame]
+    # It has been bounced through the Session actor, because it arrived before
+    # its sender's join.
+    deferred: bool = False
+
+
+class Outbound(NamedTuple):
+    """A message to clients, for the Message actor."""
+
+    # Recipient's client ID, 0 means all clients.
+    client_id: int
+    text: str
+    # Sender's client ID, 0 for server replies.
+    sender_id: int = 0
+    # It has come from another worker, which has notified its sender.
+    routed: bool = False
+    # It has been stored while its recipient was offline, its sender has been notified.
+    stored: bool = False
+
+
+class LogEntry(NamedTuple):
+    """A log line, for the Log actor."""
+
+    # debug, info, or error.
+    level: str
+    text: str
@@ -0,0 +1,266 @@
+"""Fair actor mailbox module."""
+from collections import OrderedDict, deque
+from time import monotonic
+from typing import Any, Callable, Deque, Dict, Optional, Set, Tuple
+
+from rcr.type import MailboxPolicy
+
+from .mailbox import SHUTDOWN, Mailbox
+
+# A queued message, its enqueue time (None if it hasn't been stamped) and
+# whether it's expensive.
+_Entry = Tuple[Any, Optional[float], bool]
+
+
+class FairMailbox(Mailbox):
+    """A mailbox which serves its senders in turn.
+
+    Messages are queued per key, e.g. the connection of a command, and batches
+    take one message of every key in round-robin order. So a sender with a
+    long backlog delays the others by one message per round instead of by its
+    whole backlog, and its own messages keep their order.
+
+    Cheap messages skip ahead of expensive ones of other keys: a key waits in
+    the cheap or the expensive ring according to its oldest message, and a
+    batch takes up to `cheap_ratio` turns of the cheap ring for every turn of
+    the expensive one while both are waiting, so expensive ones are slowed
+    down but never starved.
+
+    Besides the mailbox-wide high-water mark, a key is saturated when it has
+    `key_high_water` messages waiting, so a producer can pause only that
+    sender. `on_drain` is called once the mailbox is down to its low-water mark,
+    if it was saturated, and every saturated key is down to half of
+    `key_high_water`.
+    """
+
+    def __init__(
+        self,
+        key: Callable[[Any], Any],
+        is_expensive: Optional[Callable[[Any], bool]] = None,
+        batch_size: int = 64,
+        maxsize: int = 0,
+        policy: MailboxPolicy = MailboxPolicy.BLOCK,
+        on_drain: Optional[Callable[[], None]] = None,
+        key_high_water: int = 0,
+        cheap_ratio: int = 8,
+    ):
+        """Initialize the class.
+
+        Args:
+            key (Callable[[Any], Any]): it returns the sender of a message.
+            is_expensive (Optional[Callable[[Any], bool]]): it returns True for an
+                expensive message. Defaults to None (all of them are cheap).
+            batch_size (int): maximum number of messages returned by `get_batch`.
+                Defaults to 64.
+            maxsize (int): maximum number of pending messages, 0 is unbounded.
+                Defaults to 0.
+            policy (MailboxPolicy): what to do when it's full. Defaults to BLOCK.
+            on_drain (Optional[Callable[[], None]]): called in the consumer thread
+                when a saturated mailbox has drained. Defaults to None.
+            key_high_water (int): pending messages of a key to saturate it, 0
+                disables it. Defaults to 0.
+            cheap_ratio (int): cheap messages taken per expensive one. Defaults to 8.
+        """
+        super().__init__(batch_size, maxsize, policy, on_drain)
+        if key_high_water < 0 or cheap_ratio < 1:
+            raise ValueError("key_high_water can't be negative and cheap_ratio must be positive.")
+
+        self.key = key
+        self.is_expensive = is_expensive
+        self.key_high_water = key_high_water
+        self.cheap_ratio = cheap_ratio
+
+        # Queued entries of every key.
+        self._queues: Dict[Any, Deque[_Entry]] = {}
+        # Cheap and expensive rings of keys in serving order, by their oldest entry.
+        self._rings: Tuple["OrderedDict[Any, None]", ...] = (OrderedDict(), OrderedDict())
+        self._size = 0
+        self._stamping = False
+        self._closing = False
+        self._cheap_streak = 0
+        self._saturated_keys: Set[Any] = set()
+
+    def put(self, item: Any, force: bool = False) -> bool:
+        """Put a message in its sender's queue and wake up the consumer.
+
+        Args:
+            item (Any): message.
+            force (bool): skip the size limit, for messages which mustn't wait
+                or be lost. Defaults to False.
+
+        Returns:
+            bool: False if the message has been rejected.
+        """
+        key = self.key(item)
+        expensive = self.is_expensive is not None and self.is_expensive(item)
+        with self._not_empty:
+            if self.maxsize and not force and self._size >= self.maxsize:
+                if not self._make_room():
+                    return False
+            queue = self._queues.get(key)
+            if queue is None:
+                queue = self._queues[key] = deque()
+                self._rings[expensive][key] = None
+            queue.append((item, monotonic() if self._stamping else None, expensive))
+            self._size += 1
+            self._not_empty.notify()
+        return True
+
+    def _make_room(self) -> bool:
+        """Apply the policy to a full mailbox, with the lock held.
+
+        DROP_OLDEST drops the oldest message of the sender with the most
+        pending messages, rather than the oldest one of anybody.
+
+        Returns:
+            bool: there's room for a new message.
+        """
+        if self.policy is MailboxPolicy.REJECT:
+            self.dropped += 1
+            return False
+        if self.policy is MailboxPolicy.DROP_OLDEST:
+            self.dropped += 1
+            self._take(max(self._queues, key=lambda key: len(self._queues[key])))
+            return True
+        # A closed mailbox isn't consumed anymore, so don't wait for it.
+        self._not_full.wait_for(lambda: self._size < self.maxsize or self._closed)
+        return True
+
+    def _take(self, key: Any) -> _Entry:
+        """Take the oldest entry of a key and move the key to the end of a ring.
+
+        The key goes to the ring of its next entry.
+
+        Args:
+            key (Any): the key.
+
+        Returns:
+            _Entry: the entry.
+        """
+        queue = self._queues[key]
+        entry = queue.popleft()
+        del self._rings[entry[2]][key]
+        if queue:
+            self._rings[queue[0][2]][key] = None
+        else:
+            del self._queues[key]
+        self._size -= 1
+        return entry
+
+    def saturated(self, key: Any = None) -> bool:
+        """Return True if the mailbox or a key's queue is over its high-water mark.
+
+        Args:
+            key (Any): the key of a producer. Defaults to None.
+
+        Returns:
+            bool: the mailbox or the key is saturated or not.
+        """
+        key_saturated = self.key_high_water and self._pending(key) >= self.key_high_water
+        if not key_saturated and (not self.maxsize or self._size < self.high_water):
+            return False
+        with self._not_empty:
+            saturated = False
+            if key_saturated and self._pending(key) >= self.key_high_water:
+                self._saturated_keys.add(key)
+                saturated = True
+            if self.maxsize and self._size >= self.high_water:
+                self._drain_wanted = saturated = True
+        return saturated
+
+    def _pending(self, key: Any) -> int:
+        """Return number of pending messages of a key."""
+        queue = self._queues.get(key)
+        return len(queue) if queue else 0
+
+    def set_stamping(self, enabled: bool):
+        """Start or stop recording enqueue times.
+
+        Args:
+            enabled (bool): record them or not. Pending messages are stamped
+                with the current time when it's started.
+        """
+        with self._not_empty:
+            if enabled and not self._stamping:
+                now = monotonic()
+                for key, queue in self._queues.items():
+                    self._queues[key] = deque(
+                        (item, now, expensive) for item, _, expensive in queue
+                    )
+            self._stamping = enabled
+
+    def close(self):
+        """Ask the consumer to stop once all queues are empty."""
+        with self._not_empty:
+            self._closing = self._closed = True
+            self._not_empty.notify()
+            self._not_full.notify_all()
+
+    def get_batch(self, timeout: Optional[float] = None) -> Deque[Any]:
+        """Wait for messages and return a batch of them in fair order.
+
+        Args:
+            timeout (Optional[float]): maximum seconds to wait. Defaults to None (forever).
+
+        Returns:
+            Deque[Any]: received messages. It's empty if the timeout expires.
+        """
+        with self._not_empty:
+            if not self._not_empty.wait_for(lambda: self._size or self._closing, timeout):
+                self.batch_stamps = None
+                return deque()
+
+            cheap, expensive = self._rings
+            batch: Deque[Any] = deque()
+            stamps: Optional[Deque[float]] = deque() if self._stamping else None
+            while self._size and len(batch) < self.batch_size:
+                if cheap and (self._cheap_streak < self.cheap_ratio or not expensive):
+                    ring = cheap
+                    self._cheap_streak += 1
+                else:
+                    ring = expensive
+                    self._cheap_streak = 0
+                item, stamp, _ = self._take(next(iter(ring)))
+                batch.append(item)
+                if stamps is not None:
+                    stamps.append(stamp or monotonic())
+            if self._closing and not self._size and len(batch) < self.batch_size:
+                self._closing = False
+                batch.append(SHUTDOWN)
+                if stamps is not None:
+                    stamps.append(monotonic())
+            self.batch_stamps = stamps
+
+            if not (self.maxsize or self.key_high_water):
+                return batch
+            self._not_full.notify_all()
+            drained = (
+                (self._drain_wanted or self._saturated_keys)
+                and (not self._drain_wanted or self._size <= self.low_water)
+                and all(
+                    self._pending(key) <= self.key_high_water // 2
+                    for key in self._saturated_keys
+                )
+            )
+            if drained:
+                self._drain_wanted = False
+                self._saturated_keys.clear()
+        if drained and self.on_drain:
+            self.on_drain()
+        return batch
+
+    def qsize(self) -> int:
+        """Return number of pending messages.
+
+        Returns:
+            int: number of pending messages.
+        """
+        return self._size
+
+    def empty(self) -> bool:
+        """Return True if there is no pending message.
+
+        Returns:
+            bool: the mailbox is empty or not.
+        """
+        return not self._size
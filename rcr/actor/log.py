@@ -1,7 +1,13 @@
 """Log actor implementation."""
-from typing import Dict, Union
+import logging
+
+from rcr.type import MailboxPolicy
 
 from .base import Base
+from .envelope import LogEntry
+
+# Log levels by their name in log entries.
+LEVELS = {"error": logging.ERROR, "info": logging.INFO, "debug": logging.DEBUG}
 
 
 class Log(Base):
@@ -9,26 +15,24 @@ class Log(Base):
 
     This actor is responsible to log whatever it receives
     based on defined log type.
+
+    Logging is best effort, so a full mailbox drops its oldest entries
+    instead of holding up other actors.
     """
 
-    def process(self, msg: Dict[str, Union[str, int]]):
+    mailbox_policy = MailboxPolicy.DROP_OLDEST
+
+    def process(self, msg: LogEntry):
         """Message format logic.
 
         Args:
-            msg (Dict[str, Union[str, int]]): message.
-                schema: {"type": "str", "text": "str"}.
-                type: debug, info, or error.
+            msg (LogEntry): log line.
 
         Raises:
             TypeError: when log type is invalid.
         """
-        log_type = msg["type"]
+        log_type = msg.level
         if not isinstance(log_type, str):
             raise TypeError(f"invalid log type. str expected but got {type(log_type)}")
 
-        log_method = {
-            "error": self._log.error,
-            "debug": self._log.debug,
-            "info": self._log.info,
-        }[log_type]
-        log_method(msg["text"])
+        self._log.log(LEVELS[log_type], msg.text)
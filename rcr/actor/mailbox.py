@@ -0,0 +1,222 @@
+"""Actor mailbox module."""
+from collections import deque
+from threading import Condition, Lock
+from time import monotonic
+from typing import Any, Callable, Deque, Optional
+
+from rcr.type import MailboxPolicy
+
+
+class _Shutdown:
+    """Shutdown sentinel type."""
+
+    def __repr__(self) -> str:
+        return "SHUTDOWN"
+
+
+# It's put in a mailbox to tell its actor to stop.
+SHUTDOWN = _Shutdown()
+
+
+class Mailbox:
+    """Actor mailbox class.
+
+    It's a FIFO queue which wakes up its consumer as soon as a message arrives
+    and hands over all pending messages in batches, so an actor takes the lock
+    once per batch instead of once per message.
+
+    A mailbox with a `maxsize` applies its `policy` to messages which find it
+    full. Producers which can stop producing, like the socket server, ask
+    `saturated` instead: it's True over three quarters of `maxsize`, and then
+    `on_drain` is called by the consumer once the mailbox is down to a quarter.
+
+    With stamping on, it records the enqueue time of every message too, and
+    `batch_stamps` holds the times of the last batch.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 64,
+        maxsize: int = 0,
+        policy: MailboxPolicy = MailboxPolicy.BLOCK,
+        on_drain: Optional[Callable[[], None]] = None,
+    ):
+        """Initialize the class.
+
+        Args:
+            batch_size (int): maximum number of messages returned by `get_batch`.
+                Defaults to 64.
+            maxsize (int): maximum number of pending messages, 0 is unbounded.
+                Defaults to 0.
+            policy (MailboxPolicy): what to do when it's full. Defaults to BLOCK.
+            on_drain (Optional[Callable[[], None]]): called in the consumer thread
+                when a saturated mailbox has drained. Defaults to None.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be a positive number.")
+        if maxsize < 0:
+            raise ValueError("maxsize can't be negative.")
+
+        self.batch_size = batch_size
+        self.maxsize = maxsize
+        self.policy = policy
+        self.on_drain = on_drain
+        self.high_water = max(1, maxsize * 3 // 4)
+        self.low_water = maxsize // 4
+        # Messages dropped or rejected for room.
+        self.dropped = 0
+
+        self._items: Deque[Any] = deque()
+        lock = Lock()
+        self._not_empty = Condition(lock)
+        self._not_full = Condition(lock)
+        self._closed = False
+        # A producer has found it saturated and waits for `on_drain`.
+        self._drain_wanted = False
+
+        # Enqueue times, in step with items. It's None while stamping is off.
+        self._stamps: Optional[Deque[float]] = None
+        # Enqueue times of the last batch, None if it hasn't been stamped.
+        self.batch_stamps: Optional[Deque[float]] = None
+
+    def put(self, item: Any, force: bool = False) -> bool:
+        """Put a message in the mailbox and wake up the consumer.
+
+        Args:
+            item (Any): message.
+            force (bool): skip the size limit, for messages which mustn't wait
+                or be lost. Defaults to False.
+
+        Returns:
+            bool: False if the message has been rejected.
+        """
+        with self._not_empty:
+            if self.maxsize and not force and len(self._items) >= self.maxsize:
+                if not self._make_room():
+                    return False
+            self._items.append(item)
+            if self._stamps is not None:
+                self._stamps.append(monotonic())
+            self._not_empty.notify()
+        return True
+
+    def _make_room(self) -> bool:
+        """Apply the policy to a full mailbox, with the lock held.
+
+        Returns:
+            bool: there's room for a new message.
+        """
+        if self.policy is MailboxPolicy.REJECT:
+            self.dropped += 1
+            return False
+        if self.policy is MailboxPolicy.DROP_OLDEST:
+            self.dropped += 1
+            self._items.popleft()
+            if self._stamps is not None:
+                self._stamps.popleft()
+            return True
+        # A closed mailbox isn't consumed anymore, so don't wait for it.
+        self._not_full.wait_for(
+            lambda: len(self._items) < self.maxsize or self._closed
+        )
+        return True
+
+    def saturated(self, key: Any = None) -> bool:
+        """Return True if it's over the high-water mark.
+
+        A producer which gets True should stop producing until `on_drain` is
+        called.
+
+        Args:
+            key (Any): the key of a producer, for mailboxes which queue messages
+                by key. Defaults to None.
+
+        Returns:
+            bool: the mailbox is saturated or not.
+        """
+        if not self.maxsize or len(self._items) < self.high_water:
+            return False
+        with self._not_empty:
+            # The consumer checks the flag with the lock held, so it can't miss it.
+            if len(self._items) < self.high_water:
+                return False
+            self._drain_wanted = True
+        return True
+
+    def set_stamping(self, enabled: bool):
+        """Start or stop recording enqueue times.
+
+        Args:
+            enabled (bool): record them or not. Pending messages are stamped
+                with the current time when it's started.
+        """
+        with self._not_empty:
+            if not enabled:
+                self._stamps = None
+            elif self._stamps is None:
+                self._stamps = deque([monotonic()] * len(self._items))
+
+    def close(self):
+        """Ask the consumer to stop once it reaches the current end of the mailbox."""
+        self.put(SHUTDOWN, force=True)
+        with self._not_full:
+            self._closed = True
+            self._not_full.notify_all()
+
+    def get_batch(self, timeout: Optional[float] = None) -> Deque[Any]:
+        """Wait for messages and return a batch of them.
+
+        Args:
+            timeout (Optional[float]): maximum seconds to wait. Defaults to None (forever).
+
+        Returns:
+            Deque[Any]: received messages in FIFO order. It's empty if the timeout expires.
+        """
+        with self._not_empty:
+            if not self._items and not self._not_empty.wait_for(
+                lambda: self._items, timeout
+            ):
+                self.batch_stamps = None
+                return deque()
+
+            stamps = self._stamps
+            if len(self._items) <= self.batch_size:
+                # Hand over the whole queue without copying it.
+                batch, self._items = self._items, deque()
+                if stamps is not None:
+                    self._stamps = deque()
+                self.batch_stamps = stamps
+            else:
+                if stamps is not None:
+                    self.batch_stamps = deque(
+                        stamps.popleft() for _ in range(self.batch_size)
+                    )
+                else:
+                    self.batch_stamps = None
+                batch = deque(self._items.popleft() for _ in range(self.batch_size))
+
+            if not self.maxsize:
+                return batch
+            self._not_full.notify_all()
+            drained = self._drain_wanted and len(self._items) <= self.low_water
+            if drained:
+                self._drain_wanted = False
+        if drained and self.on_drain:
+            self.on_drain()
+        return batch
+
+    def qsize(self) -> int:
+        """Return number of pending messages.
+
+        Returns:
+            int: number of pending messages.
+        """
+        return len(self._items)
+
+    def empty(self) -> bool:
+        """Return True if there is no pending message.
+
+        Returns:
+            bool: the mailbox is empty or not.
+        """
+        return not self._items
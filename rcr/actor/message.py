@@ -1,8 +1,13 @@
 """Message actor implementation."""
 from datetime import datetime
-from typing import Dict, Union
+from typing import Any, Optional, Tuple
+
+from rcr.connection.binary import encode_frame
+from rcr.type import MailboxPolicy, Opcode
 
 from .base import Base
+from .envelope import Outbound
+from .fair_mailbox import FairMailbox
 
 
 class Message(Base):
@@ -10,40 +15,174 @@ class Message(Base):
     """Message actor class implementation.
 
     This actor is responsible to send a message to a connected client.
+
+    Its mailbox serves senders in turn, so the replies of a client which floods
+    the server don't hold up the messages of everybody else.
+
+    A direct message to a local client which has left is kept in the offline
+    store, if the client had an identity. Messages of clients, including the
+    ones from other workers, are appended to the chat history when it's on.
     """
 
-    def process(self, data: Dict[str, Union[str, int]]):
-        """Message format logic.
+    def _new_mailbox(self, maxsize: int, policy: MailboxPolicy) -> FairMailbox:
+        """Create a mailbox which queues messages by sender.
+
+        Args:
+            maxsize (int): maximum number of pending messages, 0 is unbounded.
+            policy (MailboxPolicy): what to do when it's full.
+
+        Returns:
+            FairMailbox: the mailbox.
+        """
+        # Server replies are queued with the other messages of their recipient.
+        return FairMailbox(
+            lambda data: data.sender_id or data.client_id, maxsize=maxsize, policy=policy
+        )
+
+    @staticmethod
+    def _format(data: Outbound) -> str:
+        """Format a message as it's sent to clients.
+
+        Args:
+            data (Outbound): message.
+
+        Returns:
+            str: formatted message.
+        """
+        if data.sender_id:
+            return "{} {} {}\r\n".format(datetime.now(), data.sender_id, data.text)
+        return "{}\r\n".format(data.text)
+
+    @staticmethod
+    def _frame(data: Outbound) -> bytes:
+        """Encode a message as it's sent to binary clients.
 
         Args:
-            data (Dict[str, Union[str, int]]): data.
-                schema: {"text": "str", "client_id": int, "sender_id": int, "status": "ok|error"}.
-                Note: sender_id is optional.
+            data (Outbound): message.
+
+        Returns:
+            bytes: encoded frame.
         """
-        if data["client_id"]:
-            client_ids = [data["client_id"]]
+        return encode_frame(Opcode.MESSAGE, data.client_id, data.sender_id, data.text.encode())
+
+    def _send(self, user_connection: Optional[Tuple[Tuple[str, int], Any]], data: Outbound):
+        """Send a message to a client in its protocol.
+
+        Args:
+            user_connection (Optional[Tuple[Tuple[str, int], Any]]): client connection
+                info, None if the client has left meanwhile.
+            data (Outbound): message.
+        """
+        if user_connection is None:
+            return
+        connection = self.manager._connection
+        if connection.is_binary(user_connection[1]):
+            connection.send(user_connection, self._frame(data))
         else:
-            client_ids = self.manager._contact.list()
-
-        for client_id in client_ids:
-            # Send a message to a client.
-            client_connection = self.manager._contact.get(client_id)
-            if data.get("sender_id"):
-                self.manager._connection.send(
-                    client_connection,
-                    "{} {} {}\r\n".format(
-                        datetime.now(), data["sender_id"], data["text"]
-                    ),
-                )
+            connection.send(user_connection, self._format(data))
+
+    def _broadcast(self, data: Outbound):
+        """Send a message to all clients.
+
+        The recipients are taken from a single contact book snapshot and the
+        message is formatted and encoded once per protocol for all of them.
+
+        Args:
+            data (Outbound): message.
+        """
+        contact = self.manager._contact
+        connection = self.manager._connection
+        text_connections = []
+        binary_connections = []
+        for user_connection in map(contact.get, contact.snapshot()):
+            # Clients may leave after the snapshot.
+            if user_connection is None:
+                continue
+            if connection.is_binary(user_connection[1]):
+                binary_connections.append(user_connection)
+            else:
+                text_connections.append(user_connection)
+
+        if text_connections:
+            connection.send_many(text_connections, self._format(data).encode())
+        if binary_connections:
+            connection.send_many(binary_connections, self._frame(data))
+
+    def _store(self, data: Outbound) -> bool:
+        """Keep a direct message for its offline recipient.
+
+        Args:
+            data (Outbound): an undelivered message to a local client.
+
+        Returns:
+            bool: False if it can't be stored: it's a server reply, the store is
+                disabled, or the recipient hasn't claimed an identity.
+        """
+        store = self.manager._offline
+        if store is None or not data.sender_id:
+            return False
+        identity = store.identity_of(data.client_id)
+        if identity is None:
+            return False
+        try:
+            store.put(identity, data.sender_id, data.text)
+        except ValueError as e:
+            self._log.error(f"Message can't be stored for {identity}: {e}")
+            return False
+        return True
+
+    def _record(self, data: Outbound):
+        """Append a message of a client to the chat history.
+
+        Args:
+            data (Outbound): message.
+        """
+        try:
+            self.manager._history.append(data.sender_id, data.client_id, data.text)
+        except ValueError as e:
+            self._log.error(f"Message can't be added to the history: {e}")
+
+    def process(self, data: Outbound):
+        """Message format logic.
+
+        Args:
+            data (Outbound): message.
+        """
+        # Stored messages were recorded when they were sent.
+        if self.manager._history is not None and data.sender_id and not data.stored:
+            self._record(data)
+
+        router = self.manager._router
+        if data.client_id:
+            local = data.routed or router.is_local(data.client_id)
+            if local:
+                # Send a message to a client.
+                client_connection = self.manager._contact.get(data.client_id)
+                delivered = client_connection is not None
+                if delivered:
+                    self._send(client_connection, data)
             else:
-                self.manager._connection.send(
-                    client_connection,
-                    "{}\r\n".format(data["text"]),
-                )
-
-        # Notify sender about its delivered message.
-        if data.get("sender_id"):
-            sender_connection = self.manager._contact.get(data["sender_id"])
-            self.manager._connection.send(
-                sender_connection, "your message has been delivered\r\n"
+                delivered = router.send(data.client_id, data[:3])
+
+            if not delivered:
+                if local and self._store(data):
+                    reply = "client {} is offline, the message has been stored"
+                else:
+                    reply = "client {} is not available"
+                if data.sender_id and not (data.routed or data.stored):
+                    self._send(
+                        self.manager._contact.get(data.sender_id),
+                        Outbound(data.sender_id, reply.format(data.client_id)),
+                    )
+                return
+        else:
+            self._broadcast(data)
+            if not data.routed:
+                router.broadcast(data[:3])
+
+        # Notify sender about its delivered message, its own worker does it.
+        if data.sender_id and not (data.routed or data.stored):
+            self._send(
+                self.manager._contact.get(data.sender_id),
+                Outbound(data.sender_id, "your message has been delivered"),
             )
@@ -0,0 +1,225 @@
+"""Command registry module."""
+import re
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Pattern, Tuple, Union
+
+from rcr.connection.binary import Frame
+
+
+class Argument(NamedTuple):
+    """A command argument type."""
+
+    # Regular expression of the raw argument, without capturing groups.
+    pattern: str
+    # Converts the raw argument. None keeps it as str.
+    convert: Optional[Callable[[str], Any]] = None
+
+
+# Built-in argument types.
+# 0 addresses everyone in frames and messages, so it isn't a client.
+CLIENT_ID = Argument(r"[1-9]\d*", int)
+NUMBER = Argument(r"\d+", int)
+WORD = Argument(r"\S+")
+IDENTITY = Argument(r"[\w.@-]{1,64}")
+TOKEN = Argument(r"\S{8,128}")
+NUMBERS = Argument(r"\d+(?: \d+)*", lambda raw: tuple(map(int, raw.split())))
+TEXT = Argument(r".+")  # it takes the rest of the line, so it must be the last one.
+
+
+class CommandSpec(NamedTuple):
+    """A registered command."""
+
+    verb: str
+    # Names of positional arguments, for documentation.
+    arg_names: Tuple[str, ...]
+    # Matches everything after the verb, with a group per argument.
+    pattern: Optional[Pattern]
+    # (index, converter) of arguments which need to be converted.
+    converters: Tuple[Tuple[int, Callable[[str], Any]], ...]
+    # Called as handler(actor, sender_id, *arguments).
+    handler: Callable
+    # Reply text when the arguments don't match.
+    usage: str
+    # Binary protocol opcode, None if the command is text only.
+    opcode: Optional[int] = None
+    # The target ID of a binary frame is the first argument.
+    takes_target: bool = False
+    # Matches a binary frame payload, with a group per argument after the target.
+    payload_pattern: Optional[Pattern] = None
+    # (index, converter) of payload arguments which need to be converted.
+    payload_converters: Tuple[Tuple[int, Callable[[str], Any]], ...] = ()
+    # It takes much longer than others, so cheap commands go first.
+    expensive: bool = False
+
+
+class CommandRegistry:
+    """Command registry class.
+
+    Commands register a verb (the first word of a line) and their arguments.
+    A line is parsed once: the verb is looked up in a dict and the rest of the
+    line is matched by a single pattern which has been compiled from the
+    argument types at registration.
+
+    A command with an opcode can be sent in a binary frame too. Its target ID
+    fills a leading `CLIENT_ID` argument and the payload fills the rest.
+    """
+
+    def __init__(self):
+        self._commands: Dict[str, CommandSpec] = {}
+        self._opcodes: Dict[int, CommandSpec] = {}
+
+    def __contains__(self, verb: str) -> bool:
+        return verb in self._commands
+
+    def __iter__(self):
+        return iter(self._commands.values())
+
+    def is_expensive(self, text: Union[str, Frame]) -> bool:
+        """Return True if a command line or frame is an expensive command.
+
+        Args:
+            text (Union[str, Frame]): command line or binary frame.
+
+        Returns:
+            bool: it's an expensive command or not, unknown ones are cheap.
+        """
+        if isinstance(text, str):
+            spec = self._commands.get(text.partition(" ")[0])
+        else:
+            spec = self._opcodes.get(text.opcode)
+        return spec is not None and spec.expensive
+
+    def get(self, verb: str) -> Optional[CommandSpec]:
+        """Get a registered command.
+
+        Args:
+            verb (str): command verb.
+
+        Returns:
+            Optional[CommandSpec]: the command.
+        """
+        return self._commands.get(verb)
+
+    @staticmethod
+    def _compile(
+        arguments: Tuple[Argument, ...]
+    ) -> Tuple[Optional[Pattern], Tuple[Tuple[int, Callable[[str], Any]], ...]]:
+        """Compile the pattern and converters of a list of arguments.
+
+        Args:
+            arguments (Tuple[Argument, ...]): argument types.
+
+        Returns:
+            Tuple[Optional[Pattern], Tuple[Tuple[int, Callable[[str], Any]], ...]]: pattern
+                with a group per argument (None if there is no argument) and converters.
+        """
+        pattern = None
+        if arguments:
+            pattern = re.compile(
+                " ".join("({})".format(argument.pattern) for argument in arguments), re.DOTALL
+            )
+        converters = tuple(
+            (index, argument.convert)
+            for index, argument in enumerate(arguments)
+            if argument.convert is not None
+        )
+        return pattern, converters
+
+    def register(
+        self,
+        verb: str,
+        *args: Tuple[str, Argument],
+        usage: str = "",
+        opcode: Optional[int] = None,
+        expensive: bool = False,
+    ):
+        """Register a command handler. It's used as a decorator.
+
+        Args:
+            verb (str): command verb.
+            *args (Tuple[str, Argument]): (name, type) of arguments.
+            usage (str): reply text when the arguments don't match.
+            opcode (Optional[int]): binary protocol opcode. Defaults to None.
+            expensive (bool): it takes much longer than most commands. Defaults to False.
+
+        Returns:
+            Callable: the decorator, which returns the handler itself.
+        """
+        arguments = tuple(argument for _, argument in args)
+        pattern, converters = self._compile(arguments)
+        takes_target = bool(arguments) and arguments[0] is CLIENT_ID
+        payload_pattern, payload_converters = self._compile(arguments[takes_target:])
+
+        def decorator(handler: Callable) -> Callable:
+            spec = CommandSpec(
+                verb,
+                tuple(name for name, _ in args),
+                pattern,
+                converters,
+                handler,
+                usage,
+                opcode,
+                takes_target,
+                payload_pattern,
+                payload_converters,
+                expensive,
+            )
+            self._commands[verb] = spec
+            if opcode is not None:
+                self._opcodes[opcode] = spec
+            return handler
+
+        return decorator
+
+    def parse(self, line: str) -> Tuple[Optional[CommandSpec], Optional[List[Any]]]:
+        """Parse a command line.
+
+        Args:
+            line (str): command line.
+
+        Returns:
+            Tuple[Optional[CommandSpec], Optional[List[Any]]]: the command (None if the
+                verb is unknown) and its arguments (None if they don't match).
+        """
+        verb, _, rest = line.partition(" ")
+        spec = self._commands.get(verb)
+        if spec is None:
+            return None, None
+        if spec.pattern is None:
+            return spec, None if rest else []
+
+        match = spec.pattern.fullmatch(rest)
+        if match is None:
+            return spec, None
+        args = list(match.groups())
+        for index, convert in spec.converters:
+            args[index] = convert(args[index])
+        return spec, args
+
+    def parse_frame(self, frame: Frame) -> Tuple[Optional[CommandSpec], Optional[List[Any]]]:
+        """Parse a binary command frame.
+
+        Args:
+            frame (Frame): binary frame.
+
+        Returns:
+            Tuple[Optional[CommandSpec], Optional[List[Any]]]: the command (None if the
+                opcode is unknown) and its arguments (None if they don't match).
+        """
+        spec = self._opcodes.get(frame.opcode)
+        if spec is None:
+            return None, None
+
+        if spec.takes_target and not frame.target:
+            return spec, None
+        args = [frame.target] if spec.takes_target else []
+        if spec.payload_pattern is None:
+            return spec, None if frame.payload else args
+
+        match = spec.payload_pattern.fullmatch(frame.payload)
+        if match is None:
+            return spec, None
+        payload_args = list(match.groups())
+        for index, convert in spec.payload_converters:
+            payload_args[index] = convert(payload_args[index])
+        args.extend(payload_args)
+        return spec, args
@@ -1,31 +1,79 @@
 """Session actor implementation."""
-from typing import Any, Dict
+from typing import Union
 
 from rcr.actor.base import Base
+from rcr.actor.envelope import Inbound, Join, Leave, LogEntry, Outbound
+from rcr.type import MailboxPolicy
 
 
 class Session(Base):
     """Session actor class implementation.
 
     This actor is responsible to manage sessions by keeping contact book updated.
+    Joins and leaves of a connection go through its mailbox in order, so a
+    leave always finds the contact added by its join.
+
+    A lost join or leave would corrupt the contact book, so its mailbox always
+    waits for room.
     """
 
-    def process(self, msg: Dict[str, Any]):
+    mailbox_policy = MailboxPolicy.BLOCK
+
+    def process(self, msg: Union[Join, Leave, Inbound]):
         """Message format logic.
 
         Args:
-            msg (Dict[str, Union[str, Any]]): message.
-                schema: {"addr": "str", "conn": Any}.
+            msg (Union[Join, Leave, Inbound]): a new client, a closed connection,
+                or a deferred command.
         """
+        if isinstance(msg, Inbound):
+            # A command which has arrived before its sender's join. It's forced, since
+            # the Command actor may be waiting for room in this mailbox.
+            self.manager.command_actor(msg.conn).inbox.put(msg, force=True)
+            return
+        if isinstance(msg, Leave):
+            self._leave(msg)
+            return
+
         # Add the client in the contact book.
-        client_id = self.manager._contact.add((msg["addr"], msg["conn"]))
+        client_id = self.manager._contact.add((msg.addr, msg.conn))
+        if self.manager._offline:
+            # The ID may have belonged to a client which had an identity.
+            self.manager._offline.release(client_id)
+        if self.manager._history:
+            # It may have belonged to a client whose direct messages are in the history.
+            self.manager._history.join(client_id)
+        self.manager._router.join(client_id)
 
         # Log on the server.
         self.manager._log_actor.inbox.put(
-            {"type": "info", "text": "user has been added to the contact list."}
+            LogEntry("info", "user has been added to the contact list.")
         )
 
         # Reply to the user about its client ID.
         self.manager._message_actor.inbox.put(
-            {"text": "Your client ID: {}\r\n".format(client_id), "client_id": client_id}
+            Outbound(client_id, "Your client ID: {}\r\n".format(client_id))
+        )
+
+    def _leave(self, msg: Leave):
+        """Remove the client of a closed connection from the contact book.
+
+        Args:
+            msg (Leave): a closed connection.
+        """
+        try:
+            client_id = self.manager._contact.get_by_connection(msg.conn)
+        except ValueError:
+            # The server's own connection, or a client which hasn't joined.
+            self.manager._log_actor.inbox.put(LogEntry("info", "Connection closed!"))
+            return
+
+        self.manager._contact.remove(client_id)
+        if self.manager._history:
+            self.manager._history.leave(client_id)
+        self.manager._router.leave(client_id)
+
+        # Log on the server.
+        self.manager._log_actor.inbox.put(
+            LogEntry("info", "user has been removed from the contact list.")
         )
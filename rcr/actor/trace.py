@@ -0,0 +1,196 @@
+"""Actor tracing module."""
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Any, List, Optional, Tuple
+
+from rcr.metrics import Registry
+
+
+class ActorTrace:
+    """Tracing state of a single actor.
+
+    The actor thread writes `current` before and after every message, and the
+    sampler thread reads it, so it's replaced as a whole instead of updated.
+    """
+
+    __slots__ = ("name", "mailbox", "thread_id", "current", "stack", "logged_at")
+
+    def __init__(self, name: str, mailbox):
+        """Initialize the class.
+
+        Args:
+            name (str): actor name.
+            mailbox (Mailbox): actor mailbox.
+        """
+        self.name = name
+        self.mailbox = mailbox
+        self.thread_id: Optional[int] = None
+        # (start time, message) of the message being processed, None while idle.
+        self.current: Optional[Tuple[float, Any]] = None
+        # (current, formatted stack) sampled while `current` was being processed.
+        self.stack: Optional[Tuple[Tuple[float, Any], str]] = None
+        self.logged_at = 0.0
+
+
+class Tracer:
+    """Queue wait and processing time of actor messages.
+
+    When it's enabled, mailboxes stamp messages on enqueue, and actors measure
+    the time every message waited in the mailbox and the time it took to be
+    processed, by actor and message type. A message which takes more than
+    `threshold` seconds in total is logged, at most once per `log_interval`
+    per actor. A sampler thread takes the stack of an actor thread which has
+    been processing a message for longer than the threshold, and the stack is
+    logged with the message.
+
+    When it's disabled, mailboxes don't stamp and actors take their plain loop,
+    so the only cost is a check per batch.
+    """
+
+    def __init__(self, registry: Registry, threshold: float = 0, log_interval: float = 1.0):
+        """Initialize the class.
+
+        Args:
+            registry (Registry): metrics registry.
+            threshold (float): seconds to log a message, 0 disables tracing. Defaults to 0.
+            log_interval (float): minimum seconds between logs of an actor. Defaults to 1.
+        """
+        self.threshold = 0.0
+        self.log_interval = log_interval
+
+        self._wait = registry.histogram(
+            "rcr_actor_queue_wait_seconds",
+            "Time a traced message waited in an actor's mailbox.",
+            ("actor", "message"),
+        )
+        self._process = registry.histogram(
+            "rcr_actor_process_seconds",
+            "Time a traced message took to be processed.",
+            ("actor", "message"),
+        )
+        self._slow = registry.counter(
+            "rcr_actor_slow_messages_total", "Traced messages over the threshold.", ("actor",)
+        )
+
+        self._log = logging.getLogger("actor")
+        self._traces: List[ActorTrace] = []
+        self._lock = threading.Lock()
+        self._stop: Optional[threading.Event] = None
+        self._sampler: Optional[threading.Thread] = None
+        self.set_threshold(threshold)
+
+    def watch(self, name: str, mailbox) -> ActorTrace:
+        """Trace an actor.
+
+        Args:
+            name (str): actor name.
+            mailbox (Mailbox): actor mailbox.
+
+        Returns:
+            ActorTrace: tracing state of the actor.
+        """
+        trace = ActorTrace(name, mailbox)
+        with self._lock:
+            self._traces.append(trace)
+            mailbox.set_stamping(bool(self.threshold))
+        return trace
+
+    def set_threshold(self, threshold: float):
+        """Enable, change or disable tracing.
+
+        Args:
+            threshold (float): seconds to log a message, 0 disables tracing.
+        """
+        if threshold < 0:
+            raise ValueError("threshold can't be negative.")
+
+        with self._lock:
+            self.threshold = threshold
+            for trace in self._traces:
+                trace.mailbox.set_stamping(bool(threshold))
+
+            if threshold and self._sampler is None:
+                self._stop = threading.Event()
+                self._sampler = threading.Thread(
+                    target=self._sample, args=(self._stop,), name="actor-tracer", daemon=True
+                )
+                self._sampler.start()
+            elif not threshold and self._sampler is not None:
+                self._stop.set()
+                self._sampler = None
+
+    def toggle(self, threshold: float):
+        """Disable tracing if it's on, otherwise enable it.
+
+        Args:
+            threshold (float): seconds to log a message when it's enabled.
+        """
+        self.set_threshold(0 if self.threshold else threshold)
+
+    def shutdown(self):
+        """Disable tracing and stop the sampler thread."""
+        self.set_threshold(0)
+
+    def record(self, trace: ActorTrace, enqueued_at: float, finished_at: float):
+        """Record a processed message.
+
+        Args:
+            trace (ActorTrace): tracing state of the actor.
+            enqueued_at (float): monotonic time the message was put in the mailbox.
+            finished_at (float): monotonic time its processing finished.
+        """
+        current, trace.current = trace.current, None
+        started_at, msg = current
+        kind = type(msg).__name__
+        waited = started_at - enqueued_at
+        took = finished_at - started_at
+        self._wait.labels(trace.name, kind).observe(waited)
+        self._process.labels(trace.name, kind).observe(took)
+
+        threshold = self.threshold
+        if not threshold or waited + took < threshold:
+            return
+        self._slow.labels(trace.name).inc()
+        if finished_at - trace.logged_at < self.log_interval:
+            return
+        trace.logged_at = finished_at
+
+        # Messages carry the text of clients, so only their sender is logged.
+        sender_id = getattr(msg, "sender_id", None)
+        stack = trace.stack
+        self._log.warning(
+            "slow %s%s on %s actor: %.1f ms queued, %.1f ms processing%s",
+            kind,
+            "" if sender_id is None else " from client {}".format(sender_id),
+            trace.name,
+            waited * 1000,
+            took * 1000,
+            "\n" + stack[1] if stack and stack[0] is current else "",
+        )
+
+    def _sample(self, stop: threading.Event):
+        """Take the stack of actors which are busy with a message for too long.
+
+        Args:
+            stop (threading.Event): it's set to stop sampling.
+        """
+        while not stop.wait(min(max(self.threshold / 2, 0.001), 1.0)):
+            threshold = self.threshold
+            if not threshold:
+                continue
+            now = time.monotonic()
+            frames = None
+            for trace in self._traces:
+                current = trace.current
+                if current is None or now - current[0] < threshold:
+                    continue
+                if trace.stack is not None and trace.stack[0] is current:
+                    continue
+                if frames is None:
+                    frames = sys._current_frames()
+                frame = frames.get(trace.thread_id)
+                if frame is not None:
+                    trace.stack = (current, "".join(traceback.format_stack(frame)).rstrip())
@@ -0,0 +1,4 @@
+"""Benchmark package.
+
+Each module can be run directly, e.g. `python -m rcr.bench.latency`.
+"""
@@ -0,0 +1,111 @@
+"""Broadcast fan-out benchmark.
+
+It starts a server in the current process, connects many clients over TCP
+and measures the time between sending `broadcast ...` and the moment every
+client has received it. Since the clients share the process (and maybe the
+CPU) with the server, it also reports the time which the Message actor spent
+on each broadcast.
+"""
+import argparse
+import selectors
+import socket
+import statistics
+import time
+
+from rcr import config
+from rcr.bench.server import free_port, start_server
+
+
+def _wait_for(selector: selectors.BaseSelector, marker: bytes, clients: int):
+    """Read from all clients until each of them has received a marker.
+
+    Args:
+        selector (selectors.BaseSelector): selector of client sockets.
+        marker (bytes): expected bytes.
+        clients (int): number of clients.
+    """
+    tails = {}
+    done = set()
+    while len(done) < clients:
+        for key, _ in selector.select():
+            sock = key.fileobj
+            tail = tails.get(sock, b"") + sock.recv(65536)
+            if marker in tail:
+                done.add(sock)
+            tails[sock] = tail[-len(marker):]
+
+
+def run(clients: int, rounds: int, port: int):
+    """Run the benchmark.
+
+    Args:
+        clients (int): number of connected clients.
+        rounds (int): number of broadcasts.
+        port (int): server port.
+
+    Returns:
+        Dict[str, float]: fan-out time summary in milliseconds.
+    """
+    manager = start_server(port)
+
+    # Measure the Message actor's share.
+    server_samples = []
+    process = manager._message_actor.process
+
+    def timed_process(data):
+        started_at = time.perf_counter()
+        process(data)
+        if not data.client_id:
+            server_samples.append((time.perf_counter() - started_at) * 1000)
+
+    manager._message_actor.process = timed_process
+
+    selector = selectors.DefaultSelector()
+    socks = []
+    try:
+        for _ in range(clients):
+            sock = socket.create_connection((config.SERVER_HOST, port))
+            sock.setblocking(False)
+            selector.register(sock, selectors.EVENT_READ)
+            socks.append(sock)
+        _wait_for(selector, b"Your client ID", clients)
+
+        samples = []
+        for i in range(rounds):
+            marker = "ping{}\r\n".format(i).encode()
+            started_at = time.perf_counter()
+            socks[0].sendall(b"broadcast " + marker)
+            _wait_for(selector, marker, clients)
+            samples.append((time.perf_counter() - started_at) * 1000)
+    finally:
+        for sock in socks:
+            selector.unregister(sock)
+            sock.close()
+        selector.close()
+        manager.shutdown()
+
+    return {
+        "clients": clients,
+        "rounds": rounds,
+        "mean_ms": statistics.mean(samples),
+        "min_ms": min(samples),
+        "max_ms": max(samples),
+        "server_mean_ms": statistics.mean(server_samples),
+    }
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-c", "--clients", type=int, default=5000)
+    parser.add_argument("-n", "--rounds", type=int, default=10)
+    parser.add_argument("-p", "--port", type=int, default=0)
+    args = parser.parse_args()
+
+    result = run(args.clients, args.rounds, args.port or free_port())
+    for key, value in result.items():
+        print("{:>14}: {}".format(key, round(value, 3)))
+
+
+if __name__ == "__main__":
+    main()
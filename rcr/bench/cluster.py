@@ -0,0 +1,96 @@
+"""Cluster capacity benchmark.
+
+Every node runs in its own process with a fixed open files limit, which stands
+for the capacity of a machine. Clients join the nodes in turn until every node
+stops admitting them, and the total number of joined clients is reported for
+each cluster size.
+"""
+import argparse
+import socket
+import time
+from typing import Dict, List
+
+from rcr.bench.server import start_cluster, stop_cluster
+
+
+def join(port: int, timeout: float) -> socket.socket:
+    """Connect a client and wait for its client ID.
+
+    Args:
+        port (int): node port.
+        timeout (float): seconds to wait for the client ID.
+
+    Returns:
+        socket.socket: the joined client connection.
+
+    Raises:
+        OSError: when the node doesn't admit the client in time.
+    """
+    sock = socket.create_connection(("127.0.0.1", port), timeout)
+    buffer = b""
+    try:
+        # A client which speaks first doesn't wait for the protocol negotiation.
+        sock.sendall(b"\r\n")
+        while b"Your client ID:" not in buffer:
+            data = sock.recv(1024)
+            if not data:
+                raise ConnectionResetError("node closed the connection.")
+            buffer += data
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def run(max_nodes: int = 3, fd_limit: int = 512, timeout: float = 0.5) -> Dict[int, Dict]:
+    """Run the benchmark.
+
+    Args:
+        max_nodes (int): the largest cluster size.
+        fd_limit (int): open files limit of every node.
+        timeout (float): seconds to wait for a node to admit a client.
+
+    Returns:
+        Dict[int, Dict]: joined clients and seconds taken by cluster size.
+    """
+    results = {}
+    for nodes in range(1, max_nodes + 1):
+        processes, ports = start_cluster(nodes, fd_limit)
+        clients: List[socket.socket] = []
+        try:
+            started = time.perf_counter()
+            available = list(ports)
+            while available:
+                for port in list(available):
+                    try:
+                        clients.append(join(port, timeout))
+                    except OSError:
+                        available.remove(port)
+            elapsed = time.perf_counter() - started
+        finally:
+            for client in clients:
+                client.close()
+            stop_cluster(processes)
+
+        results[nodes] = {"clients": len(clients), "seconds": elapsed}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="cluster capacity benchmark")
+    parser.add_argument("-n", "--nodes", type=int, default=3, help="the largest cluster size")
+    parser.add_argument("--fd-limit", type=int, default=512, help="open files limit per node")
+    args = parser.parse_args()
+
+    results = run(args.nodes, args.fd_limit)
+    print("open files limit per node: {}".format(args.fd_limit))
+    for nodes, result in results.items():
+        print(
+            "{} node(s): {:6d} clients, {:6.0f} clients/node, joined in {:.1f}s".format(
+                nodes, result["clients"], result["clients"] / nodes, result["seconds"]
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Command actor throughput benchmark.
+
+It calls `Command.process` directly with a mix of commands, so it measures
+parsing and dispatching without sockets and without the other actors.
+"""
+import argparse
+import time
+
+from rcr.actor.command import Command
+from rcr.actor.trace import Tracer
+from rcr.actor.envelope import Inbound
+from rcr.contact import Contact
+from rcr.fetcher import Fetcher
+from rcr.fibonacci import Fibonacci
+from rcr.metrics import Registry
+from rcr.router import Router
+
+COMMANDS = (
+    "msg {id} hello there",
+    "w",
+    "broadcast hello everyone",
+    "fib {id} 30",
+    "url {id} http://127.0.0.1:1/",
+    "msg {id}",
+    "unknown command",
+)
+
+
+class _Inbox:
+    """An inbox which only counts messages."""
+
+    def __init__(self):
+        self.count = 0
+
+    def put(self, item):
+        self.count += 1
+
+
+class _Manager:
+    """The parts of Manager which the Command actor uses."""
+
+    def __init__(self):
+        self._contact = Contact()
+        self._router = Router(0, [""])
+        self._fibonacci = Fibonacci()
+        self._fetcher = Fetcher()
+        self._metrics = Registry()
+        self._tracer = Tracer(self._metrics)
+        self._message_actor = type("MessageActor", (), {"inbox": _Inbox()})()
+
+
+def run(commands: int = 200000, repeat: int = 5):
+    """Run the benchmark.
+
+    Args:
+        commands (int): number of processed commands per round.
+        repeat (int): number of rounds. The best one is reported.
+
+    Returns:
+        Dict[str, float]: commands per second.
+    """
+    manager = _Manager()
+    conn = object()
+    client_id = manager._contact.add((("127.0.0.1", 0), conn))
+
+    # The fetcher would reply from its threads; it's cached to keep it in process.
+    manager._fetcher._store("http://127.0.0.1:1/", 0)
+
+    actor = Command(manager)
+    items = [Inbound(conn, text.format(id=client_id)) for text in COMMANDS]
+    batch = (items * (commands // len(items) + 1))[:commands]
+
+    elapsed = float("inf")
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        for item in batch:
+            actor.process(item)
+        elapsed = min(elapsed, time.perf_counter() - started_at)
+
+    manager._contact.remove(client_id)
+    manager._fetcher.shutdown()
+    return {"commands": commands, "commands_per_sec": commands / elapsed}
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--commands", type=int, default=200000)
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for key, value in run(args.commands, args.repeat).items():
+        print("{:>16}: {}".format(key, round(value, 1)))
+
+
+if __name__ == "__main__":
+    main()
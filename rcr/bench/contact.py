@@ -0,0 +1,125 @@
+"""Contact book benchmarks.
+
+`lookup` measures `Contact.get_by_connection`, which runs for every received
+command, with different numbers of registered contacts. `churn` runs
+join/leave threads against reader threads which walk the client list like
+`w` and broadcast do.
+"""
+import argparse
+import random
+import threading
+import time
+
+from rcr.contact import Contact
+
+
+def lookup(sizes=(10, 100, 1000, 10000, 100000), lookups: int = 100000):
+    """Measure connection -> client ID lookups.
+
+    Args:
+        sizes (Tuple[int]): numbers of registered contacts.
+        lookups (int): number of lookups per size.
+
+    Returns:
+        Dict[int, float]: average lookup time in microseconds per size.
+    """
+    result = {}
+    for size in sizes:
+        contact = Contact()
+        connections = [object() for _ in range(size)]
+        for connection in connections:
+            contact.add((("127.0.0.1", 0), connection))
+        targets = [random.choice(connections) for _ in range(lookups)]
+
+        get_by_connection = contact.get_by_connection
+        started_at = time.perf_counter()
+        for connection in targets:
+            get_by_connection(connection)
+        result[size] = (time.perf_counter() - started_at) / lookups * 1e6
+
+        for contact_id in contact.list():
+            contact.remove(contact_id)
+    return result
+
+
+def churn(writers: int = 4, readers: int = 2, contacts: int = 10000, seconds: float = 2.0):
+    """Measure concurrent joins/leaves while other threads read the contact book.
+
+    Args:
+        writers (int): number of join/leave threads.
+        readers (int): number of threads which walk the client list.
+        contacts (int): number of contacts registered before starting.
+        seconds (float): duration.
+
+    Returns:
+        Dict[str, float]: operations per second and number of reader errors.
+    """
+    contact = Contact()
+    for _ in range(contacts):
+        contact.add((("127.0.0.1", 0), object()))
+
+    stop = threading.Event()
+    counts = {"join_leave": 0, "reads": 0, "errors": 0}
+    counts_lock = threading.Lock()
+
+    def writer():
+        done = 0
+        while not stop.is_set():
+            contact_id = contact.add((("127.0.0.1", 0), object()))
+            contact.remove(contact_id)
+            done += 1
+        with counts_lock:
+            counts["join_leave"] += done
+
+    def reader():
+        done = errors = 0
+        while not stop.is_set():
+            try:
+                for contact_id in contact.list():
+                    contact.get(contact_id)
+            except RuntimeError:
+                errors += 1
+            done += 1
+        with counts_lock:
+            counts["reads"] += done
+            counts["errors"] += errors
+
+    threads = [threading.Thread(target=writer) for _ in range(writers)]
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    for contact_id in contact.list():
+        contact.remove(contact_id)
+    return {
+        "join_leave_per_sec": counts["join_leave"] / seconds,
+        "list_walks_per_sec": counts["reads"] / seconds,
+        "reader_errors": counts["errors"],
+    }
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("benchmark", choices=["lookup", "churn"], nargs="?", default="lookup")
+    parser.add_argument("-n", "--lookups", type=int, default=100000)
+    parser.add_argument("-w", "--writers", type=int, default=4)
+    parser.add_argument("-r", "--readers", type=int, default=2)
+    parser.add_argument("-c", "--contacts", type=int, default=10000)
+    args = parser.parse_args()
+
+    if args.benchmark == "lookup":
+        for size, usec in lookup(lookups=args.lookups).items():
+            print("{:>7} contacts: {:.3f} us/lookup".format(size, usec))
+    else:
+        result = churn(args.writers, args.readers, args.contacts)
+        for key, value in result.items():
+            print("{:>18}: {}".format(key, round(value, 1)))
+
+
+if __name__ == "__main__":
+    main()
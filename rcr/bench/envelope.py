@@ -0,0 +1,87 @@
+"""Actor message envelope benchmark.
+
+It compares the dicts which the actors used to pass to each other with the
+`rcr.actor.envelope` tuples, for the messages of a `msg` command: the received
+line, the message to its recipient, and the delivery notice to its sender.
+"""
+import argparse
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from rcr.actor.envelope import Inbound, Outbound
+
+CONN = object()
+TEXT = "msg 2 hello there"
+
+
+def _dicts(count: int) -> List:
+    return [
+        (
+            {"text": TEXT, "conn": CONN},
+            {"client_id": 2, "sender_id": 1, "text": "hello there"},
+            {"client_id": 1, "text": "your message has been delivered"},
+        )
+        for _ in range(count)
+    ]
+
+
+def _envelopes(count: int) -> List:
+    return [
+        (
+            Inbound(CONN, TEXT),
+            Outbound(2, "hello there", 1),
+            Outbound(1, "your message has been delivered"),
+        )
+        for _ in range(count)
+    ]
+
+
+def _measure(build: Callable[[int], List], count: int, repeat: int) -> Dict[str, float]:
+    """Measure live memory and creation time of `count` commands' messages."""
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    messages = build(count)
+    size = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del messages
+
+    elapsed = float("inf")
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        build(count)
+        elapsed = min(elapsed, time.perf_counter() - started_at)
+    return {"bytes_per_command": size / count, "ns_per_command": elapsed / count * 1e9}
+
+
+def run(count: int = 100000, repeat: int = 5) -> Dict[str, Dict[str, float]]:
+    """Run the benchmark.
+
+    Args:
+        count (int): number of commands.
+        repeat (int): number of timed rounds. The best one is reported.
+
+    Returns:
+        Dict[str, Dict[str, float]]: memory and time per command by message type.
+    """
+    return {
+        "dict": _measure(_dicts, count, repeat),
+        "envelope": _measure(_envelopes, count, repeat),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="actor message envelope benchmark")
+    parser.add_argument("-n", "--count", type=int, default=100000, help="number of commands")
+    args = parser.parse_args()
+
+    for name, result in run(args.count).items():
+        print(
+            "{:>8}: {:6.1f} bytes/command, {:6.1f} ns/command".format(
+                name, result["bytes_per_command"], result["ns_per_command"]
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Fibonacci implementations benchmark.
+
+It compares the former tail-recursive implementation, the linear one and
+fast doubling, in the server process (without converting results to str).
+"""
+import argparse
+import sys
+import timeit
+
+from rcr.fibonacci import fib_fast_doubling, fib_linear
+
+
+def fib_recursive(n: int, first: int = 0, second: int = 1) -> int:
+    """The former tail-recursive implementation, for reference."""
+    if n < 1:
+        return first
+    return fib_recursive(n - 1, second, first + second)
+
+
+def run(sizes=(10, 100, 900, 10000, 100000, 1000000), budget: float = 0.5):
+    """Run the benchmark.
+
+    Args:
+        sizes (Tuple[int]): values of n.
+        budget (float): approximate seconds spent per implementation and n.
+
+    Returns:
+        Dict[int, Dict[str, float]]: microseconds per call, None when it can't run.
+    """
+    implementations = {
+        "recursive": fib_recursive,
+        "linear": fib_linear,
+        "fast_doubling": fib_fast_doubling,
+    }
+    result = {}
+    for n in sizes:
+        result[n] = {}
+        for name, func in implementations.items():
+            if name == "recursive" and n >= sys.getrecursionlimit() - 50:
+                result[n][name] = None
+                continue
+            if name == "linear" and n > 100000:
+                result[n][name] = None
+                continue
+            timer = timeit.Timer(lambda: func(n))
+            number, elapsed = timer.autorange()
+            number = max(1, int(number * budget / max(elapsed, 1e-9)))
+            result[n][name] = timer.timeit(number) / number * 1e6
+    return result
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-b", "--budget", type=float, default=0.5)
+    args = parser.parse_args()
+
+    print("{:>8} {:>14} {:>14} {:>14}".format("n", "recursive", "linear", "fast_doubling"))
+    for n, timings in run(budget=args.budget).items():
+        print(
+            "{:>8} ".format(n)
+            + " ".join(
+                "{:>14}".format("-" if usec is None else "{:.2f}us".format(usec))
+                for usec in timings.values()
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Chat history benchmark.
+
+`append` measures the write throughput of the history, rolling and deleting
+segments as a server does. `query` fills a history and times `recent`, the
+first message of a `conversation` which starts in the middle of it, and a
+whole `conversation` of its last percent; with the index and with a single
+entry per segment.
+"""
+import argparse
+import tempfile
+import time
+from typing import Dict
+
+from rcr.storage import HistoryLog
+
+
+def append(
+    count: int = 200000, size: int = 100, segment_size: int = 1024 * 1024
+) -> Dict[str, float]:
+    """Append messages to a new history.
+
+    Args:
+        count (int): number of messages.
+        size (int): message length.
+        segment_size (int): size of a segment file.
+
+    Returns:
+        Dict[str, float]: messages and megabytes per second.
+    """
+    text = "x" * size
+    with tempfile.TemporaryDirectory() as directory:
+        history = HistoryLog(directory, segment_size, max_segments=8)
+        started_at = time.perf_counter()
+        for i in range(count):
+            history.append(i % 10 + 1, i // 10 % 10, text)
+        elapsed = time.perf_counter() - started_at
+        history.close()
+    return {
+        "messages_per_sec": count / elapsed,
+        "mb_per_sec": count * size / elapsed / 1e6,
+        "us_per_message": elapsed / count * 1e6,
+    }
+
+
+def query(
+    count: int = 200000, size: int = 100, segment_size: int = 1024 * 1024
+) -> Dict[str, float]:
+    """Time queries of a full history.
+
+    Messages are a millisecond apart and go among 10 clients, a tenth of
+    them are broadcasts.
+
+    Args:
+        count (int): number of messages.
+        size (int): message length.
+        segment_size (int): size of a segment file.
+
+    Returns:
+        Dict[str, float]: milliseconds per query.
+    """
+    text = "x" * size
+    now = [0.0]
+    with tempfile.TemporaryDirectory() as directory:
+        results = {}
+        for name, interval in (("indexed", 64), ("per_segment", count)):
+            history = HistoryLog(
+                directory + "/" + name, segment_size, 0, interval, clock=lambda: now[0]
+            )
+            # Clients only get the direct messages which are sent after they join.
+            for client_id in range(1, 11):
+                history.join(client_id)
+            for i in range(count):
+                now[0] = i / 1000
+                history.append(i % 10 + 1, i // 10 % 10, text)
+
+            started_at = time.perf_counter()
+            history.recent(1, 20)
+            results["recent_ms_" + name] = (time.perf_counter() - started_at) * 1000
+            started_at = time.perf_counter()
+            next(history.conversation(1, 2, count / 2000))
+            results["first_of_middle_ms_" + name] = (time.perf_counter() - started_at) * 1000
+            started_at = time.perf_counter()
+            found = sum(1 for _ in history.conversation(1, 2, count * 0.99 / 1000))
+            results["last_percent_ms_" + name] = (time.perf_counter() - started_at) * 1000
+            results["last_percent_messages"] = found
+            history.close()
+    return results
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("benchmark", choices=["append", "query"], nargs="?", default="append")
+    parser.add_argument("-n", "--count", type=int, default=200000)
+    parser.add_argument("-s", "--size", type=int, default=100)
+    args = parser.parse_args()
+
+    benchmark = append if args.benchmark == "append" else query
+    for key, value in benchmark(args.count, args.size).items():
+        print("{:>24}: {}".format(key, round(value, 2)))
+
+
+if __name__ == "__main__":
+    main()
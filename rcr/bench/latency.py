@@ -0,0 +1,77 @@
+"""End-to-end `msg` round-trip latency benchmark.
+
+It starts a server in the current process, connects a client over TCP and
+measures the time between sending `msg <own id> ...` and receiving the
+delivery confirmation, which covers Command -> Message actors and both socket
+directions.
+"""
+import argparse
+import statistics
+import time
+
+from rcr import config
+from rcr.bench.server import LineClient, free_port, start_server
+
+
+def percentile(samples, pct: float) -> float:
+    """Return a percentile of sorted samples.
+
+    Args:
+        samples (List[float]): sorted samples.
+        pct (float): percentile in the range of [0, 100].
+
+    Returns:
+        float: percentile value.
+    """
+    index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+    return samples[index]
+
+
+def run(rounds: int, port: int):
+    """Run the benchmark.
+
+    Args:
+        rounds (int): number of round trips.
+        port (int): server port.
+
+    Returns:
+        Dict[str, float]: latency summary in milliseconds.
+    """
+    manager = start_server(port)
+    client = LineClient(config.SERVER_HOST, port)
+    try:
+        samples = []
+        for i in range(rounds):
+            started_at = time.perf_counter()
+            client.send_line("msg {} ping{}".format(client.client_id, i))
+            while client.read_line() != "your message has been delivered":
+                pass
+            samples.append((time.perf_counter() - started_at) * 1000)
+    finally:
+        client.close()
+        manager.shutdown()
+
+    samples.sort()
+    return {
+        "rounds": rounds,
+        "mean_ms": statistics.mean(samples),
+        "p50_ms": percentile(samples, 50),
+        "p99_ms": percentile(samples, 99),
+        "max_ms": samples[-1],
+    }
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--rounds", type=int, default=200)
+    parser.add_argument("-p", "--port", type=int, default=0)
+    args = parser.parse_args()
+
+    result = run(args.rounds, args.port or free_port())
+    for key, value in result.items():
+        print("{:>8}: {}".format(key, round(value, 3)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+"""Multi-connection load generator.
+
+It connects thousands of simulated telnet clients to a server, then every
+client sends commands from a weighted mix (`msg`, `broadcast`, `w`, `fib`) one
+at a time and waits for the reply before sending the next one, optionally
+paced to a total command rate. It reports the connection ramp rate, the
+command throughput and latency percentiles, overall and per command.
+
+A command is complete when its sender gets "your message has been delivered",
+or an error reply. A `w` reply is a line per online client, so it's complete
+when a line has been received for every simulated client; the generator
+should be the only user of the server.
+
+`--flood` adds connections which pipeline `fib` commands as fast as the
+server reads them, without waiting for replies, to see how much they slow
+down the other clients; their commands aren't in the latency figures.
+
+By default the server runs in the current process, so the generator and the
+server share the interpreter. `--connect` runs it against another server.
+"""
+import argparse
+import errno
+import json
+import platform
+import random
+import resource
+import selectors
+import socket
+import statistics
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from rcr.bench.latency import percentile
+from rcr.bench.server import free_port, start_server
+
+DEFAULT_MIX = {"msg": 85, "fib": 10, "w": 4, "broadcast": 1}
+
+DELIVERED = b"your message has been delivered"
+# Replies which complete a command as an error.
+ERRORS = (
+    b"client ",
+    b"invalid ",
+    b"rate limit ",
+    b"request has failed",
+    b"fibonacci calculation has failed",
+)
+
+
+class _Client:
+    """A simulated telnet client."""
+
+    __slots__ = ("sock", "client_id", "buffer", "verb", "started_at", "w_lines", "unsent")
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.client_id = 0
+        self.buffer = b""
+        # The outstanding command and when it has been sent.
+        self.verb: Optional[str] = None
+        self.started_at = 0.0
+        # Lines still expected for an outstanding `w`.
+        self.w_lines = 0
+        # Pipelined commands the socket hasn't taken yet, for flooding clients.
+        self.unsent = b""
+
+    def lines(self) -> List[bytes]:
+        """Read the socket and return complete lines."""
+        try:
+            data = self.sock.recv(262144)
+        except (BlockingIOError, InterruptedError):
+            return []
+        if not data:
+            raise ConnectionResetError("server closed the connection.")
+        self.buffer += data
+        if b"\n" not in self.buffer:
+            return []
+        *lines, self.buffer = self.buffer.split(b"\n")
+        return [line.strip() for line in lines]
+
+
+def _raise_fd_limit(needed: int):
+    """Raise the open files limit up to its hard limit if it's needed."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != resource.RLIM_INFINITY and soft < needed:
+        limit = needed if hard == resource.RLIM_INFINITY else min(needed, hard)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (limit, hard))
+
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    """Summarize latency samples in milliseconds."""
+    if not samples:
+        return {"count": 0}
+    samples.sort()
+    return {
+        "count": len(samples),
+        "mean_ms": statistics.mean(samples),
+        "p50_ms": percentile(samples, 50),
+        "p99_ms": percentile(samples, 99),
+        "p999_ms": percentile(samples, 99.9),
+        "max_ms": samples[-1],
+    }
+
+
+def ramp(
+    selector: selectors.BaseSelector, address: Tuple[str, int], clients: int, window: int
+) -> List[_Client]:
+    """Connect clients, with at most `window` of them joining at once.
+
+    Args:
+        selector (selectors.BaseSelector): selector of the load generator.
+        address (Tuple[str, int]): server address.
+        clients (int): number of clients.
+        window (int): maximum number of joining clients.
+
+    Returns:
+        List[_Client]: joined clients.
+    """
+    joined: List[_Client] = []
+    joining = 0
+    started = 0
+    while len(joined) < clients:
+        while joining < window and started < clients:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.setblocking(False)
+            if sock.connect_ex(address) not in (0, errno.EINPROGRESS):
+                sock.close()
+                raise ConnectionRefusedError("can't connect to %s:%s." % address)
+            selector.register(sock, selectors.EVENT_WRITE, _Client(sock))
+            joining += 1
+            started += 1
+
+        for key, mask in selector.select(10):
+            client = key.data
+            if mask & selectors.EVENT_WRITE:
+                # Connected; a client which speaks first skips the protocol negotiation.
+                client.sock.sendall(b"\r\n")
+                selector.modify(client.sock, selectors.EVENT_READ, client)
+                continue
+            for line in client.lines():
+                if line.startswith(b"Your client ID:"):
+                    client.client_id = int(line.rsplit(b" ", 1)[1])
+                    joined.append(client)
+                    joining -= 1
+    return joined
+
+
+def run(
+    clients: int = 1000,
+    duration: float = 10.0,
+    mix: Optional[Dict[str, int]] = None,
+    rate: float = 0,
+    fib_n: int = 20,
+    ramp_window: int = 64,
+    timeout: float = 10.0,
+    address: Optional[Tuple[str, int]] = None,
+    flood: int = 0,
+) -> Dict:
+    """Run the load.
+
+    Args:
+        clients (int): number of simulated clients.
+        duration (float): seconds of sending commands.
+        mix (Optional[Dict[str, int]]): weight of every command. Defaults to DEFAULT_MIX.
+        rate (float): total commands per second, 0 sends as fast as replies come.
+        fib_n (int): argument of `fib` commands.
+        ramp_window (int): maximum number of clients which join at once.
+        timeout (float): seconds to wait for a reply before counting a timeout.
+        address (Optional[Tuple[str, int]]): server address. A server is started
+            in the current process if it's None.
+        flood (int): number of extra clients which pipeline `fib` commands.
+
+    Returns:
+        Dict: the report; it can be serialized to JSON.
+    """
+    mix = mix or DEFAULT_MIX
+    verbs, weights = zip(*mix.items())
+    # Both ends of every connection may be in this process.
+    _raise_fd_limit(2 * (clients + flood) + 256)
+
+    manager = None
+    if address is None:
+        address = ("127.0.0.1", free_port())
+        manager = start_server(address[1])
+
+    selector = selectors.DefaultSelector()
+    population: List[_Client] = []
+    flooders: List[_Client] = []
+    samples: Dict[str, List[float]] = {verb: [] for verb in verbs}
+    errors = timeouts = received_lines = flooded = 0
+    try:
+        ramp_started = time.perf_counter()
+        population = ramp(selector, address, clients + flood, ramp_window)
+        ramp_seconds = time.perf_counter() - ramp_started
+        population, flooders = population[:clients], population[clients:]
+
+        ids = [client.client_id for client in population]
+        choices = random.choices(verbs, weights, k=65536)
+        idle = list(population)
+        sent = 0
+        perf_counter = time.perf_counter
+        started = perf_counter()
+        deadline = started + duration
+        next_check = started + 1
+        while True:
+            now = perf_counter()
+            sending = now < deadline
+            if not sending and len(idle) == len(population):
+                break
+            if now > deadline + timeout:
+                break
+
+            # Send from idle clients, as many as the rate allows.
+            allowed = len(idle) if not rate else int((now - started) * rate) - sent
+            while sending and idle and allowed > 0:
+                client = idle.pop()
+                verb = choices[sent & 65535]
+                if verb == "msg":
+                    line = "msg {} load {}\r\n".format(random.choice(ids), sent)
+                elif verb == "fib":
+                    line = "fib {} {}\r\n".format(random.choice(ids), fib_n)
+                elif verb == "broadcast":
+                    line = "broadcast load {}\r\n".format(sent)
+                else:
+                    line = "w\r\n"
+                    client.w_lines = len(population) + len(flooders)
+                client.verb = verb
+                client.started_at = perf_counter()
+                client.sock.sendall(line.encode())
+                sent += 1
+                allowed -= 1
+
+            for client in flooders if sending else ():
+                if not client.unsent:
+                    client.unsent = b"fib %d %d\r\n" % (client.client_id, fib_n) * 64
+                try:
+                    count = client.sock.send(client.unsent)
+                except (BlockingIOError, InterruptedError):
+                    continue
+                client.unsent = client.unsent[count:]
+                flooded += count
+
+            for key, _ in selector.select(0.01 if rate or not idle else 0):
+                client = key.data
+                lines = client.lines()
+                received_lines += len(lines)
+                if client.verb is None:
+                    continue
+                for line in lines:
+                    if client.verb == "w":
+                        if not line.isdigit():
+                            continue
+                        client.w_lines -= 1
+                        if client.w_lines:
+                            continue
+                    elif line != DELIVERED:
+                        if not line.startswith(ERRORS):
+                            continue
+                        errors += 1
+                    samples[client.verb].append((perf_counter() - client.started_at) * 1000)
+                    client.verb = None
+                    idle.append(client)
+                    break
+
+            # Give up on lost replies once in a while, so their clients keep working.
+            if now >= next_check:
+                next_check = now + 1
+                limit = now - timeout
+                for client in population:
+                    if client.verb is not None and client.started_at < limit:
+                        timeouts += 1
+                        client.verb = None
+                        idle.append(client)
+        elapsed = min(perf_counter(), deadline) - started
+    finally:
+        for client in population + flooders:
+            client.sock.close()
+        selector.close()
+        if manager:
+            manager.shutdown()
+
+    completed = sum(len(values) for values in samples.values())
+    all_samples = [value for values in samples.values() for value in values]
+    return {
+        "config": {
+            "clients": clients,
+            "duration": duration,
+            "mix": mix,
+            "rate": rate,
+            "fib_n": fib_n,
+            "flood": flood,
+            "server": "in-process" if manager else "{}:{}".format(*address),
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.time(),
+        },
+        "ramp": {
+            "clients": len(population),
+            "seconds": ramp_seconds,
+            "clients_per_sec": len(population) / ramp_seconds,
+        },
+        "throughput": {
+            "commands": completed,
+            "errors": errors,
+            "timeouts": timeouts,
+            "received_lines": received_lines,
+            "commands_per_sec": completed / elapsed,
+            "flood_bytes": flooded,
+        },
+        "latency": dict(
+            {"all": _summary(all_samples)},
+            **{verb: _summary(values) for verb, values in samples.items()},
+        ),
+    }
+
+
+def _parse_mix(text: str) -> Dict[str, int]:
+    """Parse a mix like `msg=85,w=5`."""
+    mix = {}
+    for item in text.split(","):
+        verb, _, weight = item.partition("=")
+        if verb not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError("unknown command %r." % verb)
+        mix[verb] = int(weight)
+    return mix
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-c", "--clients", type=int, default=1000)
+    parser.add_argument("-d", "--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument(
+        "-m", "--mix", type=_parse_mix, default=DEFAULT_MIX, help="e.g. msg=85,fib=10,w=4"
+    )
+    parser.add_argument("-r", "--rate", type=float, default=0, help="commands/s, 0 is unpaced")
+    parser.add_argument("--fib-n", type=int, default=20)
+    parser.add_argument(
+        "--flood", type=int, default=0, help="extra clients which pipeline fib commands"
+    )
+    parser.add_argument("--connect", help="HOST:PORT of a running server")
+    parser.add_argument("--json", help="write the report as JSON to this file, - is stdout")
+    args = parser.parse_args()
+
+    address = None
+    if args.connect:
+        host, _, port = args.connect.rpartition(":")
+        address = (host, int(port))
+    report = run(
+        args.clients,
+        args.duration,
+        args.mix,
+        args.rate,
+        args.fib_n,
+        address=address,
+        flood=args.flood,
+    )
+
+    if args.json:
+        text = json.dumps(report, indent=2, sort_keys=True)
+        if args.json == "-":
+            print(text)
+        else:
+            with open(args.json, "w") as f:
+                f.write(text + "\n")
+        return
+
+    ramp, throughput = report["ramp"], report["throughput"]
+    print(
+        "ramp: {clients} clients in {seconds:.2f}s ({clients_per_sec:.0f}/s)".format(**ramp)
+    )
+    print(
+        "throughput: {commands_per_sec:.0f} commands/s "
+        "({commands} commands, {errors} errors, {timeouts} timeouts)".format(**throughput)
+    )
+    for verb, summary in report["latency"].items():
+        if not summary["count"]:
+            continue
+        print(
+            "{:>10}: {:7d} p50 {:7.2f} ms  p99 {:7.2f} ms  p999 {:7.2f} ms  max {:7.2f} ms".format(
+                verb,
+                summary["count"],
+                summary["p50_ms"],
+                summary["p99_ms"],
+                summary["p999_ms"],
+                summary["max_ms"],
+            )
+        )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
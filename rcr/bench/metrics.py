@@ -0,0 +1,113 @@
+"""Metrics overhead benchmark.
+
+`ops` measures the cost of the metric updates which run per command: a counter
+increment, a labeled histogram observation and the two clock reads around a
+command. `threads` runs counter increments in several threads at once, which
+write their own cells, and checks the total.
+"""
+import argparse
+import threading
+import time
+from typing import Dict
+
+from rcr.metrics import Registry
+
+
+def _best(fn, count: int, repeat: int) -> float:
+    """Return the best time of `fn` in nanoseconds per call."""
+    best = float("inf")
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        fn(count)
+        best = min(best, time.perf_counter() - started_at)
+    return best / count * 1e9
+
+
+def ops(count: int = 1000000, repeat: int = 5) -> Dict[str, float]:
+    """Measure single thread metric updates.
+
+    Args:
+        count (int): number of updates per round.
+        repeat (int): number of rounds. The best one is reported.
+
+    Returns:
+        Dict[str, float]: nanoseconds per update.
+    """
+    registry = Registry()
+    counter = registry.counter("bench_total", "Counter.")
+    histogram = registry.histogram("bench_seconds", "Histogram.", ("command",))
+    perf_counter = time.perf_counter
+
+    def empty(count):
+        for _ in range(count):
+            pass
+
+    def inc(count):
+        for _ in range(count):
+            counter.inc()
+
+    def observe(count):
+        for _ in range(count):
+            histogram.labels("msg").observe(0.00002)
+
+    def clock(count):
+        for _ in range(count):
+            perf_counter() - perf_counter()
+
+    loop = _best(empty, count, repeat)
+    return {
+        "counter_inc": _best(inc, count, repeat) - loop,
+        "histogram_observe": _best(observe, count, repeat) - loop,
+        "clock_reads": _best(clock, count, repeat) - loop,
+    }
+
+
+def threads(workers: int = 4, count: int = 250000) -> Dict[str, float]:
+    """Increment a counter from several threads at once.
+
+    Args:
+        workers (int): number of threads.
+        count (int): increments per thread.
+
+    Returns:
+        Dict[str, float]: increments per second, and lost increments.
+    """
+    counter = Registry().counter("bench_total", "Counter.")
+
+    def work():
+        for _ in range(count):
+            counter.inc()
+
+    pool = [threading.Thread(target=work) for _ in range(workers)]
+    started_at = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started_at
+    return {
+        "increments_per_sec": workers * count / elapsed,
+        "lost_increments": workers * count - counter.value(),
+    }
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("benchmark", choices=["ops", "threads"], nargs="?", default="ops")
+    parser.add_argument("-n", "--count", type=int, default=1000000)
+    parser.add_argument("-w", "--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.benchmark == "ops":
+        result = ops(args.count)
+        for key, value in result.items():
+            print("{:>18}: {:6.1f} ns".format(key, value))
+        print("{:>18}: {:6.1f} ns".format("per command", sum(result.values())))
+    else:
+        for key, value in threads(args.workers, args.count // args.workers).items():
+            print("{:>18}: {}".format(key, round(value, 1)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Text vs binary protocol throughput benchmark.
+
+A sender pipelines `msg` commands to a receiver through a server which runs in
+its own process, and the benchmark measures how many messages per second are
+delivered (and acknowledged to the sender) with each protocol.
+"""
+import argparse
+import selectors
+import socket
+import time
+from typing import Dict
+
+from rcr.bench.server import start_cluster, stop_cluster
+from rcr.connection.binary import HEADER, MAGIC, FrameBuffer, encode_frame
+from rcr.type import Opcode
+
+
+class _TextPeer:
+    """A telnet-like client."""
+
+    def __init__(self, port: int):
+        self.sock = socket.create_connection(("127.0.0.1", port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.sendall(b"\r\n")
+        self._buffer = b""
+        while b"\n" not in self._buffer:
+            self._buffer += self.sock.recv(1024)
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        self.client_id = int(line.rsplit(b" ", 1)[1])
+
+    def command(self, target: int, text: bytes) -> bytes:
+        return b"msg %d %s\r\n" % (target, text)
+
+    def count(self, data: bytes) -> int:
+        return data.count(b"\n")
+
+
+class _BinaryPeer:
+    """A binary protocol client."""
+
+    def __init__(self, port: int):
+        self.sock = socket.create_connection(("127.0.0.1", port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.sendall(bytes((MAGIC,)))
+        frames = []
+        buffer = FrameBuffer()
+        while not frames:
+            frames = buffer.feed(self.sock.recv(1024))
+        # The greeting's target is the client itself.
+        self.client_id = frames[0].target
+        self._buffer = b""
+
+    def command(self, target: int, text: bytes) -> bytes:
+        return encode_frame(Opcode.MSG, target, 0, text)
+
+    def count(self, data: bytes) -> int:
+        # Walk the frame headers, payloads aren't needed.
+        data = self._buffer + data
+        count = begin = 0
+        while len(data) - begin >= HEADER.size:
+            end = begin + HEADER.size + HEADER.unpack_from(data, begin)[0]
+            if end > len(data):
+                break
+            count += 1
+            begin = end
+        self._buffer = data[begin:]
+        return count
+
+
+def _run_once(peer_cls, port: int, messages: int, window: int) -> float:
+    """Send messages and wait for all deliveries and acknowledgements.
+
+    Returns:
+        float: seconds taken.
+    """
+    sender, receiver = peer_cls(port), peer_cls(port)
+    command = sender.command(receiver.client_id, b"hello there, this is a benchmark")
+    selector = selectors.DefaultSelector()
+    selector.register(sender.sock, selectors.EVENT_READ, sender)
+    selector.register(receiver.sock, selectors.EVENT_READ, receiver)
+
+    sent = acked = delivered = 0
+    started = time.perf_counter()
+    while acked < messages or delivered < messages:
+        # Keep a window of messages in flight.
+        batch = min(window - (sent - acked), messages - sent)
+        if batch > 0:
+            sender.sock.sendall(command * batch)
+            sent += batch
+        for key, _ in selector.select():
+            count = key.data.count(key.fileobj.recv(262144))
+            if key.data is sender:
+                acked += count
+            else:
+                delivered += count
+    elapsed = time.perf_counter() - started
+
+    selector.close()
+    sender.sock.close()
+    receiver.sock.close()
+    return elapsed
+
+
+def run(messages: int = 20000, window: int = 256, repeat: int = 3) -> Dict[str, float]:
+    """Run the benchmark.
+
+    Args:
+        messages (int): messages per round.
+        window (int): maximum messages in flight.
+        repeat (int): number of rounds. The best one is reported.
+
+    Returns:
+        Dict[str, float]: delivered messages per second by protocol.
+    """
+    processes, ports = start_cluster(1)
+    try:
+        return {
+            name: messages
+            / min(_run_once(peer_cls, ports[0], messages, window) for _ in range(repeat))
+            for name, peer_cls in (("text", _TextPeer), ("binary", _BinaryPeer))
+        }
+    finally:
+        stop_cluster(processes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="text vs binary protocol benchmark")
+    parser.add_argument("-n", "--messages", type=int, default=20000, help="messages per round")
+    parser.add_argument("-w", "--window", type=int, default=256, help="messages in flight")
+    args = parser.parse_args()
+
+    for name, rate in run(args.messages, args.window).items():
+        print("{:>6}: {:8.0f} messages/s".format(name, rate))
+
+
+if __name__ == "__main__":
+    main()
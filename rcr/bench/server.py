@@ -0,0 +1,193 @@
+"""Server helpers for benchmarks."""
+import os
+import pathlib
+import resource
+import secrets
+import signal
+import socket
+import subprocess
+import sys
+import time
+from typing import List, Optional, Tuple
+
+from rcr import config
+
+RCR_BIN = pathlib.Path(__file__).resolve().parent.parent.parent / "bin" / "rcr"
+
+
+def free_port() -> int:
+    """Find a free TCP port on the loopback interface.
+
+    Returns:
+        int: port number.
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, timeout: float = 5.0):
+    """Start a server manager in the current process.
+
+    Args:
+        port (int): port number to bind.
+        timeout (float): seconds to wait for the server to accept connections.
+
+    Returns:
+        Manager: the running manager. Call its `shutdown` method when it's done.
+
+    Raises:
+        TimeoutError: when the server doesn't accept connections in time.
+    """
+    from rcr.manager import Manager
+
+    config.SERVER_HOST = "127.0.0.1"
+    config.SERVER_PORT = port
+    manager = Manager(is_server=True)
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            if sock.connect_ex((config.SERVER_HOST, port)) == 0:
+                return manager
+        time.sleep(0.01)
+    manager.shutdown()
+    raise TimeoutError("server is not ready after %s seconds." % timeout)
+
+
+def _wait_for_port(port: int, deadline: float) -> bool:
+    """Wait until a local port accepts connections.
+
+    Args:
+        port (int): port number.
+        deadline (float): `time.monotonic` deadline.
+
+    Returns:
+        bool: the port accepts connections or not.
+    """
+    while time.monotonic() < deadline:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return True
+        time.sleep(0.05)
+    return False
+
+
+def start_cluster(
+    nodes: int, fd_limit: Optional[int] = None, timeout: float = 10.0
+) -> Tuple[List[subprocess.Popen], List[int]]:
+    """Start a cluster of server nodes on localhost, a process per node.
+
+    Args:
+        nodes (int): number of nodes.
+        fd_limit (Optional[int]): open files limit of every node, it caps the
+            number of clients a node can hold. Defaults to None (inherited).
+        timeout (float): seconds to wait for the nodes to accept connections.
+
+    Returns:
+        Tuple[List[subprocess.Popen], List[int]]: node processes and their client ports.
+
+    Raises:
+        TimeoutError: when a node doesn't accept connections in time.
+    """
+    ports = [free_port() for _ in range(nodes)]
+    router_nodes = ",".join("127.0.0.1:{}".format(free_port()) for _ in range(nodes))
+    secret = secrets.token_hex(16)
+
+    def limit_files():
+        resource.setrlimit(resource.RLIMIT_NOFILE, (fd_limit, fd_limit))
+
+    processes = []
+    for node, port in enumerate(ports):
+        env = dict(
+            os.environ,
+            SERVER_HOST="127.0.0.1",
+            SERVER_PORT=str(port),
+            CLUSTER_NODES=router_nodes,
+            CLUSTER_NODE=str(node),
+            CLUSTER_SECRET=secret,
+            LOG_LEVEL="WARNING",
+        )
+        processes.append(
+            subprocess.Popen(
+                [sys.executable, str(RCR_BIN), "-s"],
+                env=env,
+                stdout=subprocess.DEVNULL,
+                preexec_fn=limit_files if fd_limit else None,
+            )
+        )
+
+    deadline = time.monotonic() + timeout
+    if not all(_wait_for_port(port, deadline) for port in ports):
+        stop_cluster(processes)
+        raise TimeoutError("cluster is not ready after %s seconds." % timeout)
+    return processes, ports
+
+
+def stop_cluster(processes: List[subprocess.Popen], timeout: float = 10.0):
+    """Stop cluster nodes.
+
+    Args:
+        processes (List[subprocess.Popen]): node processes.
+        timeout (float): seconds to wait for a node before killing it.
+    """
+    for process in processes:
+        if process.poll() is None:
+            process.send_signal(signal.SIGINT)
+    for process in processes:
+        try:
+            process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+class LineClient:
+    """A minimal blocking telnet-like client."""
+
+    def __init__(self, host: str, port: int):
+        """Connect to the server and read the assigned client ID.
+
+        Args:
+            host (str): server host.
+            port (int): server port.
+        """
+        self.sock = socket.create_connection((host, port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # A client which speaks first doesn't wait for the protocol negotiation.
+        self.sock.sendall(b"\r\n")
+        self._buffer = b""
+
+        line = self.read_line()
+        while not line.startswith("Your client ID:"):
+            line = self.read_line()
+        self.client_id = int(line.rsplit(" ", 1)[1])
+
+    def send_line(self, text: str):
+        """Send a single command line.
+
+        Args:
+            text (str): command text.
+        """
+        self.sock.sendall(text.encode() + b"\r\n")
+
+    def read_line(self) -> str:
+        """Read a single non-empty line.
+
+        Returns:
+            str: received line without line break.
+        """
+        while True:
+            while b"\n" not in self._buffer:
+                data = self.sock.recv(65536)
+                if not data:
+                    raise ConnectionResetError("server closed the connection.")
+                self._buffer += data
+            line, self._buffer = self._buffer.split(b"\n", 1)
+            line = line.strip()
+            if line:
+                return line.decode()
+
+    def close(self):
+        """Close the connection."""
+        self.sock.close()
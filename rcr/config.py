@@ -1,18 +1,102 @@
 """Config file."""
 import os
+import tempfile
 
-from rcr.type import Protocol
+from rcr.type import MailboxPolicy, Protocol, SlowConsumerPolicy
 
 SERVER_HOST = os.environ.get("SERVER_HOST", "127.0.0.1")
 SERVER_PORT = int(os.environ.get("SERVER_PORT", "9171"))
+SERVER_WORKERS = int(os.environ.get("SERVER_WORKERS", "1"))
+# Workers of a server talk to each other through Unix sockets in this directory.
+ROUTER_DIR = os.environ.get("ROUTER_DIR", tempfile.gettempdir())
+# Router address of every cluster node in "host:port" format, separated by commas.
+CLUSTER_NODES = [node for node in os.environ.get("CLUSTER_NODES", "").split(",") if node]
+# Index of this node in CLUSTER_NODES.
+CLUSTER_NODE = int(os.environ.get("CLUSTER_NODE", "0"))
+# Shared secret of the cluster's routers, a server with CLUSTER_NODES doesn't start without it.
+CLUSTER_SECRET = os.environ.get("CLUSTER_SECRET", "")
 CONNECTION_DRIVER = os.environ.get("CONNECTION_DRIVER", "socket")
 CONNECTION_PROTOCOL = getattr(Protocol, os.environ.get("CONNECTION_PROTOCOL", "TCP"))
+MAX_LINE_LENGTH = int(os.environ.get("MAX_LINE_LENGTH", "4096"))
+SEND_HIGH_WATER_MARK = int(os.environ.get("SEND_HIGH_WATER_MARK", str(1024 * 1024)))
+SLOW_CONSUMER_POLICY = getattr(
+    SlowConsumerPolicy, os.environ.get("SLOW_CONSUMER_POLICY", "DISCONNECT")
+)
+BROADCAST_WRITERS = int(os.environ.get("BROADCAST_WRITERS", "1"))
+# Seconds to close a quiet TCP connection, and to ping it; 0 disables them.
+IDLE_TIMEOUT = float(os.environ.get("IDLE_TIMEOUT", "0"))
+PING_INTERVAL = float(os.environ.get("PING_INTERVAL", "0"))
+# Serve metrics at http://METRICS_HOST:METRICS_PORT/metrics, 0 disables it. A server
+# with several workers uses consecutive ports.
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+# Maximum pending messages of an actor, 0 is unbounded. The server stops reading from
+# connections while the Command actor's mailbox is over three quarters of it.
+ACTOR_MAILBOX_SIZE = int(os.environ.get("ACTOR_MAILBOX_SIZE", "10000"))
+# What the Command and Message actors do with a message which finds their mailbox full:
+# BLOCK, DROP_OLDEST or REJECT.
+ACTOR_MAILBOX_POLICY = getattr(MailboxPolicy, os.environ.get("ACTOR_MAILBOX_POLICY", "BLOCK"))
+# Trace actor messages and log the ones which take more than this many milliseconds
+# from enqueue to the end of processing; 0 disables it. SIGUSR2 turns it off, or on with this
+# threshold (100 ms when it's 0), at runtime.
+ACTOR_TRACE_THRESHOLD = float(os.environ.get("ACTOR_TRACE_THRESHOLD", "0"))
+# Number of Command actors. A client's commands are always handled by the same one, in
+# order, and the clients are spread over them.
+COMMAND_ACTORS = int(os.environ.get("COMMAND_ACTORS", "1"))
+# Pending commands of a single client which pause reading from its connection, 0 disables it.
+CLIENT_PENDING_COMMANDS = int(os.environ.get("CLIENT_PENDING_COMMANDS", "256"))
+# Commands per second a client can send on average, 0 is unlimited, and how many it can
+# send at once after being idle. Commands over the limit get an error reply.
+CLIENT_RATE_LIMIT = float(os.environ.get("CLIENT_RATE_LIMIT", "0"))
+CLIENT_RATE_BURST = int(os.environ.get("CLIENT_RATE_BURST", "20"))
+# Seconds a UDP session lives without receiving a datagram.
+UDP_SESSION_TIMEOUT = float(os.environ.get("UDP_SESSION_TIMEOUT", "60"))
+FIB_MAX_N = int(os.environ.get("FIB_MAX_N", "1000000"))
+# Python 3.11+ can't convert results above 20000 to str in the server process.
+FIB_INLINE_MAX_N = int(os.environ.get("FIB_INLINE_MAX_N", "10000"))
+FIB_WORKERS = int(os.environ.get("FIB_WORKERS", "2"))
+FIB_CACHE_SIZE = int(os.environ.get("FIB_CACHE_SIZE", "128"))
+URL_WORKERS = int(os.environ.get("URL_WORKERS", "8"))
+URL_TIMEOUT = float(os.environ.get("URL_TIMEOUT", "10"))
+URL_CACHE_TTL = float(os.environ.get("URL_CACHE_TTL", "60"))
+URL_CACHE_SIZE = int(os.environ.get("URL_CACHE_SIZE", "1024"))
+# Seconds a `url` fetch may take in total, and the maximum page size in bytes.
+URL_DEADLINE = float(os.environ.get("URL_DEADLINE", "30"))
+URL_MAX_SIZE = int(os.environ.get("URL_MAX_SIZE", str(100 * 1024 * 1024)))
+# Directory of the offline message store, "" disables it. Direct messages to a client which
+# has left after an `identify <name> <token>` are kept there until a client identifies as
+# <name> with the same token.
+OFFLINE_DIR = os.environ.get("OFFLINE_DIR", "")
+OFFLINE_SEGMENT_SIZE = int(os.environ.get("OFFLINE_SEGMENT_SIZE", str(4 * 1024 * 1024)))
+# Stored messages per identity, older ones are dropped; 0 is unlimited.
+OFFLINE_MAX_MESSAGES = int(os.environ.get("OFFLINE_MAX_MESSAGES", "1000"))
+# Seconds a stored message is kept, 0 is forever.
+OFFLINE_TTL = float(os.environ.get("OFFLINE_TTL", str(7 * 24 * 3600)))
+# Threads which hash the tokens of `identify`, it takes tens of milliseconds.
+IDENTIFY_WORKERS = int(os.environ.get("IDENTIFY_WORKERS", "2"))
+# Directory of the chat history, "" disables it. Every message and broadcast is appended
+# to it, and clients read it back with `history`.
+HISTORY_DIR = os.environ.get("HISTORY_DIR", "")
+HISTORY_SEGMENT_SIZE = int(os.environ.get("HISTORY_SEGMENT_SIZE", str(16 * 1024 * 1024)))
+# Segments to keep, older ones are deleted; 0 keeps all of them.
+HISTORY_MAX_SEGMENTS = int(os.environ.get("HISTORY_MAX_SEGMENTS", "64"))
+# Maximum messages a `history` command returns.
+HISTORY_QUERY_LIMIT = int(os.environ.get("HISTORY_QUERY_LIMIT", "1000"))
+# Log records wait in a queue of this size for the writer thread, then they're dropped.
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+# Also log to this file, rotated at LOG_FILE_MAX_BYTES; "" disables it. Server workers
+# append their number to it.
+LOG_FILE = os.environ.get("LOG_FILE", "")
+LOG_FILE_MAX_BYTES = int(os.environ.get("LOG_FILE_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_FILE_BACKUPS = int(os.environ.get("LOG_FILE_BACKUPS", "5"))
 LOGGING = {
     "version": 1,
-    "formatters": {"default": {"format": "%(asctime)s: %(message)s"}},
+    "formatters": {
+        "default": {"()": "rcr.log.Formatter", "format": "%(asctime)s: %(message)s"}
+    },
     "handlers": {
         "console": {
-            "class": "logging.StreamHandler",
+            "class": "rcr.log.BatchStreamHandler",
             "formatter": "default",
             "level": os.environ.get("LOG_LEVEL", "INFO"),
         }
@@ -1,6 +1,8 @@
 """Connection package."""
+from .asyncio_client import AsyncioClient
+from .asyncio_server import AsyncioServer
 from .connection import new_connection
 from .socket_client import SocketClient
 from .socket_server import SocketServer
 
-__all__ = ["SocketServer", "SocketClient", "new_connection"]
+__all__ = ["SocketServer", "SocketClient", "AsyncioServer", "AsyncioClient", "new_connection"]
@@ -0,0 +1,81 @@
+"""Asyncio client implementation."""
+import asyncio
+
+from rcr.exception import CloseConnectionError, ConnectionError
+from rcr.type import ConnectionEvent
+
+from .base_client import BaseClient
+
+
+class AsyncioClient(BaseClient):
+    """Asyncio streams client implementation class."""
+
+    def setup(self):
+        """Initialize the event loop related attributes."""
+        self._loop = None
+        self._reader = None
+        self._receive_task = None
+
+    def connect(self):
+        """Connect to a port and receive messages until shutdown."""
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(self._run())
+        finally:
+            self._loop.close()
+
+    async def _run(self):
+        """Open the connection and run the receiver."""
+        try:
+            self._reader, self._conn = await asyncio.open_connection(self.host, self.port)
+        except OSError as e:
+            self.close()
+            raise ConnectionError(str(e))
+
+        # Event callback.
+        self.event_callback[ConnectionEvent.ON_CONNECT](self._conn)
+
+        self._receive_task = asyncio.ensure_future(self.receive(self._reader))
+        if self._shutdown:
+            self._receive_task.cancel()
+        try:
+            await self._receive_task
+        except asyncio.CancelledError:
+            pass
+        self.close()
+
+    def shutdown(self):
+        """Triggers the shutdown flag and stops the receiver."""
+        super().shutdown()
+        if self._loop and self._receive_task and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._receive_task.cancel)
+
+    def close(self):
+        """Close the connection."""
+        if self._conn:
+            try:
+                self._conn.close()
+            except Exception as e:  # TODO: no general exception!
+                raise CloseConnectionError(str(e))
+
+        # Event callback.
+        self.event_callback[ConnectionEvent.ON_DISCONNECT](self._conn)
+
+    def send(self, message: str):
+        """Send a message."""
+        self._loop.call_soon_threadsafe(self._conn.write, message.encode())
+
+    async def receive(self, reader: asyncio.StreamReader):
+        """Receive messages."""
+        while True:
+            data = await reader.read(1024)
+            if not data:
+                return
+
+            try:
+                message = data.decode().strip()
+            except UnicodeDecodeError:
+                message = str(data)
+
+            # Event callback.
+            self.event_callback[ConnectionEvent.ON_MESSAGE](self._conn, message)
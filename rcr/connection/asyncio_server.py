@@ -0,0 +1,268 @@
+"""Asyncio server implementation."""
+import asyncio
+import socket
+import time
+from typing import Any, Iterable, Tuple, Union
+
+from rcr.exception import (
+    BindError,
+    CloseBindError,
+    CloseConnectionError,
+    FrameTooLongError,
+)
+from rcr.type import ConnectionEvent, SlowConsumerPolicy
+
+from .base_server import BaseServer
+from .framing import LineBuffer
+from .liveness import Liveness
+
+
+class AsyncioServer(BaseServer):
+    """Asyncio streams server implementation class.
+
+    The event loop runs in the thread which calls `bind`. Other threads (actors)
+    talk to it through `send`, `close_connection` and `shutdown`, which are all
+    thread-safe.
+
+    A client connection fires a disconnect event when its handler finishes.
+    Quiet connections can be pinged and closed (see `Liveness`).
+    """
+
+    # Maximum length of a command line. It can be overridden by kwargs.
+    max_line_length = 4096
+
+    # Maximum queued outbound bytes per connection. It can be overridden by kwargs.
+    send_high_water_mark = 1024 * 1024
+
+    # What to do with a connection over the high-water mark. It can be overridden by kwargs.
+    slow_consumer_policy = SlowConsumerPolicy.DISCONNECT
+
+    # Seconds to close a quiet connection, 0 disables it. It can be overridden by kwargs.
+    idle_timeout = 0
+
+    # Seconds to ping a quiet connection, 0 disables it. It can be overridden by kwargs.
+    ping_interval = 0
+
+    def setup(self):
+        """Initialize the event loop related attributes."""
+        self._loop = None
+        self._server = None
+        self._stop = None
+        # Paused connections wait for it, `resume_reading` sets it.
+        self._resumed = None
+        self._connections = {}
+        self._liveness = Liveness(self.idle_timeout, self.ping_interval)
+
+        # Metrics.
+        self.dropped_messages = 0
+        self.slow_consumers = 0
+        self.register_metrics(lambda: len(self._connections))
+        self.metrics.counter(
+            "rcr_slow_consumers_total",
+            "Connections which have been closed for not reading fast enough.",
+            fn=lambda: self.slow_consumers,
+        )
+
+    @property
+    def queued_bytes(self) -> int:
+        """Total outbound bytes waiting in connection buffers."""
+        return sum(
+            writer.transport.get_write_buffer_size() for writer in list(self._connections)
+        )
+
+    def bind(self):
+        """Bind a specific port and serve connections until shutdown."""
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(self._serve())
+        finally:
+            self._loop.close()
+
+    async def _serve(self):
+        """Start the server and wait for the shutdown signal."""
+        self._stop = asyncio.Event()
+        self._resumed = asyncio.Event()
+        try:
+            self._server = await asyncio.start_server(
+                self.receive,
+                self.host,
+                self.port,
+                backlog=1024,
+                reuse_port=self.reuse_port or None,
+            )
+        except OSError as e:
+            self.close()
+            raise BindError(str(e))
+        self._conn = self._server.sockets[0]
+
+        # Event callback.
+        self.event_callback[ConnectionEvent.ON_BIND](self._conn)
+
+        reaper = None
+        if self.idle_timeout or self.ping_interval:
+            reaper = asyncio.ensure_future(self._check_liveness())
+
+        # Shutdown may have been requested before the loop was ready.
+        if not self._shutdown:
+            await self._stop.wait()
+        if reaper:
+            reaper.cancel()
+
+        # Close client connections and let their handlers finish.
+        self._server.close()
+        for writer in list(self._connections):
+            writer.close()
+        await asyncio.gather(*self._connections.values(), return_exceptions=True)
+        await self._server.wait_closed()
+        self.close()
+
+    async def _check_liveness(self):
+        """Ping and close quiet connections until the server stops."""
+        liveness = self._liveness
+        interval = min(value for value in (self.idle_timeout, self.ping_interval) if value)
+        while True:
+            deadline = liveness.next_deadline()
+            # A connection which joins meanwhile isn't due before `interval`.
+            await asyncio.sleep(interval if deadline is None else deadline - time.monotonic())
+            to_ping, to_close = liveness.expire(time.monotonic())
+            for writer in to_ping:
+                self._write(writer, b"\r\n")
+            for writer in to_close:
+                writer.close()
+
+    def shutdown(self):
+        """Triggers the shutdown flag and wakes up the event loop."""
+        super().shutdown()
+        if self._loop and self._stop and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+    def resume_reading(self):
+        """Resume reading paused connections."""
+        if self._loop and self._resumed and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._resumed.set)
+
+    async def receive(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve a client connection.
+
+        Args:
+            reader (asyncio.StreamReader): connection reader.
+            writer (asyncio.StreamWriter): connection writer. It's used as the
+                connection object in the event callbacks.
+        """
+        sock = writer.get_extra_info("socket")
+        if sock is not None and sock.family in (socket.AF_INET, socket.AF_INET6):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        self._connections[writer] = asyncio.current_task()
+        self._liveness.add(writer, time.monotonic())
+
+        # Event callback.
+        self.event_callback[ConnectionEvent.ON_JOIN](
+            writer, writer.get_extra_info("peername")
+        )
+
+        line_buffer = LineBuffer(self.max_line_length)
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                self._liveness.touch(writer, time.monotonic())
+                self._received_bytes.inc(len(data))
+
+                lines = line_buffer.feed(data)
+                self._received_messages.inc(len(lines))
+                for line in lines:
+                    try:
+                        message = line.decode().strip()
+                    except UnicodeDecodeError:
+                        message = str(line)
+
+                    # Event callback.
+                    if self.event_callback[ConnectionEvent.ON_MESSAGE](writer, message) is False:
+                        # Pause the connection, the rest of its lines wait here.
+                        self._resumed.clear()
+                        await self._resumed.wait()
+                        self._liveness.touch(writer, time.monotonic())
+        except (ConnectionError, FrameTooLongError):
+            pass
+        finally:
+            del self._connections[writer]
+            self._liveness.remove(writer)
+            writer.close()
+
+            # Event callback.
+            self.event_callback[ConnectionEvent.ON_DISCONNECT](writer)
+
+    def close(self):
+        """Close the bound connection."""
+        if self._server:
+            try:
+                self._server.close()
+            except Exception as e:  # TODO: no general exception!
+                raise CloseBindError(str(e))
+
+        # Event callback.
+        self.event_callback[ConnectionEvent.ON_DISCONNECT](self._conn)
+
+    def close_connection(self, conn: asyncio.StreamWriter):
+        """Close a specific connection."""
+        try:
+            self._loop.call_soon_threadsafe(conn.close)
+        except Exception as e:
+            raise CloseConnectionError(str(e))
+
+    def send(
+        self, user_connection: Tuple[Tuple[str, int], Any], message: Union[str, bytes]
+    ):
+        """Send a message to a user connection.
+
+        Args:
+            user_connection (Tuple[Tuple[str, int], Any]): user connection info.
+            message (Union[str, bytes]): message payload.
+        """
+        data = message.encode() if isinstance(message, str) else message
+        self._loop.call_soon_threadsafe(self._write, user_connection[1], data)
+
+    def send_many(
+        self,
+        user_connections: Iterable[Tuple[Tuple[str, int], Any]],
+        message: Union[str, bytes],
+    ):
+        """Send the same message to several user connections in one loop callback.
+
+        Args:
+            user_connections (Iterable[Tuple[Tuple[str, int], Any]]): users connection info.
+            message (Union[str, bytes]): message payload.
+        """
+        data = message.encode() if isinstance(message, str) else message
+        writers = [user_connection[1] for user_connection in user_connections]
+        self._loop.call_soon_threadsafe(self._write_many, writers, data)
+
+    def _write_many(self, writers, data: bytes):
+        """Write the same payload to several connections in the event loop.
+
+        Args:
+            writers (List[asyncio.StreamWriter]): connection writers.
+            data (bytes): payload.
+        """
+        for writer in writers:
+            self._write(writer, data)
+
+    def _write(self, writer: asyncio.StreamWriter, data: bytes):
+        """Write to a connection in the event loop, unless it's a slow consumer.
+
+        Args:
+            writer (asyncio.StreamWriter): connection writer.
+            data (bytes): payload.
+        """
+        if writer.is_closing():
+            return
+        if writer.transport.get_write_buffer_size() + len(data) > self.send_high_water_mark:
+            self.dropped_messages += 1
+            if self.slow_consumer_policy is SlowConsumerPolicy.DISCONNECT:
+                self.slow_consumers += 1
+                writer.transport.abort()
+            return
+        writer.write(data)
+        self._sent_bytes.inc(len(data))
@@ -5,8 +5,9 @@ All server connection classes must implement this class.
 import os
 import socket
 from abc import abstractmethod
-from collections import Callable
-from typing import Any, NoReturn, Tuple
+from typing import Any, Callable, Iterable, NoReturn, Tuple, Union
+
+from rcr.metrics import Registry
 
 from .base import Base
 
@@ -14,11 +15,50 @@ from .base import Base
 class BaseServer(Base):
     """Base Connection server class."""
 
+    # Share the port with other processes (SO_REUSEPORT). It can be overridden by kwargs.
+    reuse_port = False
+
+    # Metrics registry, the server has its own one if it isn't given by kwargs.
+    metrics = None
+
+    def register_metrics(self, connections: Callable[[], int]):
+        """Register the metrics which all servers have.
+
+        It sets `metrics`, and the `_received_bytes`, `_received_messages` and
+        `_sent_bytes` counters which the server should update.
+
+        Args:
+            connections (Callable[[], int]): it returns the number of open connections.
+        """
+        if self.metrics is None:
+            self.metrics = Registry()
+        metrics = self.metrics
+        metrics.gauge("rcr_connections", "Open client connections.", fn=connections)
+        self._received_bytes = metrics.counter(
+            "rcr_received_bytes_total", "Bytes received from clients."
+        )
+        self._received_messages = metrics.counter(
+            "rcr_received_messages_total", "Command lines and frames received from clients."
+        )
+        self._sent_bytes = metrics.counter(
+            "rcr_sent_bytes_total", "Bytes queued to be sent to clients."
+        )
+        metrics.counter(
+            "rcr_dropped_messages_total",
+            "Messages which have been dropped instead of sent.",
+            fn=lambda: self.dropped_messages,
+        )
+
     def check_availability(self):
         """Check resource availability.
 
         Raises: ConnectionError when resources are already used.
+
+        Note:
+            The port is expected to be used by other workers when `reuse_port` is set.
         """
+        if self.reuse_port:
+            return
         sock_obj = socket.socket(socket.AF_INET, self.protocol.value)
         if sock_obj.connect_ex((self.host, self.port)) == 0:
             raise ConnectionError(
@@ -62,17 +102,59 @@ class BaseServer(Base):
         """
 
     @abstractmethod
-    def send(self, user_connection: Tuple[Tuple[str, int], Any], message: str):
+    def send(self, user_connection: Tuple[Tuple[str, int], Any], message: Union[str, bytes]):
         """Send a message.
 
         Args:
             user_connection (Tuple[Tuple[str, int], Any]): user connection info.
-            message (str): message payload to be send.
+            message (Union[str, bytes]): message payload to be send.
 
         Returns:
             bool: sending process was successful or not.
         """
 
+    def send_many(
+        self,
+        user_connections: Iterable[Tuple[Tuple[str, int], Any]],
+        message: Union[str, bytes],
+    ):
+        """Send the same message to several user connections.
+
+        Args:
+            user_connections (Iterable[Tuple[Tuple[str, int], Any]]): users connection info.
+            message (Union[str, bytes]): message payload.
+
+        Note:
+            This method can be overridden if the driver can do it faster.
+        """
+        data = message.encode() if isinstance(message, str) else message
+        for user_connection in user_connections:
+            self.send(user_connection, data)
+
+    def resume_reading(self):
+        """Resume reading connections which have been paused.
+
+        A message event callback which returns False asks the server to stop
+        reading from that connection, and this method resumes all of them.
+
+        Note:
+            Drivers which can pause reading override this method.
+        """
+
+    def is_binary(self, conn: Any) -> bool:
+        """Return True if a connection speaks the binary protocol.
+
+        Args:
+            conn (Any): a connection object.
+
+        Returns:
+            bool: the connection is binary or not.
+
+        Note:
+            Drivers which support the binary protocol override this method.
+        """
+        return False
+
     @abstractmethod
     def receive(self, callback: Callable) -> NoReturn:
         """Receive messages.
@@ -0,0 +1,128 @@
+"""Binary wire protocol module.
+
+A connection speaks the binary protocol when its first byte is `MAGIC`,
+otherwise it speaks the telnet line protocol. A binary frame is a fixed
+header followed by its payload:
+
+    +----------------+--------+----------------+----------------+---------+
+    | payload length | opcode | target ID      | sender ID      | payload |
+    | uint32         | uint8  | uint32         | uint32         | bytes   |
+    +----------------+--------+----------------+----------------+---------+
+
+All numbers are in network byte order. Client frames carry a command
+(see `rcr.type.Opcode`) and its target client ID, the server fills the sender
+ID. Server frames are `Opcode.MESSAGE` frames with the recipient as target,
+and a sender ID of 0 for server replies.
+"""
+import struct
+from typing import List, NamedTuple, Union
+
+from rcr.exception import FrameTooLongError
+
+# The first byte of a binary connection. It's not valid as the first byte of
+# UTF-8 text, so it can't be confused with a telnet client.
+MAGIC = 0xB1
+
+HEADER = struct.Struct("!IBII")
+
+
+class Frame(NamedTuple):
+    """A decoded binary frame."""
+
+    opcode: int
+    target: int
+    sender: int
+    payload: str
+
+
+def encode_frame(opcode: int, target: int = 0, sender: int = 0, payload: bytes = b"") -> bytes:
+    """Encode a binary frame.
+
+    Args:
+        opcode (int): frame opcode.
+        target (int): target client ID. Defaults to 0.
+        sender (int): sender client ID. Defaults to 0.
+        payload (bytes): payload. Defaults to b"".
+
+    Returns:
+        bytes: encoded frame.
+    """
+    return HEADER.pack(len(payload), opcode, target, sender) + payload
+
+
+class FrameBuffer:
+    """Per-connection binary frame reassembly buffer.
+
+    It's the binary counterpart of `LineBuffer`. Frames are decoded in place
+    from the received chunk, and only an incomplete tail is copied to the
+    buffer to wait for the rest of it.
+    """
+
+    __slots__ = ("max_payload_length", "_buffer")
+
+    def __init__(self, max_payload_length: int = 4096):
+        """Initialize the class.
+
+        Args:
+            max_payload_length (int): maximum length of a frame payload. Defaults to 4096.
+        """
+        self.max_payload_length = max_payload_length
+        self._buffer = bytearray()
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def feed(self, data: Union[bytes, bytearray, memoryview]) -> List[Frame]:
+        """Append a received chunk and return completed frames.
+
+        Args:
+            data (Union[bytes, bytearray, memoryview]): received chunk.
+
+        Returns:
+            List[Frame]: completed frames. Payloads which aren't valid UTF-8 are
+                decoded with replacement characters.
+
+        Raises:
+            FrameTooLongError: when a payload exceeds the maximum payload length.
+        """
+        if self._buffer:
+            self._buffer += data
+            view = memoryview(self._buffer)
+        else:
+            # Nothing is pending, so decode the chunk itself.
+            view = memoryview(data)
+
+        frames = []
+        append = frames.append
+        unpack_from = HEADER.unpack_from
+        header_size = HEADER.size
+        max_payload_length = self.max_payload_length
+        # It skips the NamedTuple constructor, which is slow on this path.
+        new_frame = tuple.__new__
+        begin = 0
+        end = len(view)
+        try:
+            while end - begin >= header_size:
+                length, opcode, target, sender = unpack_from(view, begin)
+                if length > max_payload_length:
+                    raise FrameTooLongError(
+                        "frame payload is longer than %d bytes." % max_payload_length
+                    )
+                start = begin + header_size
+                if end - start < length:
+                    break
+                begin = start + length
+                payload = str(view[start:begin], "utf-8", "replace")
+                append(new_frame(Frame, (opcode, target, sender, payload)))
+
+            tail = bytes(view[begin:])
+        finally:
+            # The buffer can't be resized while it's viewed.
+            view.release()
+
+        self._buffer[:] = tail
+        return frames
+
+    def clear(self):
+        """Drop buffered data."""
+        self._buffer.clear()
@@ -3,12 +3,13 @@ import importlib
 from typing import Callable, DefaultDict, Optional
 
 from rcr import config
-from rcr.type import ConnectionEvent
+from rcr.type import ConnectionEvent, Protocol
 
 
 def new_connection(
     is_server: bool = False,
     event_callback: Optional[DefaultDict[ConnectionEvent, Callable]] = None,
+    **kwargs
 ):
     """Create new connection driver.
 
@@ -16,23 +17,44 @@ def new_connection(
         is_server (bool): the connection should be in a server mode or not. Defaults to None.
         event_callback (Optional[DefaultDict[ConnectionEvent, Callable]]): connection events
             callback. Defaults to None.
+        **kwargs: extra driver config, it overrides the config file.
 
     Returns:
         Base: a new connection driver instance.
+
+    Note:
+        Datagram sockets have their own driver, so `CONNECTION_DRIVER` is ignored
+        with the UDP protocol.
     """
+    driver = config.CONNECTION_DRIVER
+    if config.CONNECTION_PROTOCOL is Protocol.UDP:
+        driver = "udp"
+
     if not is_server:
-        module = "rcr.connection.{}_client".format(config.CONNECTION_DRIVER)
-        cls_name = "{}Client".format(config.CONNECTION_DRIVER.title())
+        module = "rcr.connection.{}_client".format(driver)
+        cls_name = "{}Client".format(driver.title())
     else:
-        module = "rcr.connection.{}_server".format(config.CONNECTION_DRIVER)
-        cls_name = "{}Server".format(config.CONNECTION_DRIVER.title())
+        module = "rcr.connection.{}_server".format(driver)
+        cls_name = "{}Server".format(driver.title())
 
     imp = importlib.import_module(module, cls_name)
     cls = getattr(imp, cls_name)
 
+    options = dict(
+        max_line_length=config.MAX_LINE_LENGTH,
+        send_high_water_mark=config.SEND_HIGH_WATER_MARK,
+        slow_consumer_policy=config.SLOW_CONSUMER_POLICY,
+        broadcast_writers=config.BROADCAST_WRITERS,
+        idle_timeout=config.IDLE_TIMEOUT,
+        ping_interval=config.PING_INTERVAL,
+        session_timeout=config.UDP_SESSION_TIMEOUT,
+    )
+    options.update(kwargs)
+
     return cls(
         config.SERVER_HOST,
         config.SERVER_PORT,
         config.CONNECTION_PROTOCOL,
         event_callback,
+        **options,
     )
@@ -0,0 +1,70 @@
+"""Stream framing module."""
+from typing import List, Union
+
+from rcr.exception import FrameTooLongError
+
+
+class LineBuffer:
+    """Per-connection line reassembly buffer.
+
+    A stream connection delivers arbitrary chunks, so a command can be split
+    into several chunks or several pipelined commands can arrive in one. This
+    buffer keeps the incomplete tail of the stream and returns complete lines
+    terminated by `\\n` or `\\r\\n`.
+    """
+
+    __slots__ = ("max_line_length", "_buffer")
+
+    def __init__(self, max_line_length: int = 4096):
+        """Initialize the class.
+
+        Args:
+            max_line_length (int): maximum length of a line without its line break.
+                Defaults to 4096.
+        """
+        self.max_line_length = max_line_length
+        self._buffer = bytearray()
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def feed(self, data: Union[bytes, bytearray, memoryview]) -> List[bytes]:
+        """Append a received chunk and return completed lines.
+
+        Args:
+            data (Union[bytes, bytearray, memoryview]): received chunk.
+
+        Returns:
+            List[bytes]: completed lines without line breaks. Empty lines are skipped.
+
+        Raises:
+            FrameTooLongError: when a line exceeds the maximum line length.
+        """
+        buffer = self._buffer
+        start = len(buffer)
+        buffer += data
+
+        lines = []
+        begin = 0
+        # Line breaks can only be in the new part, the rest was scanned already.
+        end = buffer.find(b"\n", start)
+        while end != -1:
+            line_end = end - 1 if end > begin and buffer[end - 1] == 13 else end  # b"\r"
+            if line_end - begin > self.max_line_length:
+                raise FrameTooLongError(
+                    "line is longer than %s bytes." % self.max_line_length
+                )
+            if line_end > begin:
+                lines.append(bytes(buffer[begin:line_end]))
+            begin = end + 1
+            end = buffer.find(b"\n", begin)
+
+        if begin:
+            del buffer[:begin]
+        if len(buffer) > self.max_line_length + 1:  # +1 for a pending b"\r".
+            raise FrameTooLongError("line is longer than %s bytes." % self.max_line_length)
+        return lines
+
+    def clear(self):
+        """Drop any incomplete data."""
+        self._buffer.clear()
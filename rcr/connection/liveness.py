@@ -0,0 +1,141 @@
+"""Connection liveness module."""
+import heapq
+from itertools import count
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class Liveness:
+    """Idle timeouts and keep-alive pings of server connections.
+
+    A connection is pinged after `ping_interval` seconds without receiving
+    anything, and again every `ping_interval` seconds while it keeps quiet, so
+    a dead peer surfaces as a write error. It's closed after `idle_timeout`
+    seconds without receiving anything. Either of them is disabled when it's 0.
+
+    Received data only updates a timestamp. Every connection has one entry in
+    a heap of deadlines, and it's checked and moved to its next deadline only
+    when it's due, so the heap isn't touched per message.
+    """
+
+    __slots__ = ("idle_timeout", "ping_interval", "_heap", "_state", "_sequence")
+
+    def __init__(self, idle_timeout: float = 0, ping_interval: float = 0):
+        """Initialize the class.
+
+        Args:
+            idle_timeout (float): seconds to close a quiet connection. Defaults to 0.
+            ping_interval (float): seconds to ping a quiet connection. Defaults to 0.
+        """
+        if idle_timeout < 0 or ping_interval < 0:
+            raise ValueError("idle_timeout and ping_interval can't be negative.")
+
+        self.idle_timeout = idle_timeout
+        self.ping_interval = ping_interval
+
+        # (deadline, sequence, connection); sequence keeps connections out of comparisons.
+        self._heap: List[Tuple[float, int, Any]] = []
+        # Connection -> [last activity, last ping, sequence of its heap entry].
+        self._state: Dict[Any, List] = {}
+        self._sequence = count()
+
+    def __len__(self) -> int:
+        return len(self._state)
+
+    def _deadline(self, state: List) -> float:
+        """Return the time of the next check of a connection.
+
+        Args:
+            state (List): connection state.
+
+        Returns:
+            float: monotonic time.
+        """
+        deadlines = []
+        if self.idle_timeout:
+            deadlines.append(state[0] + self.idle_timeout)
+        if self.ping_interval:
+            deadlines.append(max(state[0], state[1]) + self.ping_interval)
+        return min(deadlines)
+
+    def _schedule(self, conn: Any, state: List):
+        """Push the next heap entry of a connection.
+
+        Args:
+            conn (Any): a connection object.
+            state (List): connection state.
+        """
+        state[2] = next(self._sequence)
+        heapq.heappush(self._heap, (self._deadline(state), state[2], conn))
+
+    def add(self, conn: Any, now: float):
+        """Start watching a connection.
+
+        Args:
+            conn (Any): a connection object.
+            now (float): monotonic time.
+        """
+        if not (self.idle_timeout or self.ping_interval):
+            return
+        state = [now, 0.0, 0]
+        self._state[conn] = state
+        self._schedule(conn, state)
+
+    def touch(self, conn: Any, now: float):
+        """Record activity of a connection.
+
+        Args:
+            conn (Any): a connection object.
+            now (float): monotonic time.
+        """
+        state = self._state.get(conn)
+        if state is not None:
+            state[0] = now
+
+    def remove(self, conn: Any):
+        """Stop watching a connection. Its heap entry is dropped when it's due.
+
+        Args:
+            conn (Any): a connection object.
+        """
+        self._state.pop(conn, None)
+
+    def next_deadline(self) -> Optional[float]:
+        """Return the time of the earliest check.
+
+        Returns:
+            Optional[float]: monotonic time, or None if no connection is watched.
+        """
+        heap = self._heap
+        # Drop entries of removed connections, so an idle server sleeps.
+        while heap and self._state.get(heap[0][2], (0, 0, -1))[2] != heap[0][1]:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def expire(self, now: float) -> Tuple[List[Any], List[Any]]:
+        """Collect connections which are due.
+
+        Args:
+            now (float): monotonic time.
+
+        Returns:
+            Tuple[List[Any], List[Any]]: connections to ping, and connections to
+                close. The latter aren't watched anymore.
+        """
+        to_ping, to_close = [], []
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            _, sequence, conn = heapq.heappop(heap)
+            state = self._state.get(conn)
+            if state is None or state[2] != sequence:
+                # It has been removed, or it's been re-added since.
+                continue
+
+            if self.idle_timeout and now >= state[0] + self.idle_timeout:
+                del self._state[conn]
+                to_close.append(conn)
+                continue
+            if self.ping_interval and now >= max(state[0], state[1]) + self.ping_interval:
+                state[1] = now
+                to_ping.append(conn)
+            self._schedule(conn, state)
+        return to_ping, to_close
@@ -1,19 +1,33 @@
 """Socket client implementation."""
 import selectors
 import socket
+from typing import Union
 
 from rcr.exception import CloseConnectionError, ConnectionError
-from rcr.type import ConnectionEvent
+from rcr.type import ConnectionEvent, Opcode
 
 from .base_client import BaseClient
+from .binary import MAGIC, FrameBuffer, encode_frame
 
 
 class SocketClient(BaseClient):
-    """Socket client implementation class."""
+    """Socket client implementation class.
+
+    In binary mode it negotiates the binary protocol right after connecting,
+    fires a message event per received `binary.Frame` and sends commands with
+    `send_frame`.
+    """
+
+    # Speak the binary protocol. It can be overridden by kwargs.
+    binary = False
+
+    # Maximum length of a received frame payload, Fibonacci results can be big.
+    max_payload_length = 64 * 1024 * 1024
 
     def __init__(self, *args, **kwargs):
         self._selector = selectors.DefaultSelector()
         super().__init__(*args, **kwargs)
+        self._frame_buffer = FrameBuffer(self.max_payload_length)
 
     def connect(self):
         """Connect to a port to send requests."""
@@ -23,6 +37,8 @@ class SocketClient(BaseClient):
         except OSError as e:
             self.close()
             raise ConnectionError(str(e))
+        if self.binary:
+            self._conn.sendall(bytes((MAGIC,)))
         self._conn.setblocking(False)
         self._selector.register(self._conn, selectors.EVENT_READ, self.receive)
 
@@ -60,16 +76,39 @@ class SocketClient(BaseClient):
         """Send a message."""
         self._conn.sendall(message.encode())
 
+    def send_frame(self, opcode: int, target: int = 0, payload: Union[str, bytes] = b""):
+        """Send a binary command frame.
+
+        Args:
+            opcode (int): command opcode (see `rcr.type.Opcode`).
+            target (int): target client ID. Defaults to 0.
+            payload (Union[str, bytes]): command payload. Defaults to b"".
+        """
+        if isinstance(payload, str):
+            payload = payload.encode()
+        self._conn.sendall(encode_frame(opcode, target, 0, payload))
+
     def receive(self, sock: socket.socket):
         """Receive messages."""
-        data = sock.recv(1024)
+        data = sock.recv(65536 if self.binary else 1024)
         if not data:
             return
 
+        if self.binary:
+            for frame in self._frame_buffer.feed(data):
+                if frame.opcode == Opcode.PING:
+                    continue
+                # Event callback.
+                self.event_callback[ConnectionEvent.ON_MESSAGE](sock, frame)
+            return
+
         try:
             message = data.decode().strip()
         except UnicodeDecodeError:
             message = str(data)
+        if not message:
+            # A server ping.
+            return
 
         # Event callback.
         self.event_callback[ConnectionEvent.ON_MESSAGE](sock, message)
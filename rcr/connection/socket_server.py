@@ -1,24 +1,129 @@
 """Socket server implementation."""
+import errno
 import selectors
 import socket
-from typing import Any, Tuple
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterable, List, Set, Tuple, Union
 
-from rcr.exception import BindError, CloseBindError, CloseConnectionError
-from rcr.type import ConnectionEvent
+from rcr.exception import (
+    BindError,
+    CloseBindError,
+    CloseConnectionError,
+    FrameTooLongError,
+)
+from rcr.type import ConnectionEvent, Opcode, SlowConsumerPolicy
 
 from .base_server import BaseServer
+from .binary import MAGIC, FrameBuffer, encode_frame
+from .framing import LineBuffer
+from .liveness import Liveness
+from .write_buffer import WriteBuffer
 
 
 class SocketServer(BaseServer):
-    """Socket server implementation class."""
+    """Socket server implementation class.
+
+    All socket operations happen in the selector thread except `send`, which
+    writes directly when the connection has nothing queued and leaves the rest
+    to the selector thread. Other thread-sensitive work is handed to the
+    selector thread with `_call_soon`.
+
+    The first byte of a connection chooses its protocol: `binary.MAGIC` for
+    binary frames and anything else for text lines. A connection joins once its
+    protocol is known, or after `negotiation_timeout` as a text connection if it
+    keeps quiet, so its protocol never changes after it has got a message.
+
+    A client connection fires a disconnect event when it's closed, whoever
+    closes it. Joined connections can be pinged and closed when they keep
+    quiet (see `Liveness`).
+
+    A message event callback which returns False pauses the connection: the
+    selector stops reading it, and messages which have already been read wait
+    until `resume_reading`, so a consumer which can't keep up doesn't make
+    the server buffer an unbounded stream.
+    """
+
+    # Maximum length of a command line or a binary frame payload. It can be overridden by kwargs.
+    max_line_length = 4096
+
+    # Seconds to wait for the first byte of a quiet connection.
+    negotiation_timeout = 0.01
+
+    # Maximum bytes read by a single `recv_into` call.
+    recv_buffer_size = 65536
+
+    # Maximum queued outbound bytes per connection. It can be overridden by kwargs.
+    send_high_water_mark = 1024 * 1024
+
+    # What to do with a connection over the high-water mark. It can be overridden by kwargs.
+    slow_consumer_policy = SlowConsumerPolicy.DISCONNECT
+
+    # Number of threads which share a big `send_many`. It can be overridden by kwargs.
+    broadcast_writers = 1
+
+    # Minimum number of recipients handed to a broadcast writer thread.
+    broadcast_chunk_size = 1024
+
+    # Seconds to close a quiet connection, 0 disables it. It can be overridden by kwargs.
+    idle_timeout = 0
+
+    # Seconds to ping a quiet connection, 0 disables it. It can be overridden by kwargs.
+    ping_interval = 0
 
     def __init__(self, *args, **kwargs):
         self._selector = selectors.DefaultSelector()
+        self._line_buffers: Dict[socket.socket, Union[LineBuffer, FrameBuffer]] = {}
+        self._write_buffers: Dict[socket.socket, WriteBuffer] = {}
+        self._binary_connections: Set[socket.socket] = set()
+        # Connections which haven't chosen their protocol: (address, deadline).
+        self._negotiating: Dict[socket.socket, Tuple[Tuple[str, int], float]] = {}
+        # Paused connections and their messages which haven't been dispatched, in pausing order.
+        self._paused: Dict[socket.socket, Deque[Any]] = {}
+        self._pending = deque()
         super().__init__(*args, **kwargs)
 
+        # Shared by all connections, it's only used by the selector thread.
+        self._recv_buffer = memoryview(bytearray(self.recv_buffer_size))
+
+        # Other threads wake up the selector by writing in this socket pair.
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self._wakeup_w.setblocking(False)
+
+        self._broadcast_executor = None
+        self._accept_paused = False
+
+        self._liveness = Liveness(self.idle_timeout, self.ping_interval)
+
+        # Metrics.
+        self.dropped_messages = 0
+        self.slow_consumers = 0
+        self.register_metrics(lambda: len(self._write_buffers))
+        self.metrics.counter(
+            "rcr_slow_consumers_total",
+            "Connections which have been closed for not reading fast enough.",
+            fn=lambda: self.slow_consumers,
+        )
+        self.metrics.gauge(
+            "rcr_paused_connections",
+            "Connections which aren't read until the server catches up.",
+            fn=lambda: len(self._paused),
+        )
+
+    @property
+    def queued_bytes(self) -> int:
+        """Total outbound bytes waiting in connection buffers."""
+        return sum(buffer.size for buffer in list(self._write_buffers.values()))
+
     def bind(self):
         """Bind a specific port."""
         self._conn = socket.socket(socket.AF_INET, self.protocol.value)
+        # Connections closed by the server leave the port in TIME_WAIT for a while.
+        self._conn.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.reuse_port:
+            self._conn.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         try:
             self._conn.bind((self.host, self.port))
         except OSError as e:
@@ -27,6 +132,7 @@ class SocketServer(BaseServer):
         self._conn.setblocking(False)
         self._conn.listen(100)
         self._selector.register(self._conn, selectors.EVENT_READ, self.accept)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ, self._run_pending)
 
         # Event callback.
         self.event_callback[ConnectionEvent.ON_BIND](self._conn)
@@ -39,27 +145,147 @@ class SocketServer(BaseServer):
         Note:
             It blocks the process, so, it should be executed in a seperate thread.
         """
+        liveness = self._liveness
         while not self._shutdown:
-            events = self._selector.select(timeout=0.01)
-            for key, _ in events:
-                key.data(key.fileobj)
+            deadline = liveness.next_deadline()
+            if self._negotiating:
+                # Deadlines are in accepting order.
+                _, negotiation_deadline = next(iter(self._negotiating.values()))
+                deadline = min(deadline or negotiation_deadline, negotiation_deadline)
+            timeout = None if deadline is None else max(0, deadline - time.monotonic())
+            events = self._selector.select(timeout)
+            for key, mask in events:
+                if mask & selectors.EVENT_READ:
+                    key.data(key.fileobj)
+                if mask & selectors.EVENT_WRITE:
+                    self._flush(key.fileobj)
+            if self._negotiating:
+                self._expire_negotiations()
+            if len(liveness):
+                self._check_liveness()
         self.close()
 
+    def shutdown(self):
+        """Triggers the shutdown flag and wakes up the selector."""
+        super().shutdown()
+        self._call_soon(lambda: None)
+
+    def _call_soon(self, callback: Callable, *args):
+        """Run a callback in the selector thread.
+
+        Args:
+            callback (Callable): the callback.
+            *args: callback arguments.
+        """
+        self._pending.append((callback, args))
+        try:
+            self._wakeup_w.send(b"\0")
+        except OSError:
+            # Either a wakeup is already pending or the server is closed.
+            pass
+
+    def _run_pending(self, sock: socket.socket):
+        """Run callbacks scheduled by other threads.
+
+        Args:
+            sock (socket.socket): the wakeup socket.
+        """
+        try:
+            while sock.recv(4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+
+        while self._pending:
+            callback, args = self._pending.popleft()
+            callback(*args)
+
     def accept(self, sock):
         """Accept a socket connection.
 
         Args:
             sock (socket.socket): a socket connection.
         """
-        conn, addr = sock.accept()
+        try:
+            conn, addr = sock.accept()
+        except BlockingIOError:
+            return
+        except OSError as e:
+            if e.errno not in (errno.EMFILE, errno.ENFILE):
+                raise
+            # Out of file descriptors. The listening socket stays readable, so
+            # stop watching it until a connection is closed instead of spinning.
+            self._selector.unregister(sock)
+            self._accept_paused = True
+            return
         conn.setblocking(False)
+        # Replies are small, so don't let Nagle's algorithm hold them back.
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._line_buffers[conn] = LineBuffer(self.max_line_length)
+        self._write_buffers[conn] = WriteBuffer()
         self._selector.register(conn, selectors.EVENT_READ, self.receive)
+        self._negotiating[conn] = (addr, time.monotonic() + self.negotiation_timeout)
+
+    def _join(self, conn: socket.socket, addr: Tuple[str, int], binary: bool):
+        """Fix the protocol of a connection and let it join.
+
+        Args:
+            conn (socket.socket): a socket connection.
+            addr (Tuple[str, int]): connection address.
+            binary (bool): the connection speaks the binary protocol or not.
+        """
+        if binary:
+            self._line_buffers[conn] = FrameBuffer(self.max_line_length)
+            self._binary_connections.add(conn)
+
+        self._liveness.add(conn, time.monotonic())
 
         # Event callback.
         self.event_callback[ConnectionEvent.ON_JOIN](conn, addr)
 
+    def _expire_negotiations(self):
+        """Let quiet connections join as text connections."""
+        now = time.monotonic()
+        while self._negotiating:
+            conn, (addr, deadline) = next(iter(self._negotiating.items()))
+            if deadline > now:
+                break
+            del self._negotiating[conn]
+            self._join(conn, addr, False)
+
+    def _check_liveness(self):
+        """Ping and close quiet connections."""
+        to_ping, to_close = self._liveness.expire(time.monotonic())
+        for conn in to_ping:
+            if conn in self._binary_connections:
+                self.send((None, conn), encode_frame(Opcode.PING))
+            else:
+                self.send((None, conn), b"\r\n")
+        for conn in to_close:
+            if conn in self._paused:
+                # It's quiet because the server doesn't read it.
+                self._liveness.add(conn, time.monotonic())
+                continue
+            self._drop_connection(conn)
+
+    def is_binary(self, conn: socket.socket) -> bool:
+        """Return True if a connection speaks the binary protocol.
+
+        Args:
+            conn (socket.socket): a socket connection.
+
+        Returns:
+            bool: the connection is binary or not.
+        """
+        return conn in self._binary_connections
+
     def close(self):
         """Close the bound connection."""
+        for sock in (self._wakeup_r, self._wakeup_w):
+            sock.close()
+        if self._broadcast_executor:
+            self._broadcast_executor.shutdown(wait=False)
+
         if self._conn:
             try:
                 self._conn.close()
@@ -70,36 +296,347 @@ class SocketServer(BaseServer):
         self.event_callback[ConnectionEvent.ON_DISCONNECT](self._conn)
 
     def close_connection(self, conn: socket.socket):
-        """Close and unregister a specific connection."""
+        """Close and unregister a specific connection.
+
+        It fires a disconnect event if the connection has joined.
+        """
+        self._line_buffers.pop(conn, None)
+        self._write_buffers.pop(conn, None)
+        self._binary_connections.discard(conn)
+        self._paused.pop(conn, None)
+        self._liveness.remove(conn)
+        joined = self._negotiating.pop(conn, None) is None
         try:
-            self._selector.unregister(conn)
+            if conn in self._selector.get_map():
+                self._selector.unregister(conn)
             conn.close()
         except Exception as e:
             raise CloseConnectionError(str(e))
 
-    def send(self, user_connection: Tuple[Tuple[str, int], Any], message: str):
+        if self._accept_paused and not self._shutdown:
+            self._accept_paused = False
+            self._selector.register(self._conn, selectors.EVENT_READ, self.accept)
+
+        if joined:
+            # Event callback.
+            self.event_callback[ConnectionEvent.ON_DISCONNECT](conn)
+
+    def _drop_connection(self, conn: socket.socket):
+        """Close a connection unless it's already closed.
+
+        Args:
+            conn (socket.socket): a socket connection.
+        """
+        if conn in self._line_buffers:
+            self.close_connection(conn)
+
+    def send(
+        self, user_connection: Tuple[Tuple[str, int], Any], message: Union[str, bytes]
+    ) -> bool:
         """Send a message to a user connection.
 
+        The message is queued in the connection's outbound buffer and it's written
+        without blocking. When the buffer is over `send_high_water_mark`, the
+        `slow_consumer_policy` applies.
+
         Args:
             user_connection (Tuple[Tuple[str, int], Any]): user connection info.
-            message (str): message payload.
+            message (Union[str, bytes]): message payload.
+
+        Returns:
+            bool: False if the message has been dropped.
+        """
+        conn = user_connection[1]
+        buffer = self._write_buffers.get(conn)
+        if buffer is None:
+            return False
+
+        data = message.encode() if isinstance(message, str) else message
+        with buffer.lock:
+            if buffer.size + len(data) > self.send_high_water_mark:
+                self._slow_consumer(conn, buffer)
+                return False
+
+            was_empty = not buffer
+            buffer.append(data)
+            self._sent_bytes.inc(len(data))
+            if not was_empty:
+                # The selector thread is already waiting for the socket to be writable.
+                return True
+
+            try:
+                flushed = buffer.flush(conn)
+            except OSError:
+                buffer.clear()
+                self._call_soon(self._drop_connection, conn)
+                return False
+        if not flushed:
+            self._call_soon(self._watch_write, conn)
+        return True
+
+    def send_many(
+        self,
+        user_connections: Iterable[Tuple[Tuple[str, int], Any]],
+        message: Union[str, bytes],
+    ):
+        """Send the same message to several user connections.
+
+        The payload is encoded once and every connection buffer refers to the same
+        bytes object. The caller only queues it; the selector thread writes it,
+        split between `broadcast_writers` threads for big recipient lists since
+        the socket calls release the GIL.
+
+        Args:
+            user_connections (Iterable[Tuple[Tuple[str, int], Any]]): users connection info.
+            message (Union[str, bytes]): message payload.
+        """
+        data = message.encode() if isinstance(message, str) else message
+
+        queued = 0
+        to_flush = []
+        for user_connection in user_connections:
+            conn = user_connection[1]
+            buffer = self._write_buffers.get(conn)
+            if buffer is None:
+                continue
+            with buffer.lock:
+                if buffer.size + len(data) > self.send_high_water_mark:
+                    self._slow_consumer(conn, buffer)
+                    continue
+                if not buffer:
+                    to_flush.append(conn)
+                buffer.append(data)
+                queued += 1
+        self._sent_bytes.inc(queued * len(data))
+
+        if to_flush:
+            self._call_soon(self._flush_many, to_flush)
+
+    def _flush_many(self, conns: List[socket.socket]):
+        """Flush connections which have got new data, in the selector thread.
+
+        Args:
+            conns (List[socket.socket]): socket connections.
+        """
+        writers = min(self.broadcast_writers, len(conns) // self.broadcast_chunk_size)
+        if writers < 2:
+            unflushed, broken = self._flush_all(conns)
+        else:
+            if self._broadcast_executor is None:
+                self._broadcast_executor = ThreadPoolExecutor(
+                    self.broadcast_writers, thread_name_prefix="broadcast"
+                )
+            step = -(-len(conns) // writers)
+            futures = [
+                self._broadcast_executor.submit(self._flush_all, conns[i:i + step])
+                for i in range(0, len(conns), step)
+            ]
+            unflushed, broken = [], []
+            for future in futures:
+                result = future.result()
+                unflushed.extend(result[0])
+                broken.extend(result[1])
+
+        for conn in unflushed:
+            self._watch_write(conn)
+        for conn in broken:
+            self._drop_connection(conn)
+
+    def _flush_all(
+        self, conns: List[socket.socket]
+    ) -> Tuple[List[socket.socket], List[socket.socket]]:
+        """Flush connections without touching the selector.
+
+        Args:
+            conns (List[socket.socket]): socket connections.
+
+        Returns:
+            Tuple[List[socket.socket], List[socket.socket]]: connections which still
+                have queued data, and broken connections.
+        """
+        unflushed, broken = [], []
+        for conn in conns:
+            buffer = self._write_buffers.get(conn)
+            if buffer is None:
+                continue
+            with buffer.lock:
+                try:
+                    if not buffer.flush(conn):
+                        unflushed.append(conn)
+                except OSError:
+                    buffer.clear()
+                    broken.append(conn)
+        return unflushed, broken
+
+    def _slow_consumer(self, conn: socket.socket, buffer: WriteBuffer):
+        """Apply the slow consumer policy on a connection.
+
+        Args:
+            conn (socket.socket): a socket connection.
+            buffer (WriteBuffer): the connection's outbound buffer.
+        """
+        self.dropped_messages += 1
+        if self.slow_consumer_policy is SlowConsumerPolicy.DISCONNECT:
+            self.slow_consumers += 1
+            buffer.clear()
+            self._write_buffers.pop(conn, None)
+            self._call_soon(self._drop_connection, conn)
+
+    def _watch_write(self, conn: socket.socket):
+        """Ask the selector to flush a connection when it's writable.
+
+        Args:
+            conn (socket.socket): a socket connection.
+        """
+        buffer = self._write_buffers.get(conn)
+        if buffer is None:
+            return
+        with buffer.lock:
+            if buffer:
+                self._set_events(conn, True)
+
+    def _flush(self, conn: socket.socket):
+        """Flush a writable connection.
+
+        Args:
+            conn (socket.socket): a socket connection.
         """
-        user_connection[1].sendall(message.encode())
+        buffer = self._write_buffers.get(conn)
+        if buffer is None:
+            return
+        with buffer.lock:
+            try:
+                flushed = buffer.flush(conn)
+            except OSError:
+                buffer.clear()
+                flushed = None
+            if flushed:
+                self._set_events(conn, False)
+        if flushed is None:
+            self._drop_connection(conn)
+
+    def _set_events(self, conn: socket.socket, write: bool):
+        """Watch a connection for reading unless it's paused, and for writing.
+
+        Args:
+            conn (socket.socket): a socket connection.
+            write (bool): watch it for writing or not.
+        """
+        events = (0 if conn in self._paused else selectors.EVENT_READ) | (
+            selectors.EVENT_WRITE if write else 0
+        )
+        key = self._selector.get_map().get(conn)
+        if key is None:
+            if events:
+                self._selector.register(conn, events, self.receive)
+        elif not events:
+            self._selector.unregister(conn)
+        elif key.events != events:
+            self._selector.modify(conn, events, self.receive)
+
+    def _is_writing(self, conn: socket.socket) -> bool:
+        """Return True if the selector waits for a connection to be writable.
+
+        Args:
+            conn (socket.socket): a socket connection.
+
+        Returns:
+            bool: the connection is watched for writing or not.
+        """
+        key = self._selector.get_map().get(conn)
+        return key is not None and bool(key.events & selectors.EVENT_WRITE)
+
+    def _dispatch(self, conn: socket.socket, messages: Iterable[Any]):
+        """Fire a message event per message until the callback asks for a pause.
+
+        Args:
+            conn (socket.socket): a socket connection.
+            messages (Iterable[Any]): decoded lines or binary frames.
+        """
+        on_message = self.event_callback[ConnectionEvent.ON_MESSAGE]
+        messages = iter(messages)
+        for message in messages:
+            # Event callback.
+            if on_message(conn, message) is False:
+                self._paused[conn] = deque(messages)
+                self._set_events(conn, self._is_writing(conn))
+                return
+
+    def resume_reading(self):
+        """Resume reading paused connections, in the selector thread."""
+        self._call_soon(self._resume)
+
+    def _resume(self):
+        """Dispatch the held messages of paused connections and read them again.
+
+        Every connection paused so far gets a turn, in the order they have been
+        paused. A connection which gets paused again waits for the next
+        `resume_reading`, behind the others.
+        """
+        now = time.monotonic()
+        for conn in list(self._paused):
+            held = self._paused.pop(conn, None)
+            if held is None:
+                continue
+            self._liveness.touch(conn, now)
+            self._set_events(conn, self._is_writing(conn))
+            self._dispatch(conn, held)
 
     def receive(self, sock: socket.socket):
-        """Receive a message in a connection.
+        """Receive messages in a connection.
+
+        It fires one message event per complete line or binary frame. A
+        connection which sends a line or a frame longer than `max_line_length`
+        gets closed.
 
         Args:
             sock (socket.socket): a socket connection.
         """
-        data = sock.recv(1024)
-        if not data:
+        line_buffer = self._line_buffers.get(sock)
+        if line_buffer is None or sock in self._paused:
+            # It has been closed or paused by an earlier event in the same select round.
             return
 
         try:
-            message = data.decode().strip()
-        except UnicodeDecodeError:
-            message = str(data)
+            size = sock.recv_into(self._recv_buffer)
+        except (BlockingIOError, InterruptedError):
+            return
+        except ConnectionError:
+            size = 0
+        if not size:
+            # The peer has closed the connection.
+            self.close_connection(sock)
+            return
 
-        # Event callback.
-        self.event_callback[ConnectionEvent.ON_MESSAGE](sock, message)
+        self._liveness.touch(sock, time.monotonic())
+        self._received_bytes.inc(size)
+        data = self._recv_buffer[:size]
+        negotiating = self._negotiating.pop(sock, None)
+        if negotiating is not None:
+            binary = data[0] == MAGIC
+            self._join(sock, negotiating[0], binary)
+            if binary:
+                line_buffer = self._line_buffers[sock]
+                data = data[1:]
+
+        try:
+            lines = line_buffer.feed(data)
+        except FrameTooLongError:
+            self.close_connection(sock)
+            return
+
+        if not lines:
+            return
+        self._received_messages.inc(len(lines))
+
+        if sock in self._binary_connections:
+            self._dispatch(sock, lines)
+            return
+
+        messages = []
+        for line in lines:
+            try:
+                messages.append(line.decode().strip())
+            except UnicodeDecodeError:
+                messages.append(str(line))
+        self._dispatch(sock, messages)
@@ -0,0 +1,109 @@
+"""UDP client implementation."""
+import selectors
+import socket
+import time
+
+from rcr.exception import CloseConnectionError, ConnectionError
+from rcr.type import ConnectionEvent
+
+from .base_client import BaseClient
+
+
+class UdpClient(BaseClient):
+    """UDP client implementation class.
+
+    It joins with an empty line and sends another one every
+    `keepalive_interval` seconds, so its server session doesn't expire while
+    it's quiet. Every received datagram fires a message event.
+    """
+
+    # Seconds between keep-alives. It's below the server's session timeout.
+    keepalive_interval = 20.0
+
+    def __init__(self, *args, **kwargs):
+        self._selector = selectors.DefaultSelector()
+        super().__init__(*args, **kwargs)
+
+    def connect(self):
+        """Connect to a port to send requests."""
+        self._conn = socket.socket(socket.AF_INET, self.protocol.value)
+        try:
+            # It only fixes the peer address, so other senders are filtered out.
+            self._conn.connect((self.host, self.port))
+            self._conn.send(b"\r\n")
+        except OSError as e:
+            self.close()
+            raise ConnectionError(str(e))
+        self._conn.setblocking(False)
+        self._selector.register(self._conn, selectors.EVENT_READ, self.receive)
+
+        # Event callback.
+        self.event_callback[ConnectionEvent.ON_CONNECT](self._conn)
+
+        self._mainloop()
+
+    def _mainloop(self):
+        """Start listening to events and trigger related methods.
+
+        Note:
+            It blocks the process, so, it should be executed in a seperate thread.
+        """
+        next_keepalive = time.monotonic() + self.keepalive_interval
+        while not self._shutdown:
+            events = self._selector.select(timeout=0.01)
+            for key, _ in events:
+                key.data(key.fileobj)
+            if time.monotonic() >= next_keepalive:
+                self._send(b"\r\n")
+                next_keepalive = time.monotonic() + self.keepalive_interval
+        self.close()
+
+    def close(self):
+        """Close the connection."""
+        if self._conn:
+            try:
+                self._selector.unregister(self._conn)
+                self._conn.close()
+            except Exception as e:  # TODO: no general exception!
+                raise CloseConnectionError(str(e))
+        self._selector.close()
+
+        # Event callback.
+        self.event_callback[ConnectionEvent.ON_DISCONNECT](self._conn)
+
+    def _send(self, data: bytes) -> bool:
+        """Send a datagram.
+
+        Args:
+            data (bytes): datagram payload.
+
+        Returns:
+            bool: False if it has been dropped.
+        """
+        try:
+            self._conn.send(data)
+        except OSError:
+            return False
+        return True
+
+    def send(self, message: str) -> bool:
+        """Send a message in a single datagram."""
+        return self._send(message.encode())
+
+    def receive(self, sock: socket.socket):
+        """Receive messages."""
+        try:
+            data = sock.recv(65536)
+        except OSError:
+            # Nothing to read, or an ICMP error while the server is down.
+            return
+        if not data:
+            return
+
+        try:
+            message = data.decode().strip()
+        except UnicodeDecodeError:
+            message = str(data)
+
+        # Event callback.
+        self.event_callback[ConnectionEvent.ON_MESSAGE](sock, message)
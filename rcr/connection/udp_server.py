@@ -0,0 +1,241 @@
+"""UDP server implementation."""
+import errno
+import selectors
+import socket
+import time
+from collections import OrderedDict
+from typing import Any, Iterable, Tuple, Union
+
+from rcr.exception import BindError, CloseBindError
+from rcr.type import ConnectionEvent
+
+from .base_server import BaseServer
+
+
+class UdpServer(BaseServer):
+    """UDP server implementation class.
+
+    A session is keyed by its peer address, and the address is the connection
+    object passed to the event callbacks. A peer joins with its first datagram
+    and every datagram is a message of its own, so datagrams which only carry
+    a line break are keep-alives. Sessions which keep quiet for
+    `session_timeout` seconds expire with a disconnect event.
+
+    Nothing is buffered or retried: a datagram which can't be sent right away
+    is dropped.
+    """
+
+    # Maximum length of a message. It can be overridden by kwargs.
+    max_line_length = 4096
+
+    # Seconds a session lives without receiving a datagram. It can be overridden by kwargs.
+    session_timeout = 60.0
+
+    def __init__(self, *args, **kwargs):
+        self._selector = selectors.DefaultSelector()
+        # Peer address -> last datagram time, the least recently active first.
+        self._sessions: "OrderedDict[Tuple[str, int], float]" = OrderedDict()
+        super().__init__(*args, **kwargs)
+
+        # Other threads wake up the selector by writing in this socket pair.
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self._wakeup_w.setblocking(False)
+
+        # Metrics.
+        self.dropped_messages = 0
+        self.register_metrics(lambda: len(self._sessions))
+
+    def check_availability(self):
+        """Check resource availability.
+
+        Raises: ConnectionError when the port is already bound.
+
+        Note:
+            Datagram sockets don't refuse a connect, so it tries to bind instead.
+        """
+        if self.reuse_port:
+            return
+        with socket.socket(socket.AF_INET, self.protocol.value) as sock_obj:
+            try:
+                sock_obj.bind((self.host, self.port))
+            except OSError as e:
+                if e.errno != errno.EADDRINUSE:
+                    raise
+                raise ConnectionError("%s:%s is already used." % (self.host or "*", self.port))
+
+    def bind(self):
+        """Bind a specific port."""
+        self._conn = socket.socket(socket.AF_INET, self.protocol.value)
+        if self.reuse_port:
+            self._conn.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self._conn.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        try:
+            self._conn.bind((self.host, self.port))
+        except OSError as e:
+            self.close()
+            raise BindError(str(e))
+        self._conn.setblocking(False)
+        self._selector.register(self._conn, selectors.EVENT_READ, self.receive)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ, self._wakeup)
+
+        # Event callback.
+        self.event_callback[ConnectionEvent.ON_BIND](self._conn)
+
+        self._mainloop()
+
+    def _mainloop(self):
+        """Start listening to events and trigger related methods.
+
+        Note:
+            It blocks the process, so, it should be executed in a seperate thread.
+        """
+        while not self._shutdown:
+            timeout = None
+            if self._sessions:
+                last_seen = next(iter(self._sessions.values()))
+                timeout = max(0, last_seen + self.session_timeout - time.monotonic())
+            for key, _ in self._selector.select(timeout):
+                key.data(key.fileobj)
+            if self._sessions:
+                self._expire_sessions()
+        self.close()
+
+    def shutdown(self):
+        """Triggers the shutdown flag and wakes up the selector."""
+        super().shutdown()
+        try:
+            self._wakeup_w.send(b"\0")
+        except OSError:
+            pass
+
+    def _wakeup(self, sock: socket.socket):
+        """Drain the wakeup socket.
+
+        Args:
+            sock (socket.socket): the wakeup socket.
+        """
+        try:
+            while sock.recv(4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+
+    def _expire_sessions(self):
+        """Close sessions which have been quiet for `session_timeout`."""
+        deadline = time.monotonic() - self.session_timeout
+        while self._sessions:
+            addr, last_seen = next(iter(self._sessions.items()))
+            if last_seen > deadline:
+                break
+            self.close_connection(addr)
+
+    def close(self):
+        """Close the bound connection."""
+        for sock in (self._wakeup_r, self._wakeup_w):
+            sock.close()
+        self._selector.close()
+
+        if self._conn:
+            try:
+                self._conn.close()
+            except Exception as e:  # TODO: no general exception!
+                raise CloseBindError(str(e))
+
+        # Event callback.
+        self.event_callback[ConnectionEvent.ON_DISCONNECT](self._conn)
+
+    def close_connection(self, conn: Tuple[str, int]):
+        """Forget a session.
+
+        Args:
+            conn (Tuple[str, int]): the session's peer address.
+        """
+        if self._sessions.pop(conn, None) is not None:
+            # Event callback.
+            self.event_callback[ConnectionEvent.ON_DISCONNECT](conn)
+
+    def send(
+        self, user_connection: Tuple[Tuple[str, int], Any], message: Union[str, bytes]
+    ) -> bool:
+        """Send a message to a user connection in a single datagram.
+
+        Args:
+            user_connection (Tuple[Tuple[str, int], Any]): user connection info.
+            message (Union[str, bytes]): message payload.
+
+        Returns:
+            bool: False if the message has been dropped.
+        """
+        data = message.encode() if isinstance(message, str) else message
+        try:
+            self._conn.sendto(data, user_connection[1])
+        except OSError:
+            # The socket buffer is full or the message doesn't fit in a datagram.
+            self.dropped_messages += 1
+            return False
+        self._sent_bytes.inc(len(data))
+        return True
+
+    def send_many(
+        self,
+        user_connections: Iterable[Tuple[Tuple[str, int], Any]],
+        message: Union[str, bytes],
+    ):
+        """Send the same message to several user connections.
+
+        Args:
+            user_connections (Iterable[Tuple[Tuple[str, int], Any]]): users connection info.
+            message (Union[str, bytes]): message payload.
+        """
+        data = message.encode() if isinstance(message, str) else message
+        sendto = self._conn.sendto
+        sent = 0
+        for user_connection in user_connections:
+            try:
+                sendto(data, user_connection[1])
+            except OSError:
+                self.dropped_messages += 1
+            else:
+                sent += 1
+        self._sent_bytes.inc(sent * len(data))
+
+    def receive(self, sock: socket.socket):
+        """Receive the waiting datagrams.
+
+        It fires a join event for a new peer address and a message event per
+        datagram. Datagrams longer than `max_line_length` are dropped.
+
+        Args:
+            sock (socket.socket): the bound socket.
+        """
+        sessions = self._sessions
+        on_message = self.event_callback[ConnectionEvent.ON_MESSAGE]
+        # Don't starve the other events under a flood.
+        for _ in range(64):
+            try:
+                data, addr = sock.recvfrom(self.max_line_length + 1)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                # An ICMP error of an earlier datagram, e.g. port unreachable.
+                continue
+            self._received_bytes.inc(len(data))
+            if len(data) > self.max_line_length:
+                continue
+
+            if addr in sessions:
+                sessions.move_to_end(addr)
+            else:
+                # Event callback.
+                self.event_callback[ConnectionEvent.ON_JOIN](addr, addr)
+            sessions[addr] = time.monotonic()
+
+            try:
+                message = data.decode().strip()
+            except UnicodeDecodeError:
+                message = str(data)
+            if message:
+                self._received_messages.inc()
+                # Event callback.
+                on_message(addr, message)
@@ -0,0 +1,81 @@
+"""Outbound buffer module."""
+import socket
+from collections import deque
+from threading import Lock
+from typing import Deque, Union
+
+# Maximum number of chunks handed to a single `sendmsg` call.
+MAX_IOV = 64
+
+
+class WriteBuffer:
+    """Per-connection outbound buffer.
+
+    Messages are queued as immutable chunks and written with gathered
+    `sendmsg` calls whenever the socket is writable. The buffer doesn't block:
+    whatever the kernel doesn't accept stays queued for the next flush.
+
+    Note:
+        `lock` must be held while calling `append` and `flush`.
+    """
+
+    __slots__ = ("lock", "size", "_chunks")
+
+    def __init__(self):
+        self.lock = Lock()
+        self.size = 0
+        self._chunks: Deque[Union[bytes, memoryview]] = deque()
+
+    def __bool__(self) -> bool:
+        return bool(self._chunks)
+
+    def append(self, data: Union[bytes, memoryview]):
+        """Queue a chunk.
+
+        Args:
+            data (Union[bytes, memoryview]): chunk. It must not be modified afterwards.
+        """
+        if not data:
+            return
+        self._chunks.append(data)
+        self.size += len(data)
+
+    def flush(self, sock: socket.socket) -> bool:
+        """Write as much queued data as the socket accepts.
+
+        Args:
+            sock (socket.socket): a non-blocking socket.
+
+        Returns:
+            bool: True when the buffer has been completely flushed.
+
+        Raises:
+            OSError: when the connection is broken.
+        """
+        chunks = self._chunks
+        while chunks:
+            try:
+                if len(chunks) == 1:
+                    sent = sock.send(chunks[0])
+                else:
+                    sent = sock.sendmsg(
+                        [chunks[i] for i in range(min(len(chunks), MAX_IOV))]
+                    )
+            except (BlockingIOError, InterruptedError):
+                return False
+
+            self.size -= sent
+            while sent:
+                chunk = chunks[0]
+                if sent >= len(chunk):
+                    sent -= len(chunk)
+                    chunks.popleft()
+                else:
+                    chunks[0] = memoryview(chunk)[sent:]
+                    sent = 0
+        return True
+
+    def clear(self):
+        """Drop all queued data."""
+        self._chunks.clear()
+        self.size = 0
@@ -1,9 +1,8 @@
 """Clients contact book manager."""
 from __future__ import annotations
 
-import time
 from itertools import count
-from threading import Lock, Thread
+from threading import Lock
 from typing import Any, Dict, List, Optional, Set, Tuple
 
 
@@ -11,13 +10,19 @@ class Contact:
     """Client contact book manager.
 
     It adds an auto-increment number for each user.
+
+    The contact book is split in shards by contact ID and every shard has its
+    own lock, so joins and leaves of different clients don't wait for each other.
+    The class lock only guards ID allocation and the membership order, and
+    readers never lock: `get` and `get_by_connection` are single dict lookups and
+    `list` returns a copy of an immutable snapshot, which is rebuilt only after
+    the membership has changed.
     """
 
     __instance: Optional[Contact] = None
     __counter = count(start=1)
     __released_counters: Set[int] = set()
     __lock = Lock()
-    __thread = None
 
     @classmethod
     def get_instance(cls) -> Contact:
@@ -25,12 +30,43 @@ class Contact:
             cls.__instance = Contact()
         return cls.__instance
 
-    def __init__(self):
-        self._contact_book: Dict[int, Tuple[Tuple[str, int], Any]] = {}
+    @classmethod
+    def configure_ids(cls, start: int = 1, step: int = 1):
+        """Restart ID allocation.
+
+        Server workers allocate interleaved IDs (`start`, `start + step`, ...), so
+        IDs are unique across workers and the owner of an ID is `(ID - 1) % step`.
+
+        Args:
+            start (int): first contact ID. Defaults to 1.
+            step (int): distance between contact IDs. Defaults to 1.
+        """
+        if not 1 <= start <= step:
+            raise ValueError("start must be between 1 and step.")
+
+        with cls.__lock:
+            cls.__counter = count(start=start, step=step)
+            cls.__released_counters = set()
 
-        # Cleanup thread needs to be implemented.
-        Contact.__thread = Thread(target=self._check_client_availability)
-        # Contact.__thread.start()
+    def __init__(self, shards: int = 16):
+        """Initialize the class.
+
+        Args:
+            shards (int): number of contact book shards, rounded up to a power of two.
+                Defaults to 16.
+        """
+        shards = 1 << max(0, shards - 1).bit_length()
+        self._shard_mask = shards - 1
+        self._shards: List[Dict[int, Tuple[Tuple[str, int], Any]]] = [
+            {} for _ in range(shards)
+        ]
+        self._shard_locks = [Lock() for _ in range(shards)]
+        # Reverse index of the contact book: connection object -> contact ID.
+        self._connection_index: Dict[Any, int] = {}
+
+        # Contact IDs in joining order, and its snapshot for readers.
+        self._members: Dict[int, None] = {}
+        self._snapshot: Optional[Tuple[int, ...]] = ()
 
     def add(self, connection_info: Tuple[Tuple[str, int], Any]) -> int:
         """Add a new client.
@@ -49,13 +85,23 @@ class Contact:
                 contact_id = Contact.__released_counters.pop()
             else:
                 contact_id = next(Contact.__counter)
-            if contact_id not in self._contact_book:
-                self._contact_book[contact_id] = connection_info
-            elif self._contact_book[contact_id] == connection_info:
+
+        shard = contact_id & self._shard_mask
+        with self._shard_locks[shard]:
+            contact_book = self._shards[shard]
+            if contact_id not in contact_book:
+                contact_book[contact_id] = connection_info
+                self._connection_index[connection_info[1]] = contact_id
+            elif contact_book[contact_id] == connection_info:
                 return contact_id
             else:
                 raise SystemError("Can't add a new client in the contact book.")
-            return contact_id
+
+        # It's visible to `list` only after `get` can find it.
+        with Contact.__lock:
+            self._members[contact_id] = None
+            self._snapshot = None
+        return contact_id
 
     def remove(self, contact_id: int) -> bool:
         """Remove a client.
@@ -66,12 +112,38 @@ class Contact:
         Returns:
             bool: removing contact record was successful or not.
         """
+        # Hide it from `list` first, then drop it from the book.
         with Contact.__lock:
-            if contact_id in self._contact_book:
-                del self._contact_book[contact_id]
-                Contact.__released_counters.add(contact_id)
-                return True
-        return False
+            if contact_id in self._members:
+                del self._members[contact_id]
+                self._snapshot = None
+
+        shard = contact_id & self._shard_mask
+        with self._shard_locks[shard]:
+            connection_info = self._shards[shard].pop(contact_id, None)
+            if connection_info is None:
+                return False
+            if self._connection_index.get(connection_info[1]) == contact_id:
+                del self._connection_index[connection_info[1]]
+
+        # The ID can be reused only after it has gone from the book.
+        with Contact.__lock:
+            Contact.__released_counters.add(contact_id)
+        return True
+
+    def snapshot(self) -> Tuple[int, ...]:
+        """Return an immutable snapshot of recorded clients in joining order.
+
+        Returns:
+            Tuple[int, ...]: recorded clients.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            with Contact.__lock:
+                if self._snapshot is None:
+                    self._snapshot = tuple(self._members)
+                snapshot = self._snapshot
+        return snapshot
 
     def list(self) -> List[int]:
         """Return list of recorded clients.
@@ -79,7 +151,7 @@ class Contact:
         Returns:
             List[int]: list of recorded clients.
         """
-        return list(self._contact_book.keys())
+        return list(self.snapshot())
 
     def get(self, contact_id: int) -> Optional[Tuple[Tuple[str, int], Any]]:
         """Get a client's connection info.
@@ -90,18 +162,21 @@ class Contact:
         Returns:
             Optional[Tuple[Tuple[str, int], Any]]: a client's connection info.
         """
-        return self._contact_book.get(contact_id)
-
-    def get_by_connection(self, connection: Any):
-        """Get client ID by connection object."""
-        for client_id, connection_info in self._contact_book.items():
-            if connection_info[1] == connection:
-                return client_id
-        raise ValueError("client with connection object %s not found.", connection)
-
-    def _check_client_availability(self):
-        """Check contact book and removed disconnected clients."""
-        while True:  # FIXME: need to support gracefully shutdown.
-            for client_id, connection_info in self._contact_book.items():
-                print(connection_info[1])  # TODO: needs to be implemented.
-            time.sleep(0.5)
+        return self._shards[contact_id & self._shard_mask].get(contact_id)
+
+    def get_by_connection(self, connection: Any) -> int:
+        """Get client ID by connection object.
+
+        Args:
+            connection (Any): client's connection object.
+
+        Returns:
+            int: client's contact ID.
+
+        Raises:
+            ValueError: when there is no client with the connection object.
+        """
+        try:
+            return self._connection_index[connection]
+        except KeyError:
+            raise ValueError("client with connection object %s not found." % (connection,))
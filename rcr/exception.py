@@ -12,3 +12,15 @@ class ConnectionError(Exception):
 
 class CloseConnectionError(Exception):
     pass
+
+
+class FrameTooLongError(Exception):
+    pass
+
+
+class FetchError(Exception):
+    pass
+
+
+class IdentityError(Exception):
+    pass
@@ -0,0 +1,300 @@
+"""Web page fetcher service."""
+import http.client
+import socket
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+from rcr.exception import FetchError
+
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+
+# Errors of a keep-alive connection which the server has already closed.
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    BrokenPipeError,
+    ConnectionResetError,
+)
+
+
+class Fetcher:
+    """Web page size fetcher service.
+
+    Pages are fetched by a bounded pool of threads. Connections are kept alive
+    and reused per host, bodies are counted while they're streamed instead of
+    being loaded in memory, and sizes are cached for a while.
+
+    A fetch fails when it takes more than `deadline` seconds in total, or the
+    body is over `max_size` bytes, so a server which sends a page slowly or
+    endlessly doesn't hold a thread.
+    """
+
+    def __init__(
+        self,
+        workers: int = 8,
+        timeout: float = 10.0,
+        cache_ttl: float = 60.0,
+        cache_size: int = 1024,
+        max_idle_connections: int = 4,
+        max_redirects: int = 5,
+        deadline: float = 30.0,
+        max_size: int = 100 * 1024 * 1024,
+    ):
+        """Initialize the class.
+
+        Args:
+            workers (int): number of fetcher threads. Defaults to 8.
+            timeout (float): socket timeout in seconds. Defaults to 10.
+            cache_ttl (float): seconds to keep a page size in the cache. Defaults to 60.
+            cache_size (int): maximum number of cached page sizes. Defaults to 1024.
+            max_idle_connections (int): maximum idle connections kept per host.
+                Defaults to 4.
+            max_redirects (int): maximum followed redirects. Defaults to 5.
+            deadline (float): seconds a fetch may take, redirects included. Defaults to 30.
+            max_size (int): maximum body size in bytes. Defaults to 100 MiB.
+        """
+        self.workers = workers
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.max_idle_connections = max_idle_connections
+        self.max_redirects = max_redirects
+        self.deadline = deadline
+        self.max_size = max_size
+
+        self._cache: OrderedDict = OrderedDict()
+        self._idle: Dict[Tuple[str, str, int], List[http.client.HTTPConnection]] = {}
+        self._lock = Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def submit(self, url: str) -> Future:
+        """Fetch a web page size.
+
+        Args:
+            url (str): page URL.
+
+        Returns:
+            Future: the page size in bytes. It's already done if it's cached.
+
+        Raises:
+            ValueError: when the URL isn't a valid http(s) URL.
+        """
+        with self._lock:
+            cached = self._cache.get(url)
+            if cached is not None and cached[0] < time.monotonic():
+                del self._cache[url]
+                cached = None
+
+        if cached is not None:
+            future = Future()
+            future.set_result(cached[1])
+            return future
+
+        self._split(url)
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="fetcher")
+        return self._executor.submit(self._fetch, url)
+
+    @staticmethod
+    def _split(url: str) -> Tuple[Tuple[str, str, int], str]:
+        """Split a URL to its connection key and request target.
+
+        Args:
+            url (str): page URL.
+
+        Returns:
+            Tuple[Tuple[str, str, int], str]: (scheme, host, port) and the request target.
+
+        Raises:
+            ValueError: when the URL isn't a valid http(s) URL.
+        """
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError("unknown url: {}".format(url))
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+        return (parts.scheme, parts.hostname, port), target
+
+    def _fetch(self, url: str) -> int:
+        """Fetch a web page size, following redirects.
+
+        Args:
+            url (str): page URL.
+
+        Returns:
+            int: page size in bytes.
+
+        Raises:
+            FetchError: when the server doesn't return the page, the fetch takes too
+                long or the page is too big.
+            OSError: when the connection fails or times out.
+        """
+        deadline = time.monotonic() + self.deadline
+        location = url
+        for _ in range(self.max_redirects + 1):
+            status, location, size = self._request(location, deadline)
+            if location is not None:
+                continue
+            if not 200 <= status < 300:
+                raise FetchError("HTTP {}".format(status))
+            self._store(url, size)
+            return size
+        raise FetchError("too many redirects")
+
+    def _request(self, url: str, deadline: float) -> Tuple[int, Optional[str], int]:
+        """Send a GET request.
+
+        Args:
+            url (str): page URL.
+            deadline (float): monotonic time the fetch must end by.
+
+        Returns:
+            Tuple[int, Optional[str], int]: status, URL to follow for redirects (or None)
+                and body size in bytes.
+        """
+        key, target = self._split(url)
+        conn, reused = self._acquire(key)
+        try:
+            try:
+                conn.request("GET", target, headers={"Host": urlsplit(url).netloc})
+                # The connection gives its socket to a response which closes it.
+                sock = conn.sock
+                resp = conn.getresponse()
+            except STALE_CONNECTION_ERRORS:
+                if not reused:
+                    raise
+                # The server has closed the idle connection, try a fresh one.
+                conn.close()
+                conn = self._connect(key)
+                conn.request("GET", target, headers={"Host": urlsplit(url).netloc})
+                sock = conn.sock
+                resp = conn.getresponse()
+
+            location = resp.getheader("Location")
+            size = self._read_size(sock, resp, deadline)
+            sock.settimeout(self.timeout)
+        except Exception:
+            conn.close()
+            raise
+
+        if resp.will_close:
+            conn.close()
+        else:
+            self._release(key, conn)
+
+        if resp.status in REDIRECT_STATUSES and location:
+            return resp.status, urljoin(url, location), size
+        return resp.status, None, size
+
+    def _read_size(
+        self, sock: socket.socket, resp: http.client.HTTPResponse, deadline: float
+    ) -> int:
+        """Count body bytes while streaming it.
+
+        Every read returns what a single receive gets, so the deadline is
+        checked while a server sends the body slowly.
+
+        Args:
+            sock (socket.socket): socket of the response.
+            resp (http.client.HTTPResponse): response.
+            deadline (float): monotonic time the fetch must end by.
+
+        Returns:
+            int: body size in bytes.
+
+        Raises:
+            FetchError: when the deadline passes or the body is too big.
+        """
+        size = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise FetchError("page took longer than {:g} seconds".format(self.deadline))
+            sock.settimeout(min(self.timeout, remaining))
+            try:
+                read = len(resp.read1(65536))
+            except socket.timeout:
+                if time.monotonic() < deadline:
+                    raise
+                continue
+            if not read:
+                # It's done, the connection can take the next request.
+                resp.close()
+                return size
+            size += read
+            if size > self.max_size:
+                raise FetchError("page is larger than {} bytes".format(self.max_size))
+
+    def _connect(self, key: Tuple[str, str, int]) -> http.client.HTTPConnection:
+        """Open a new connection.
+
+        Args:
+            key (Tuple[str, str, int]): scheme, host and port.
+
+        Returns:
+            http.client.HTTPConnection: the connection.
+        """
+        scheme, host, port = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout)
+        return http.client.HTTPConnection(host, port, timeout=self.timeout)
+
+    def _acquire(self, key: Tuple[str, str, int]) -> Tuple[http.client.HTTPConnection, bool]:
+        """Take an idle connection to a host or open a new one.
+
+        Args:
+            key (Tuple[str, str, int]): scheme, host and port.
+
+        Returns:
+            Tuple[http.client.HTTPConnection, bool]: the connection and whether it has
+                been used before.
+        """
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+        return self._connect(key), False
+
+    def _release(self, key: Tuple[str, str, int], conn: http.client.HTTPConnection):
+        """Keep a connection for later requests to the same host.
+
+        Args:
+            key (Tuple[str, str, int]): scheme, host and port.
+            conn (http.client.HTTPConnection): the connection.
+        """
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_connections:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def _store(self, url: str, size: int):
+        """Put a page size in the cache.
+
+        Args:
+            url (str): page URL.
+            size (int): page size in bytes.
+        """
+        with self._lock:
+            self._cache[url] = (time.monotonic() + self.cache_ttl, size)
+            self._cache.move_to_end(url)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def shutdown(self):
+        """Stop the fetcher threads and close idle connections."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+            for idle in self._idle.values():
+                for conn in idle:
+                    conn.close()
+            self._idle.clear()
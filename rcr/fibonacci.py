@@ -0,0 +1,178 @@
+"""Fibonacci calculation service."""
+import multiprocessing
+import sys
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from threading import Lock
+from typing import Optional
+
+
+def fib_linear(n: int) -> int:
+    """Fibonacci calculation with n - 1 additions.
+
+    Args:
+        n (int): nth number of Fibonacci's series.
+
+    Returns:
+        int: calculated nth number of the Fibonacci's series.
+    """
+    first, second = 0, 1
+    for _ in range(n):
+        first, second = second, first + second
+    return first
+
+
+def fib_fast_doubling(n: int) -> int:
+    """Fibonacci calculation with the fast doubling method in O(log n) steps.
+
+    It walks the bits of n using F(2k) = F(k) * (2F(k+1) - F(k)) and
+    F(2k+1) = F(k)^2 + F(k+1)^2.
+
+    Args:
+        n (int): nth number of Fibonacci's series.
+
+    Returns:
+        int: calculated nth number of the Fibonacci's series.
+    """
+    first, second = 0, 1  # F(k), F(k+1)
+    for bit in bin(n)[2:]:
+        double = first * (2 * second - first)
+        double_next = first * first + second * second
+        if bit == "1":
+            first, second = double_next, double + double_next
+        else:
+            first, second = double, double_next
+    return first
+
+
+def _init_worker():
+    """Worker process initializer.
+
+    Results can have hundreds of thousands of digits, so lift the int to str
+    conversion limit (Python 3.11+) in workers only.
+    """
+    if hasattr(sys, "set_int_max_str_digits"):
+        sys.set_int_max_str_digits(0)
+
+
+def _calculate(n: int) -> str:
+    """Calculate the nth Fibonacci number as a decimal string.
+
+    Args:
+        n (int): nth number of Fibonacci's series.
+
+    Returns:
+        str: calculated nth number of the Fibonacci's series.
+    """
+    return str(fib_fast_doubling(n))
+
+
+class Fibonacci:
+    """Fibonacci calculation service.
+
+    Small numbers are calculated in the caller's thread. Bigger ones are sent to
+    a pool of worker processes, so they neither block the caller nor hold the
+    GIL. Recent results are kept in an LRU cache.
+    """
+
+    def __init__(
+        self,
+        max_n: int = 1000000,
+        inline_max_n: int = 10000,
+        workers: int = 2,
+        cache_size: int = 128,
+    ):
+        """Initialize the class.
+
+        Args:
+            max_n (int): maximum accepted n. Defaults to 1000000.
+            inline_max_n (int): maximum n calculated in the caller's thread.
+                Defaults to 10000. Python 3.11+ can't convert results of n > 20000
+                to str outside the workers.
+            workers (int): number of worker processes. Defaults to 2.
+            cache_size (int): number of cached results. Defaults to 128.
+        """
+        self.max_n = max_n
+        self.inline_max_n = inline_max_n
+        self.workers = workers
+        self.cache_size = cache_size
+
+        self._cache: OrderedDict = OrderedDict()
+        self._lock = Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def submit(self, n: int) -> Future:
+        """Calculate the nth Fibonacci number.
+
+        Args:
+            n (int): nth number of Fibonacci's series.
+
+        Returns:
+            Future: the result as a decimal string. It's already done unless the
+                calculation has been sent to a worker process.
+
+        Raises:
+            ValueError: when n is out of the accepted range.
+        """
+        if n < 0 or n > self.max_n:
+            raise ValueError("n must be between 0 and {}.".format(self.max_n))
+
+        with self._lock:
+            result = self._cache.get(n)
+            if result is not None:
+                self._cache.move_to_end(n)
+
+        if result is None and n > self.inline_max_n:
+            future = self._get_executor().submit(_calculate, n)
+            future.add_done_callback(partial(self._on_calculated, n))
+            return future
+
+        if result is None:
+            result = _calculate(n)
+            self._store(n, result)
+        future = Future()
+        future.set_result(result)
+        return future
+
+    def _on_calculated(self, n: int, future: Future):
+        """Cache a result calculated by a worker process.
+
+        Args:
+            n (int): nth number of Fibonacci's series.
+            future (Future): the calculation.
+        """
+        if not future.cancelled() and future.exception() is None:
+            self._store(n, future.result())
+
+    def _store(self, n: int, result: str):
+        """Put a result in the cache.
+
+        Args:
+            n (int): nth number of Fibonacci's series.
+            result (str): calculated nth number of the Fibonacci's series.
+        """
+        with self._lock:
+            self._cache[n] = result
+            self._cache.move_to_end(n)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Return the worker pool. It's created on first use."""
+        with self._lock:
+            if self._executor is None:
+                # Forking a multi-threaded process isn't safe.
+                self._executor = ProcessPoolExecutor(
+                    self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+            return self._executor
+
+    def shutdown(self):
+        """Stop the worker processes."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
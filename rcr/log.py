@@ -0,0 +1,266 @@
+"""Logging pipeline module.
+
+Loggers don't write themselves: the root logger has a single handler which
+puts records in a bounded queue, and a listener thread takes them in batches
+and writes every batch to the sinks with a single flush. When the queue is
+full, records are dropped and counted instead of blocking the caller, so a
+slow terminal or disk never holds up the chat path.
+"""
+import atexit
+import logging
+import logging.config
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, List, Optional
+
+
+class Formatter(logging.Formatter):
+    """A formatter which formats the date and time once per second.
+
+    Records of a batch are mostly logged in the same second, so it reuses the
+    time text of the last record instead of calling `strftime` for every one.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # (second, its text), replaced as a whole since sinks format in several threads.
+        self._cached = (-1, "")
+
+    def formatTime(self, record: logging.LogRecord, datefmt: Optional[str] = None) -> str:
+        """Return the creation time of a record as text.
+
+        Args:
+            record (logging.LogRecord): log record.
+            datefmt (Optional[str]): `strftime` format. Defaults to None (ISO 8601 like).
+
+        Returns:
+            str: formatted time.
+        """
+        if datefmt:
+            return super().formatTime(record, datefmt)
+        second = int(record.created)
+        cached_second, text = self._cached
+        if second != cached_second:
+            text = time.strftime(self.default_time_format, self.converter(second))
+            self._cached = (second, text)
+        return self.default_msec_format % (text, record.msecs)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """A queue handler which drops records when its queue is full."""
+
+    def __init__(self, log_queue: queue.Queue):
+        """Initialize the class.
+
+        Args:
+            log_queue (queue.Queue): a bounded queue.
+        """
+        super().__init__(log_queue)
+        self.setFormatter(logging.Formatter())
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Merge the arguments and the exception into the message.
+
+        Unlike `QueueHandler.prepare`, it doesn't copy the record, the root
+        logger's queue handler is its only handler.
+
+        Args:
+            record (logging.LogRecord): log record.
+
+        Returns:
+            logging.LogRecord: the same record.
+        """
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = self.formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        """Put a record in the queue, or count it if the queue is full.
+
+        Args:
+            record (logging.LogRecord): log record.
+        """
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BatchStreamHandler(logging.StreamHandler):
+    """A stream handler which writes a batch of records with a single flush."""
+
+    def emit_batch(self, records: List[logging.LogRecord]):
+        """Write records.
+
+        Args:
+            records (List[logging.LogRecord]): log records.
+        """
+        try:
+            text = "".join(self.format(record) + self.terminator for record in records)
+            with self.lock:
+                self.stream.write(text)
+                self.flush()
+        except Exception:
+            self.handleError(records[0])
+
+
+class BatchRotatingFileHandler(RotatingFileHandler):
+    """A rotating file handler which writes a batch of records with a single flush.
+
+    A batch is split where the file reaches `maxBytes`, so files are rotated
+    at the same points as record by record.
+    """
+
+    def emit_batch(self, records: List[logging.LogRecord]):
+        """Write records and rotate the file when it's full.
+
+        Args:
+            records (List[logging.LogRecord]): log records.
+        """
+        try:
+            with self.lock:
+                if self.stream is None:
+                    self.stream = self._open()
+                self.stream.seek(0, 2)
+                size = self.stream.tell()
+                chunk: List[str] = []
+                for record in records:
+                    line = self.format(record) + self.terminator
+                    if self.maxBytes and chunk and size + len(line) >= self.maxBytes:
+                        self.stream.write("".join(chunk))
+                        self.doRollover()
+                        chunk, size = [], 0
+                    chunk.append(line)
+                    size += len(line)
+                self.stream.write("".join(chunk))
+                self.flush()
+        except Exception:
+            self.handleError(records[0])
+
+
+class BatchQueueListener(QueueListener):
+    """A queue listener which hands records to its handlers in batches.
+
+    It reports records which have been dropped since the last batch as a
+    warning of its own.
+    """
+
+    def __init__(
+        self,
+        log_queue: queue.Queue,
+        *handlers: logging.Handler,
+        source: Optional[DroppingQueueHandler] = None,
+        batch_size: int = 256,
+    ):
+        """Initialize the class.
+
+        Args:
+            log_queue (queue.Queue): the queue of records.
+            *handlers (logging.Handler): sinks.
+            source (Optional[DroppingQueueHandler]): the handler which feeds the
+                queue, to report its dropped records. Defaults to None.
+            batch_size (int): maximum number of records in a batch. Defaults to 256.
+        """
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.source = source
+        self.batch_size = batch_size
+        self._reported_drops = 0
+
+    def _monitor(self):
+        """Take records in batches until the sentinel arrives."""
+        get, get_nowait = self.queue.get, self.queue.get_nowait
+        while True:
+            batch = [get()]
+            while len(batch) < self.batch_size and batch[-1] is not self._sentinel:
+                try:
+                    batch.append(get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = batch[-1] is self._sentinel
+            if stop:
+                batch.pop()
+            if self.source and self.source.dropped != self._reported_drops:
+                dropped = self.source.dropped - self._reported_drops
+                self._reported_drops += dropped
+                batch.append(
+                    logging.makeLogRecord(
+                        {
+                            "name": "log",
+                            "levelno": logging.WARNING,
+                            "levelname": "WARNING",
+                            "msg": "%d log records have been dropped.",
+                            "args": (dropped,),
+                        }
+                    )
+                )
+            if batch:
+                self.handle_batch(batch)
+            if stop:
+                return
+
+    def handle_batch(self, records: List[logging.LogRecord]):
+        """Pass records to every handler which takes their level.
+
+        Args:
+            records (List[logging.LogRecord]): log records.
+        """
+        for handler in self.handlers:
+            accepted = [record for record in records if record.levelno >= handler.level]
+            if not accepted:
+                continue
+            if hasattr(handler, "emit_batch"):
+                handler.emit_batch(accepted)
+            else:
+                for record in accepted:
+                    handler.handle(record)
+
+    def enqueue_sentinel(self):
+        """Put the sentinel, it waits for room in a full queue."""
+        self.queue.put(self._sentinel)
+
+
+def configure(
+    config: Dict[str, Any],
+    queue_size: int = 10000,
+    file: str = "",
+    max_bytes: int = 0,
+    backups: int = 0,
+) -> DroppingQueueHandler:
+    """Configure logging and move the root logger's sinks behind a queue.
+
+    Args:
+        config (Dict[str, Any]): `logging.config.dictConfig` configuration.
+        queue_size (int): maximum number of records in the queue. Defaults to 10000.
+        file (str): path of an extra rotating file sink, "" for none. Defaults to "".
+        max_bytes (int): size to rotate the file at, 0 never rotates. Defaults to 0.
+        backups (int): number of rotated files to keep. Defaults to 0.
+
+    Returns:
+        DroppingQueueHandler: the root logger's handler, it counts dropped records.
+    """
+    logging.config.dictConfig(config)
+    root = logging.getLogger()
+    sinks = list(root.handlers)
+    if file:
+        sink = BatchRotatingFileHandler(file, maxBytes=max_bytes, backupCount=backups)
+        if sinks:
+            sink.setFormatter(sinks[0].formatter)
+            sink.setLevel(sinks[0].level)
+        sinks.append(sink)
+
+    handler = DroppingQueueHandler(queue.Queue(queue_size))
+    listener = BatchQueueListener(handler.queue, *sinks, source=handler)
+    for sink in sinks:
+        root.removeHandler(sink)
+    root.addHandler(handler)
+    listener.start()
+    # Flush what's left in the queue on exit.
+    atexit.register(listener.stop)
+    return handler
@@ -1,17 +1,32 @@
 """Resource manager module."""
-import logging.config
 import signal
 from collections import defaultdict
-from threading import Thread
-from typing import Any, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread, current_thread, main_thread
+from typing import Any, Sequence, Tuple, Union
 
+from rcr import config
 from rcr.actor import CommandActor, LogActor, MessageActor, SessionActor
+from rcr.actor.envelope import Inbound, Join, Leave, Outbound
+from rcr.actor.trace import Tracer
 from rcr.config import LOGGING
 from rcr.connection.connection import new_connection
 from rcr.contact import Contact
+from rcr.fetcher import Fetcher
+from rcr.fibonacci import Fibonacci
+from rcr.log import configure as configure_logging
+from rcr.metrics import Registry, serve
+from rcr.router import Router, cluster_addresses, unix_addresses
+from rcr.storage import HistoryLog, OfflineStore
 from rcr.type import ConnectionEvent
 
-logging.config.dictConfig(LOGGING)
+log_handler = configure_logging(
+    LOGGING,
+    config.LOG_QUEUE_SIZE,
+    config.LOG_FILE,
+    config.LOG_FILE_MAX_BYTES,
+    config.LOG_FILE_BACKUPS,
+)
 
 
 class Manager:
@@ -20,19 +35,100 @@ class Manager:
     _actors_threads = []
     _connection_thread = None
 
-    def __init__(self, is_server: bool = False):
+    def __init__(self, is_server: bool = False, worker: int = 0, workers: int = 1):
         """Init class.
 
         Args:
             is_server (bool): is in server mode.
+            worker (int): worker number of a multi-process server. Defaults to 0.
+            workers (int): number of server workers. Defaults to 1.
         """
         self.is_server = is_server
+        self._metrics = Registry()
+        self._metrics_server = None
+        self._metrics.counter(
+            "rcr_log_records_dropped_total",
+            "Log records dropped because the log queue was full.",
+            fn=lambda: log_handler.dropped,
+        )
+        self._tracer = Tracer(self._metrics, config.ACTOR_TRACE_THRESHOLD / 1000)
+        if is_server and current_thread() is main_thread():
+            # Tracing is switched by the operator, clients can't do it.
+            signal.signal(
+                signal.SIGUSR2,
+                lambda signum, frame: self._tracer.toggle(
+                    (config.ACTOR_TRACE_THRESHOLD or 100) / 1000
+                ),
+            )
+
+        # Every worker of every node has a router slot, and slots allocate
+        # interleaved client IDs, so they are unique in the whole cluster.
+        if config.CLUSTER_NODES:
+            slot = config.CLUSTER_NODE * workers + worker
+            addresses = cluster_addresses(config.CLUSTER_NODES, workers)
+        else:
+            slot = worker
+            addresses = unix_addresses(
+                config.ROUTER_DIR, "rcr-{}".format(config.SERVER_PORT), workers
+            )
+        if len(addresses) > 1:
+            Contact.configure_ids(slot + 1, len(addresses))
         self._contact = Contact()
+        self._router = Router(
+            slot,
+            addresses,
+            self.receive_routed_message,
+            self._contact.snapshot,
+            config.CLUSTER_SECRET,
+        )
+        self._fibonacci = Fibonacci(
+            config.FIB_MAX_N, config.FIB_INLINE_MAX_N, config.FIB_WORKERS, config.FIB_CACHE_SIZE
+        )
+        self._fetcher = Fetcher(
+            config.URL_WORKERS,
+            config.URL_TIMEOUT,
+            config.URL_CACHE_TTL,
+            config.URL_CACHE_SIZE,
+            deadline=config.URL_DEADLINE,
+            max_size=config.URL_MAX_SIZE,
+        )
+
+        self._offline = None
+        self._identify_executor = None
+        if is_server and config.OFFLINE_DIR:
+            self._offline = OfflineStore(
+                config.OFFLINE_DIR,
+                config.OFFLINE_SEGMENT_SIZE,
+                config.OFFLINE_MAX_MESSAGES,
+                config.OFFLINE_TTL,
+            )
+            # Tokens are hashed there, so the Command actors don't wait for it.
+            self._identify_executor = ThreadPoolExecutor(
+                config.IDENTIFY_WORKERS, thread_name_prefix="identify"
+            )
+            self._metrics.gauge(
+                "rcr_offline_messages",
+                "Messages stored for offline clients.",
+                fn=self._offline.pending,
+            )
+            self._metrics.counter(
+                "rcr_offline_dropped_total",
+                "Stored messages dropped by the per-identity limit.",
+                fn=lambda: self._offline.dropped,
+            )
+        self._history = None
+        if is_server and config.HISTORY_DIR:
+            self._history = HistoryLog(
+                config.HISTORY_DIR, config.HISTORY_SEGMENT_SIZE, config.HISTORY_MAX_SEGMENTS
+            )
 
         # Actor.
         self._log_actor = LogActor(self)
         self._session_actor = SessionActor(self)
-        self._command_actor = CommandActor(self)
+        self._command_actors = [
+            CommandActor(self, "command" if config.COMMAND_ACTORS == 1 else "command-%d" % i)
+            for i in range(max(config.COMMAND_ACTORS, 1))
+        ]
         self._message_actor = MessageActor(self)
         self._actor_thread = Thread(target=self.start_actors)
         self._actor_thread.start()
@@ -53,13 +149,32 @@ class Manager:
         else:
             event_callback[ConnectionEvent.ON_MESSAGE] = self.receive_message_server
             event_callback[ConnectionEvent.ON_JOIN] = self.add_new_client
-            self._connection = new_connection(self.is_server, event_callback)
+            for actor in self._command_actors:
+                actor.inbox.on_drain = self.resume_reading
+            self._connection = new_connection(
+                self.is_server, event_callback, reuse_port=workers > 1, metrics=self._metrics
+            )
             self._connection_thread = Thread(target=self._connection.bind)
+            self._router.start()
+
+            self._metrics.gauge(
+                "rcr_clients",
+                "Clients in the contact book.",
+                fn=lambda: len(self._contact.snapshot()),
+            )
+            if config.METRICS_PORT:
+                self._metrics_server = serve(
+                    self._metrics, config.METRICS_HOST, config.METRICS_PORT + worker
+                )
         self._connection_thread.start()
 
     def disconnect(self, sock: Any):
-        """Disconnect event callback."""
-        self._log_actor.inbox.put({"type": "info", "text": "Connection closed!"})
+        """Disconnect event callback.
+
+        Args:
+            sock (Any): the closed connection object.
+        """
+        self._session_actor.inbox.put(Leave(sock))
 
     def start_actors(self):
         """Start actors."""
@@ -67,9 +182,9 @@ class Manager:
             [
                 Thread(target=self._log_actor.start),
                 Thread(target=self._session_actor.start),
-                Thread(target=self._command_actor.start),
                 Thread(target=self._message_actor.start),
             ]
+            + [Thread(target=actor.start) for actor in self._command_actors]
         )
         for actor_thread in self._actors_threads:
             actor_thread.start()
@@ -81,16 +196,47 @@ class Manager:
             conn (Any): connection object.
             addr (Tuple[str, int]): connection address.
         """
-        self._session_actor.inbox.put({"addr": addr, "conn": conn})
+        self._session_actor.inbox.put(Join(addr, conn))
 
-    def receive_message_server(self, conn: Any, message: str):
+    def receive_message_server(self, conn: Any, message: str) -> bool:
         """Receives a new message from client.
 
         Args:
             conn (Any): connection object.
             message (str): payload.
+
+        Returns:
+            bool: False when the Command actor is saturated, or the connection has
+                too many pending commands, so the server should stop reading from the
+                connection until it has caught up.
         """
-        self._command_actor.inbox.put({"text": message, "conn": conn})
+        inbox = self.command_actor(conn).inbox
+        inbox.put(Inbound(conn, message))
+        return not inbox.saturated(conn)
+
+    def command_actor(self, conn: Any) -> CommandActor:
+        """Return the Command actor of a connection.
+
+        Commands are partitioned by connection, which stands for its sender: a
+        client has a single connection, and its first commands can arrive before
+        it has an ID. So the commands of a client are handled in order, and
+        different clients are handled by different actors.
+
+        Args:
+            conn (Any): connection object.
+
+        Returns:
+            CommandActor: the actor which handles the connection's commands.
+        """
+        actors = self._command_actors
+        if len(actors) == 1:
+            return actors[0]
+        # Connection hashes are mostly object addresses, which share their low bits.
+        return actors[(hash(conn) * 0x9E3779B1 >> 16) % len(actors)]
+
+    def resume_reading(self):
+        """Resume reading connections once the Command actors have caught up."""
+        self._connection.resume_reading()
 
     def receive_message_client(self, conn: Any, message: str):
         """Receives a new message from server.
@@ -100,15 +246,37 @@ class Manager:
             message (str): payload.
         """
         print(message)
-        # self._command_actor.inbox.put({"text": message, "conn": conn})
+        # self.command_actor(conn).inbox.put({"text": message, "conn": conn})
+
+    def receive_routed_message(self, data: Sequence[Union[str, int]]):
+        """Receives a message from another worker.
+
+        Args:
+            data (Sequence[Union[str, int]]): client ID, text and sender ID.
+        """
+        self._message_actor.inbox.put(Outbound(*data, routed=True))
 
     def shutdown(self):
         """Shutdown all resources."""
+        if self._metrics_server:
+            self._metrics_server.shutdown()
+            self._metrics_server.server_close()
+        self._router.shutdown()
         self._log_actor.shutdown()
         self._session_actor.shutdown()
-        self._command_actor.shutdown()
+        for actor in self._command_actors:
+            actor.shutdown()
         self._message_actor.shutdown()
+        self._tracer.shutdown()
         self._connection.shutdown()
+        self._fibonacci.shutdown()
+        self._fetcher.shutdown()
+        if self._identify_executor:
+            self._identify_executor.shutdown(wait=False, cancel_futures=True)
+        if self._offline:
+            self._offline.close()
+        if self._history:
+            self._history.close()
 
     def start(self):
         """Start manager service."""
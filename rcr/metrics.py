@@ -0,0 +1,435 @@
+"""In-process metrics module.
+
+A `Registry` holds counters, gauges and histograms and renders them in the
+Prometheus text exposition format. A metric can have labels, then every label
+value combination is a child metric which is created by `labels`.
+
+Counters and histograms are updated without locks: every thread has its own
+cell, which only that thread writes, and readers sum the cells. So updates
+from the selector thread and the actor threads never wait for each other, and
+reading is the only work which grows with the number of threads.
+"""
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Seconds, for latencies from microseconds to seconds.
+DEFAULT_BUCKETS = (
+    0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _Cells:
+    """Per-thread cells of a metric."""
+
+    __slots__ = ("_size", "_cells", "_lock")
+
+    def __init__(self, size: int):
+        self._size = size
+        self._cells: Dict[int, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def new_cell(self) -> List[float]:
+        """Create the cell of the calling thread.
+
+        Returns:
+            List[float]: the cell.
+        """
+        cell = [0] * self._size
+        with self._lock:
+            self._cells[threading.get_ident()] = cell
+        return cell
+
+    def total(self) -> List[float]:
+        """Sum the cells of all threads.
+
+        Returns:
+            List[float]: totals.
+        """
+        with self._lock:
+            cells = list(self._cells.values())
+        return [sum(values) for values in zip(*cells)] if cells else [0] * self._size
+
+
+class Counter:
+    """A value which only goes up."""
+
+    __slots__ = ("_cells", "_get_cell", "_fn")
+
+    def __init__(self, fn: Optional[Callable[[], float]] = None):
+        """Initialize the class.
+
+        Args:
+            fn (Optional[Callable[[], float]]): it returns the value, when it's
+                counted by someone else. Defaults to None.
+        """
+        self._cells = _Cells(1)
+        self._get_cell = self._cells._cells.get
+        self._fn = fn
+
+    def inc(self, amount: float = 1):
+        """Increase the value.
+
+        Args:
+            amount (float): increment. Defaults to 1.
+        """
+        cell = self._get_cell(threading.get_ident())
+        if cell is None:
+            cell = self._cells.new_cell()
+        cell[0] += amount
+
+    def value(self) -> float:
+        """Return the current value.
+
+        Returns:
+            float: value.
+        """
+        if self._fn is not None:
+            return self._fn()
+        return self._cells.total()[0]
+
+
+class Gauge:
+    """A value which goes up and down, it's set by a single writer or read from a function."""
+
+    __slots__ = ("_value", "_fn")
+
+    def __init__(self, fn: Optional[Callable[[], float]] = None):
+        """Initialize the class.
+
+        Args:
+            fn (Optional[Callable[[], float]]): it returns the value on reading.
+                Defaults to None.
+        """
+        self._value = 0
+        self._fn = fn
+
+    def set(self, value: float):
+        """Set the value.
+
+        Args:
+            value (float): value.
+        """
+        self._value = value
+
+    def value(self) -> float:
+        """Return the current value.
+
+        Returns:
+            float: value.
+        """
+        if self._fn is not None:
+            return self._fn()
+        return self._value
+
+
+class Histogram:
+    """Distribution of observed values in buckets."""
+
+    __slots__ = ("buckets", "_cells", "_get_cell")
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """Initialize the class.
+
+        Args:
+            buckets (Sequence[float]): upper bounds of buckets, in increasing order.
+                Defaults to DEFAULT_BUCKETS.
+        """
+        self.buckets = tuple(buckets)
+        # A count per bucket, the +Inf bucket, and the sum.
+        self._cells = _Cells(len(self.buckets) + 2)
+        self._get_cell = self._cells._cells.get
+
+    def observe(self, value: float):
+        """Observe a value.
+
+        Args:
+            value (float): value.
+        """
+        cell = self._get_cell(threading.get_ident())
+        if cell is None:
+            cell = self._cells.new_cell()
+        cell[bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        """Return cumulative bucket counts and the sum.
+
+        Returns:
+            Tuple[List[int], float]: a count per bucket, the last one is +Inf
+                and it's the number of observations, and the sum of values.
+        """
+        total = self._cells.total()
+        counts, running = [], 0
+        for count in total[:-1]:
+            running += count
+            counts.append(running)
+        return counts, total[-1]
+
+
+class Family:
+    """A metric and its children by label values."""
+
+    def __init__(
+        self,
+        kind: str,
+        name: str,
+        documentation: str,
+        label_names: Tuple[str, ...],
+        factory: Callable,
+    ):
+        """Initialize the class.
+
+        Args:
+            kind (str): counter, gauge or histogram.
+            name (str): metric name.
+            documentation (str): help text.
+            label_names (Tuple[str, ...]): label names.
+            factory (Callable): creates a child.
+        """
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._factory = factory
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str, fn: Optional[Callable[[], float]] = None):
+        """Get the child of label values, it's created on first use.
+
+        Args:
+            *values (str): label values, in the order of label names.
+            fn (Optional[Callable[[], float]]): it returns the value of a new
+                counter or gauge child. Defaults to None.
+
+        Returns:
+            Union[Counter, Gauge, Histogram]: the child.
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.label_names):
+                raise ValueError("%s needs labels %s." % (self.name, self.label_names))
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._factory(fn) if fn else self._factory()
+                    self._children[values] = child
+        return child
+
+    def samples(self) -> List[Tuple[str, Tuple[Tuple[str, str], ...], float]]:
+        """Collect samples.
+
+        Returns:
+            List[Tuple[str, Tuple[Tuple[str, str], ...], float]]: (name, labels, value)
+                of every sample.
+        """
+        with self._lock:
+            children = list(self._children.items())
+
+        samples = []
+        for values, child in children:
+            labels = tuple(zip(self.label_names, values))
+            if self.kind != "histogram":
+                samples.append((self.name, labels, child.value()))
+                continue
+            counts, total = child.snapshot()
+            for bound, count in zip(child.buckets + (float("inf"),), counts):
+                samples.append(
+                    (self.name + "_bucket", labels + (("le", _format_value(bound)),), count)
+                )
+            samples.append((self.name + "_sum", labels, total))
+            samples.append((self.name + "_count", labels, counts[-1]))
+        return samples
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value."""
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _format_sample(name: str, labels: Tuple[Tuple[str, str], ...], value: float) -> str:
+    """Format a sample line."""
+    if not labels:
+        return "{} {}".format(name, _format_value(value))
+    return "{}{{{}}} {}".format(
+        name,
+        ",".join(
+            '{}="{}"'.format(
+                key, str(label).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            )
+            for key, label in labels
+        ),
+        _format_value(value),
+    )
+
+
+class Registry:
+    """Metrics registry class.
+
+    Registering a metric name again returns the registered metric, so several
+    components can share a family with different labels.
+    """
+
+    def __init__(self):
+        self._families: Dict[str, Family] = {}
+        self._lock = threading.Lock()
+
+    def _register(
+        self, kind: str, name: str, documentation: str, labels: Sequence[str], factory: Callable
+    ):
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = Family(kind, name, documentation, tuple(labels), factory)
+                self._families[name] = family
+            elif family.kind != kind or family.label_names != tuple(labels):
+                raise ValueError("%s is already registered differently." % name)
+        return family
+
+    def counter(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        fn: Optional[Callable[[], float]] = None,
+    ):
+        """Register a counter.
+
+        Args:
+            name (str): metric name.
+            documentation (str): help text.
+            labels (Sequence[str]): label names. Defaults to ().
+            fn (Optional[Callable[[], float]]): it returns the value of an unlabeled
+                counter which is counted by someone else. Defaults to None.
+
+        Returns:
+            Union[Counter, Family]: the counter, or its family if it has labels.
+        """
+        family = self._register("counter", name, documentation, labels, Counter)
+        return family if labels else family.labels(fn=fn)
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        fn: Optional[Callable[[], float]] = None,
+    ):
+        """Register a gauge.
+
+        Args:
+            name (str): metric name.
+            documentation (str): help text.
+            labels (Sequence[str]): label names. Defaults to ().
+            fn (Optional[Callable[[], float]]): it returns the value of an unlabeled
+                gauge. Defaults to None.
+
+        Returns:
+            Union[Gauge, Family]: the gauge, or its family if it has labels.
+        """
+        family = self._register("gauge", name, documentation, labels, Gauge)
+        return family if labels else family.labels(fn=fn)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        """Register a histogram.
+
+        Args:
+            name (str): metric name.
+            documentation (str): help text.
+            labels (Sequence[str]): label names. Defaults to ().
+            buckets (Sequence[float]): upper bounds of buckets. Defaults to DEFAULT_BUCKETS.
+
+        Returns:
+            Union[Histogram, Family]: the histogram, or its family if it has labels.
+        """
+        family = self._register(
+            "histogram", name, documentation, labels, lambda: Histogram(buckets)
+        )
+        return family if labels else family.labels()
+
+    def families(self) -> List[Family]:
+        """Return registered metrics in registering order.
+
+        Returns:
+            List[Family]: metric families.
+        """
+        with self._lock:
+            return list(self._families.values())
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text format.
+
+        Returns:
+            str: exposition text.
+        """
+        lines = []
+        for family in self.families():
+            lines.append("# HELP {} {}".format(family.name, family.documentation))
+            lines.append("# TYPE {} {}".format(family.name, family.kind))
+            lines.extend(_format_sample(*sample) for sample in family.samples())
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> List[str]:
+        """Render all samples except histogram buckets.
+
+        Returns:
+            List[str]: a line per sample.
+        """
+        return [
+            _format_sample(*sample)
+            for family in self.families()
+            for sample in family.samples()
+            if not sample[0].endswith("_bucket")
+        ]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Metrics HTTP request handler."""
+
+    registry: Registry
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Keep scrapes out of the server log."""
+
+
+def serve(registry: Registry, host: str, port: int) -> ThreadingHTTPServer:
+    """Serve metrics over HTTP at `/metrics` in a daemon thread.
+
+    Args:
+        registry (Registry): metrics registry.
+        host (str): host address.
+        port (int): port number.
+
+    Returns:
+        ThreadingHTTPServer: the HTTP server, `shutdown` stops it.
+    """
+    handler = type("Handler", (_Handler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
@@ -0,0 +1,74 @@
+"""Rate limiter module."""
+from typing import Any, Dict, List
+
+
+class RateLimiter:
+    """Token buckets, one per key.
+
+    A key can take up to `burst` tokens at once, and it earns `rate` tokens per
+    second up to `burst` again. Buckets are created on first use, and full ones
+    are forgotten from time to time, since they're the same as a new one.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        """Initialize the class.
+
+        Args:
+            rate (float): tokens per second.
+            burst (int): capacity of a bucket.
+        """
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate and burst must be positive.")
+
+        self.rate = rate
+        self.burst = burst
+        # key -> [tokens, time they were counted].
+        self._buckets: Dict[Any, List[float]] = {}
+        # A bucket refills in `burst / rate` seconds, so older ones are full.
+        self._prune_interval = max(burst / rate, 1.0)
+        self._pruned_at = 0.0
+
+    def allow(self, key: Any, now: float) -> bool:
+        """Take a token of a key.
+
+        Args:
+            key (Any): e.g. a client ID.
+            now (float): monotonic time.
+
+        Returns:
+            bool: False if the key is out of tokens.
+        """
+        if now - self._pruned_at >= self._prune_interval:
+            self._prune(now)
+
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            self._buckets[key] = [self.burst - 1, now]
+            return True
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            return False
+        bucket[0] = tokens - 1
+        return True
+
+    def _prune(self, now: float):
+        """Forget the buckets which have refilled.
+
+        Args:
+            now (float): monotonic time.
+        """
+        self._pruned_at = now
+        limit = now - self._prune_interval
+        self._buckets = {
+            key: bucket for key, bucket in self._buckets.items() if bucket[1] > limit
+        }
+
+    def __len__(self) -> int:
+        """Return the number of tracked keys.
+
+        Returns:
+            int: number of buckets.
+        """
+        return len(self._buckets)
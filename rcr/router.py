@@ -0,0 +1,705 @@
+"""Inter-process message router."""
+import hashlib
+import hmac
+import json
+import logging
+import os
+import selectors
+import socket
+from collections import deque
+from threading import Condition, Event, Lock, Thread
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple, Union
+
+from rcr.connection.framing import LineBuffer
+from rcr.exception import FrameTooLongError
+
+# A router address is a Unix socket path or a (host, port) pair.
+Address = Union[str, Tuple[str, int]]
+
+
+def unix_addresses(directory: str, name: str, count: int) -> List[str]:
+    """Return Unix socket paths for a group of routers.
+
+    Args:
+        directory (str): sockets directory.
+        name (str): group name, it should be unique per server.
+        count (int): number of routers.
+
+    Returns:
+        List[str]: a socket path for every router slot.
+    """
+    return [os.path.join(directory, "{}-{}.sock".format(name, slot)) for slot in range(count)]
+
+
+def cluster_addresses(nodes: Sequence[str], workers: int = 1) -> List[Tuple[str, int]]:
+    """Return TCP addresses for the routers of a cluster.
+
+    Every node runs the same number of workers, and worker k of a node listens
+    on the node's router port plus k.
+
+    Args:
+        nodes (Sequence[str]): router address of every node in "host:port" format.
+        workers (int): number of workers per node. Defaults to 1.
+
+    Returns:
+        List[Tuple[str, int]]: an address for every router slot, grouped by node.
+    """
+    addresses = []
+    for node in nodes:
+        host, port = node.rsplit(":", 1)
+        addresses.extend((host, int(port) + worker) for worker in range(workers))
+    return addresses
+
+
+class PeerWriter:
+    """Outgoing connection to a peer, frames are queued and written by its own thread.
+
+    The callers never wait for the peer: when the queue is over `max_size`
+    bytes, `put` fails and the connection should be dropped.
+    """
+
+    def __init__(
+        self, sock: socket.socket, max_size: int, on_error: Callable[["PeerWriter"], None]
+    ):
+        """Initialize the class.
+
+        Args:
+            sock (socket.socket): a connected socket with a timeout.
+            max_size (int): maximum bytes of queued frames.
+            on_error (Callable[[PeerWriter], None]): it's called from the writing
+                thread when the connection is broken.
+        """
+        self.sock = sock
+        self.max_size = max_size
+        self.on_error = on_error
+        # Bytes which are queued or being written.
+        self.size = 0
+        self._frames: Deque[bytes] = deque()
+        self._ready = Condition()
+        self._closed = False
+        self._thread = Thread(target=self._write, name="router-write", daemon=True)
+
+    def start(self):
+        """Start the writing thread."""
+        self._thread.start()
+
+    def put(self, data: bytes) -> bool:
+        """Queue an encoded frame.
+
+        Args:
+            data (bytes): encoded frame.
+
+        Returns:
+            bool: False if the writer is closed or the queue is full.
+        """
+        with self._ready:
+            if self._closed or self.size + len(data) > self.max_size:
+                return False
+            self._frames.append(data)
+            self.size += len(data)
+            self._ready.notify()
+        return True
+
+    def close(self, flush: bool = False, wait: bool = False):
+        """Close the connection.
+
+        Args:
+            flush (bool): write the queued frames first, they are discarded
+                otherwise. Defaults to False.
+            wait (bool): wait for the writing thread to stop. Defaults to False.
+        """
+        with self._ready:
+            self._closed = True
+            if not flush:
+                self._frames.clear()
+            self._ready.notify()
+        if not flush:
+            # It interrupts a blocking write of the other thread.
+            self._close_socket()
+        if wait and self._thread.ident is not None:
+            self._thread.join()
+
+    def _close_socket(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+    def _write(self):
+        """Write queued frames, it runs in its own thread."""
+        while True:
+            with self._ready:
+                while not self._frames and not self._closed:
+                    self._ready.wait()
+                if not self._frames:
+                    break
+                data = b"".join(self._frames)
+                self._frames.clear()
+            try:
+                self.sock.sendall(data)
+            except OSError:
+                if not self._closed:
+                    self.on_error(self)
+                break
+            with self._ready:
+                self.size -= len(data)
+        self._close_socket()
+
+
+class Router:
+    """Route messages between server workers.
+
+    Every worker has a slot and owns the client IDs which are congruent to its
+    slot modulo the number of slots (see `Contact.configure_ids`), so the owner
+    of a client is known without asking anybody.
+
+    Routers exchange newline-delimited JSON frames over stream sockets. The
+    `deliver` and `broadcast` frames carry Message actor data, and the `sync`,
+    `join` and `leave` frames keep a copy of the other workers' members, so `w`
+    can list all clients. A router with a single slot doesn't open any socket.
+
+    Frames to a peer are queued and written by its `PeerWriter`, so a slow peer
+    doesn't block the actors; a peer which falls `send_queue_size` bytes behind
+    is dropped like a slow client, and its connection is opened again.
+
+    The routers of a cluster talk over TCP, so they need a shared secret. The
+    secret never goes over the wire: a router sends a `challenge` frame with a
+    random nonce to every connection it accepts, and the connection is kept
+    only if its first frame is a `sync` with the HMAC-SHA256 of the nonce and
+    the peer's slot. Frames aren't encrypted, so the router addresses should
+    still be on a trusted network. A connection which sends a malformed frame
+    is closed.
+    """
+
+    # Maximum length of a frame, Fibonacci results can be big.
+    max_frame_length = 64 * 1024 * 1024
+
+    # Maximum length of a frame before the peer's `sync`, which lists its members.
+    sync_frame_length = 4 * 1024 * 1024
+
+    # Maximum length of a `challenge` frame.
+    challenge_frame_length = 1024
+
+    # Seconds between connecting attempts to the peers which are down.
+    reconnect_interval = 0.5
+
+    # Seconds to wait for a stuck peer before dropping its connection.
+    send_timeout = 5
+
+    # Maximum bytes of frames which are queued for a peer.
+    send_queue_size = 256 * 1024 * 1024
+
+    def __init__(
+        self,
+        slot: int,
+        addresses: Sequence[Address],
+        deliver: Optional[Callable[[Any], None]] = None,
+        local_members: Optional[Callable[[], Sequence[int]]] = None,
+        secret: str = "",
+    ):
+        """Initialize the class.
+
+        Args:
+            slot (int): slot of this router in `addresses`.
+            addresses (Sequence[Address]): addresses of all routers.
+            deliver (Optional[Callable[[Any], None]]): it's called with Message
+                actor data which comes from other workers. Defaults to None.
+            local_members (Optional[Callable[[], Sequence[int]]]): it returns the
+                client IDs of this worker, they are sent to peers after connecting.
+                Defaults to None.
+            secret (str): shared secret of the routers. Defaults to "".
+        """
+        if not 0 <= slot < len(addresses):
+            raise ValueError("slot must be an index of addresses.")
+        if len(addresses) > 1 and not secret and not isinstance(addresses[0], str):
+            raise ValueError("routers which talk over TCP need a shared secret.")
+
+        self.slot = slot
+        self.addresses = list(addresses)
+        self.deliver = deliver or (lambda data: None)
+        self.local_members = local_members or tuple
+        self.secret = secret
+
+        self._log = logging.getLogger("router")
+        self._stop = Event()
+        # It wakes up the connecting thread before its next attempt.
+        self._reconnect = Event()
+        self._threads: List[Thread] = []
+        self._listener: Optional[socket.socket] = None
+        self._selector: Optional[selectors.BaseSelector] = None
+
+        # Outgoing connections, one per peer slot.
+        self._peers: Dict[int, PeerWriter] = {}
+        self._peer_locks = {peer: Lock() for peer in self.peer_slots}
+
+        # Members of other workers by slot, and their snapshot for readers.
+        self._remote: Dict[int, Dict[int, None]] = {}
+        self._remote_lock = Lock()
+        self._remote_snapshot: Optional[Tuple[int, ...]] = ()
+
+    @property
+    def peer_slots(self) -> List[int]:
+        """Slots of the other routers."""
+        return [slot for slot in range(len(self.addresses)) if slot != self.slot]
+
+    def owner(self, client_id: int) -> int:
+        """Return the slot which owns a client ID.
+
+        Args:
+            client_id (int): client ID.
+
+        Returns:
+            int: owner's slot.
+        """
+        return (client_id - 1) % len(self.addresses)
+
+    def is_local(self, client_id: int) -> bool:
+        """Return True if a client ID belongs to this worker.
+
+        Args:
+            client_id (int): client ID.
+
+        Returns:
+            bool: the client ID is local or not.
+        """
+        return self.owner(client_id) == self.slot
+
+    def start(self):
+        """Start listening to peers and connecting to them."""
+        if not self.peer_slots:
+            return
+
+        self._listener = self._socket(self.addresses[self.slot])
+        if isinstance(self.addresses[self.slot], str) and os.path.exists(
+            self.addresses[self.slot]
+        ):
+            # A stale socket file of a crashed worker.
+            os.unlink(self.addresses[self.slot])
+        self._listener.bind(self.addresses[self.slot])
+        self._listener.listen(len(self.addresses))
+        self._listener.setblocking(False)
+
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._listener, selectors.EVENT_READ)
+
+        self._threads = [
+            Thread(target=self._serve, name="router-serve", daemon=True),
+            Thread(target=self._connect_peers, name="router-connect", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def shutdown(self):
+        """Stop the router and close its connections."""
+        self._stop.set()
+        self._reconnect.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+        for peer in list(self._peers):
+            with self._peer_locks[peer]:
+                writer = self._peers.pop(peer, None)
+            if writer is not None:
+                writer.close(flush=True, wait=True)
+
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+            if isinstance(self.addresses[self.slot], str):
+                try:
+                    os.unlink(self.addresses[self.slot])
+                except FileNotFoundError:
+                    pass
+
+    def send(self, client_id: int, data: Any) -> bool:
+        """Send Message actor data to the worker which owns a client.
+
+        Args:
+            client_id (int): recipient's client ID.
+            data (Any): Message actor data, it must be JSON serializable.
+
+        Returns:
+            bool: the owner has got the message or not.
+        """
+        return self._send(self.owner(client_id), {"op": "deliver", "data": data})
+
+    def broadcast(self, data: Any):
+        """Send Message actor data to all other workers.
+
+        Args:
+            data (Any): Message actor data, it must be JSON serializable.
+        """
+        self._send_all({"op": "broadcast", "data": data})
+
+    def join(self, client_id: int):
+        """Tell other workers about a new local client.
+
+        Args:
+            client_id (int): client ID.
+        """
+        self._send_all({"op": "join", "id": client_id})
+
+    def leave(self, client_id: int):
+        """Tell other workers about a local client which has left.
+
+        Args:
+            client_id (int): client ID.
+        """
+        self._send_all({"op": "leave", "id": client_id})
+
+    def remote_snapshot(self) -> Tuple[int, ...]:
+        """Return an immutable snapshot of the other workers' clients.
+
+        Returns:
+            Tuple[int, ...]: client IDs grouped by worker, in joining order.
+        """
+        snapshot = self._remote_snapshot
+        if snapshot is None:
+            with self._remote_lock:
+                if self._remote_snapshot is None:
+                    self._remote_snapshot = tuple(
+                        client_id
+                        for slot in sorted(self._remote)
+                        for client_id in self._remote[slot]
+                    )
+                snapshot = self._remote_snapshot
+        return snapshot
+
+    @staticmethod
+    def _socket(address: Address) -> socket.socket:
+        """Create a stream socket for an address.
+
+        Args:
+            address (Address): router address.
+
+        Returns:
+            socket.socket: a new socket.
+        """
+        if isinstance(address, str):
+            return socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        return sock
+
+    @staticmethod
+    def _encode(frame: Dict[str, Any]) -> bytes:
+        return json.dumps(frame, separators=(",", ":")).encode() + b"\n"
+
+    def _send(self, peer: int, frame: Dict[str, Any]) -> bool:
+        """Send a frame to a peer.
+
+        Args:
+            peer (int): peer's slot.
+            frame (Dict[str, Any]): frame.
+
+        Returns:
+            bool: sending was successful or not.
+        """
+        if peer == self.slot:
+            raise ValueError("can't route a message to the same slot.")
+        return self._send_encoded(peer, self._encode(frame))
+
+    def _send_all(self, frame: Dict[str, Any]):
+        """Send a frame to all peers.
+
+        Args:
+            frame (Dict[str, Any]): frame.
+        """
+        data = self._encode(frame)
+        for peer in self.peer_slots:
+            self._send_encoded(peer, data)
+
+    def _send_encoded(self, peer: int, data: bytes) -> bool:
+        """Queue an encoded frame for a peer, the connection is dropped if it's behind.
+
+        Args:
+            peer (int): peer's slot.
+            data (bytes): encoded frame.
+
+        Returns:
+            bool: queueing was successful or not.
+        """
+        with self._peer_locks[peer]:
+            writer = self._peers.get(peer)
+            if writer is None:
+                return False
+            if writer.put(data):
+                return True
+            self._log.warning("router peer %s is too slow, its connection is dropped", peer)
+            del self._peers[peer]
+        writer.close()
+        return False
+
+    def _drop_writer(self, peer: int, writer: PeerWriter):
+        """Drop a broken outgoing connection, the connecting thread opens a new one.
+
+        Args:
+            peer (int): peer's slot.
+            writer (PeerWriter): the connection's writer.
+        """
+        self._log.warning("router peer %s is gone", peer)
+        with self._peer_locks[peer]:
+            if self._peers.get(peer) is writer:
+                del self._peers[peer]
+        writer.close()
+
+    def _connect_peers(self):
+        """Keep connections to all peers, it runs in its own thread."""
+        while not self._stop.is_set():
+            for peer in self.peer_slots:
+                if peer in self._peers:
+                    continue
+                sock = self._socket(self.addresses[peer])
+                sock.settimeout(self.send_timeout)
+                try:
+                    sock.connect(self.addresses[peer])
+                    nonce = self._read_challenge(sock)
+                except (OSError, FrameTooLongError, ValueError, KeyError, TypeError):
+                    sock.close()
+                    continue
+
+                writer = PeerWriter(
+                    sock,
+                    self.send_queue_size,
+                    lambda writer, peer=peer: self._drop_writer(peer, writer),
+                )
+                with self._peer_locks[peer]:
+                    # Members are read under the lock, so a `join` or `leave`
+                    # which is queued after them can't be overtaken.
+                    sync = {
+                        "op": "sync",
+                        "slot": self.slot,
+                        "proof": self._proof(nonce, self.slot),
+                        "ids": list(self.local_members()),
+                    }
+                    writer.put(self._encode(sync))
+                    self._peers[peer] = writer
+                writer.start()
+            self._reconnect.wait(self.reconnect_interval)
+            self._reconnect.clear()
+
+    def _read_challenge(self, sock: socket.socket) -> str:
+        """Read the `challenge` frame which a peer sends after accepting a connection.
+
+        Args:
+            sock (socket.socket): a new connection to the peer.
+
+        Returns:
+            str: the peer's nonce.
+
+        Raises:
+            OSError: when the connection is broken or it times out.
+            ValueError: when the frame is malformed.
+        """
+        buffer = LineBuffer(self.challenge_frame_length)
+        frames = []
+        while not frames:
+            data = sock.recv(self.challenge_frame_length)
+            if not data:
+                raise ConnectionError("the peer has closed the connection.")
+            frames = buffer.feed(data)
+        frame = json.loads(frames[0])
+        if len(frames) > 1 or frame["op"] != "challenge" or not isinstance(frame["nonce"], str):
+            raise ValueError("invalid challenge.")
+        return frame["nonce"]
+
+    def _proof(self, nonce: str, slot: Any) -> str:
+        """Return the answer to a challenge: an HMAC of its nonce and a slot with the secret.
+
+        Args:
+            nonce (str): nonce of the challenge.
+            slot (Any): slot of the connecting router.
+
+        Returns:
+            str: hex digest.
+        """
+        message = "{}:{}".format(nonce, slot).encode()
+        return hmac.new(self.secret.encode(), message, hashlib.sha256).hexdigest()
+
+    def _serve(self):
+        """Receive frames from peers, it runs in its own thread."""
+        while not self._stop.is_set():
+            for key, _ in self._selector.select(self.reconnect_interval):
+                if key.fileobj is self._listener:
+                    self._accept()
+                else:
+                    self._receive(key.fileobj, key.data)
+
+        for key in list(self._selector.get_map().values()):
+            if key.fileobj is not self._listener:
+                key.fileobj.close()
+        self._selector.close()
+
+    def _accept(self):
+        """Accept a peer connection."""
+        try:
+            conn, _ = self._listener.accept()
+        except BlockingIOError:
+            return
+        conn.setblocking(False)
+        nonce = os.urandom(16).hex()
+        try:
+            # It's tiny and the first data of the connection, it fits in its buffer.
+            conn.sendall(self._encode({"op": "challenge", "nonce": nonce}))
+        except OSError:
+            conn.close()
+            return
+        # The peer's slot is known after its `sync` frame.
+        state = {"slot": None, "nonce": nonce, "buffer": LineBuffer(self.sync_frame_length)}
+        self._selector.register(conn, selectors.EVENT_READ, state)
+
+    def _receive(self, conn: socket.socket, state: Dict[str, Any]):
+        """Read frames of a peer connection.
+
+        Args:
+            conn (socket.socket): peer connection.
+            state (Dict[str, Any]): connection state.
+        """
+        try:
+            data = conn.recv(65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+
+        try:
+            frames = state["buffer"].feed(data) if data else None
+        except FrameTooLongError:
+            frames = None
+
+        if frames is None:
+            self._close_peer(conn, state)
+            return
+
+        for line in frames:
+            try:
+                self._handle(json.loads(line), state)
+            except (ValueError, KeyError, TypeError) as e:
+                self._log.warning("router peer is rejected: %r", e)
+                self._close_peer(conn, state)
+                return
+
+    def _handle(self, frame: Dict[str, Any], state: Dict[str, Any]):
+        """Handle a frame of a peer connection.
+
+        Args:
+            frame (Dict[str, Any]): decoded frame.
+            state (Dict[str, Any]): connection state.
+
+        Raises:
+            ValueError: when the frame is malformed, or the peer hasn't answered
+                the challenge in its first frame.
+        """
+        if not isinstance(frame, dict):
+            raise ValueError("frame isn't an object.")
+        op = frame["op"]
+        if state["slot"] is None and not (
+            op == "sync"
+            and hmac.compare_digest(
+                frame.get("proof", ""), self._proof(state["nonce"], frame.get("slot"))
+            )
+        ):
+            raise ValueError("it hasn't answered the challenge.")
+
+        if op == "deliver" or op == "broadcast":
+            self.deliver(self._message(frame["data"]))
+        elif op == "join":
+            client_id = self._client_id(frame["id"])
+            self._update_remote(self.owner(client_id), add=client_id)
+        elif op == "leave":
+            client_id = self._client_id(frame["id"])
+            self._update_remote(self.owner(client_id), remove=client_id)
+        elif op == "sync":
+            slot = frame["slot"]
+            if type(slot) is not int or slot not in self.peer_slots:
+                raise ValueError("invalid slot {!r}.".format(slot))
+            if state["slot"] not in (None, slot):
+                raise ValueError("the peer has changed its slot.")
+            ids = [self._client_id(client_id) for client_id in frame["ids"]]
+            state["slot"] = slot
+            state["buffer"].max_line_length = self.max_frame_length
+            self._update_remote(slot, clear=True, add=ids)
+            if slot not in self._peers:
+                # The peer is up, connect to it without waiting.
+                self._reconnect.set()
+
+    @staticmethod
+    def _client_id(value: Any) -> int:
+        """Check a client ID of a frame.
+
+        Raises:
+            TypeError: when it isn't a positive integer.
+        """
+        if type(value) is not int or value < 1:
+            raise TypeError("invalid client ID {!r}.".format(value))
+        return value
+
+    @staticmethod
+    def _message(data: Any) -> List[Union[int, str]]:
+        """Check Message actor data of a frame: client ID, text and sender ID.
+
+        The IDs are 0 for a broadcast and a server reply.
+
+        Raises:
+            TypeError: when it's malformed.
+        """
+        if not (
+            isinstance(data, list)
+            and len(data) == 3
+            and type(data[0]) is int
+            and isinstance(data[1], str)
+            and type(data[2]) is int
+            and data[0] >= 0
+            and data[2] >= 0
+        ):
+            raise TypeError("invalid message data.")
+        return data
+
+    def _close_peer(self, conn: socket.socket, state: Dict[str, Any]):
+        """Close a peer connection and forget its clients.
+
+        Args:
+            conn (socket.socket): peer connection.
+            state (Dict[str, Any]): connection state.
+        """
+        self._selector.unregister(conn)
+        conn.close()
+        if state["slot"] is None:
+            return
+
+        self._update_remote(state["slot"], clear=True)
+        # Writing to a dead TCP peer may not fail at once, so drop the outgoing
+        # connection too and let the connecting thread open a new one.
+        with self._peer_locks[state["slot"]]:
+            writer = self._peers.pop(state["slot"], None)
+        if writer is not None:
+            writer.close(flush=True)
+
+    def _update_remote(
+        self,
+        slot: int,
+        clear: bool = False,
+        add: Union[int, List[int], None] = None,
+        remove: Optional[int] = None,
+    ):
+        """Update members of a peer.
+
+        Args:
+            slot (int): peer's slot.
+            clear (bool): forget current members first. Defaults to False.
+            add (Union[int, List[int], None]): new member or members. Defaults to None.
+            remove (Optional[int]): removed member. Defaults to None.
+        """
+        with self._remote_lock:
+            members = self._remote.setdefault(slot, {})
+            if clear:
+                members.clear()
+            if isinstance(add, int):
+                members[add] = None
+            elif add:
+                members.update(dict.fromkeys(add))
+            if remove is not None:
+                members.pop(remove, None)
+            self._remote_snapshot = None
@@ -0,0 +1,5 @@
+"""Storage module."""
+from rcr.storage.history import HistoryEntry, HistoryLog
+from rcr.storage.offline import OfflineStore, StoredMessage
+
+__all__ = ["HistoryEntry", "HistoryLog", "OfflineStore", "StoredMessage"]
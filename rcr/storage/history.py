@@ -0,0 +1,348 @@
+"""Chat history module."""
+import bisect
+import os
+import struct
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from rcr.type import RecordKind
+
+from .segment import HEADER, Record, Segment
+
+# A chat record's value is its sender ID, its recipient ID (0 for a broadcast) and its text.
+_PARTIES = struct.Struct("!II")
+# An index file is the end of its segment, then the (time, offset) of every
+# `index_interval`th record.
+_INDEX_END = struct.Struct("!I")
+_INDEX_ENTRY = struct.Struct("!dI")
+_SUFFIX = ".seg"
+_INDEX_SUFFIX = ".idx"
+
+# (segment number, offset) of a record, or of the end of the log.
+_Position = Tuple[int, int]
+# The position of a client ID which hasn't joined, it's after all records.
+_NOT_JOINED: _Position = (2**63, 0)
+
+
+class HistoryEntry(NamedTuple):
+    """A message of the chat history."""
+
+    created_at: float
+    sender_id: int
+    # Recipient's client ID, 0 means all clients.
+    client_id: int
+    text: str
+
+
+def _entry(record: Record) -> HistoryEntry:
+    """Decode a chat record."""
+    sender_id, client_id = _PARTIES.unpack_from(record.value)
+    return HistoryEntry(
+        record.created_at, sender_id, client_id, record.value[_PARTIES.size:].decode()
+    )
+
+
+class HistoryLog:
+    """An append-only log of the messages and broadcasts of the server.
+
+    Messages are appended to memory-mapped segment files in `directory`, in
+    time order; the times are kept non-decreasing even if the clock goes back.
+    Every segment has a sparse index of the time and offset of every
+    `index_interval`th record, so a query reads a few records around where it
+    starts instead of the whole segment. The index of a full segment is saved
+    next to it, and the one of the active segment is rebuilt when the log is
+    opened.
+
+    Only the last `max_segments` segments are kept.
+
+    Client IDs are given again to new clients, so the position of the end of
+    the log is kept when a client joins, and it gets only the direct messages
+    which have been appended after it; broadcasts are public.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_size: int = 16 * 1024 * 1024,
+        max_segments: int = 64,
+        index_interval: int = 64,
+        clock: Callable[[], float] = time.time,
+    ):
+        """Open or create a log.
+
+        Args:
+            directory (str): directory of the segment files. It's created if it's missing.
+            segment_size (int): size of a segment file. Defaults to 16 MiB.
+            max_segments (int): segments to keep, 0 keeps all of them. Defaults to 64.
+            index_interval (int): records per index entry. Defaults to 64.
+            clock (Callable[[], float]): it returns the current time. Defaults to time.time.
+        """
+        if segment_size < HEADER.size * 16 or index_interval < 1:
+            raise ValueError("segment_size is too small or index_interval isn't positive.")
+
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_segments = max_segments
+        self.index_interval = index_interval
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._closed = False
+        # Segments by number in order, the last one is the active one.
+        self._segments: Dict[int, Segment] = {}
+        # Sparse index of every segment: times and offsets.
+        self._times: Dict[int, List[float]] = {}
+        self._offsets: Dict[int, List[int]] = {}
+        self._active = 0
+        # Records in the active segment, and the time of the last record.
+        self._count = 0
+        self._last = 0.0
+        # Position of the log's end when the current client of an ID joined.
+        self._joined: Dict[int, _Position] = {}
+        self._load()
+
+    def _path(self, number: int, suffix: str = _SUFFIX) -> str:
+        """Return the file path of a segment or its index."""
+        return os.path.join(self.directory, "{:08d}{}".format(number, suffix))
+
+    def _load(self):
+        """Open the segments and their indexes."""
+        numbers = sorted(
+            int(name[:-len(_SUFFIX)])
+            for name in os.listdir(self.directory)
+            if name.endswith(_SUFFIX) and name[:-len(_SUFFIX)].isdigit()
+        )
+        for number in numbers[:-1]:
+            if not self._load_index(number):
+                self._open(number, Segment(self._path(number), self.segment_size))
+                self._save_index(number)
+        self._open(
+            numbers[-1] if numbers else 0,
+            Segment(self._path(numbers[-1] if numbers else 0), self.segment_size),
+        )
+
+    def _load_index(self, number: int) -> bool:
+        """Open a full segment with its saved index.
+
+        Returns:
+            bool: False if the index is missing or broken.
+        """
+        try:
+            with open(self._path(number, _INDEX_SUFFIX), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return False
+        if len(data) < _INDEX_END.size or (len(data) - _INDEX_END.size) % _INDEX_ENTRY.size:
+            return False
+
+        (end,) = _INDEX_END.unpack_from(data)
+        entries = list(_INDEX_ENTRY.iter_unpack(data[_INDEX_END.size:]))
+        self._segments[number] = Segment(self._path(number), self.segment_size, end)
+        self._times[number] = [created_at for created_at, _ in entries]
+        self._offsets[number] = [offset for _, offset in entries]
+        if entries:
+            self._last = max(self._last, entries[-1][0])
+        return True
+
+    def _save_index(self, number: int):
+        """Save the index of a full segment."""
+        path = self._path(number, _INDEX_SUFFIX)
+        with open(path + ".tmp", "wb") as f:
+            f.write(_INDEX_END.pack(self._segments[number].end))
+            for entry in zip(self._times[number], self._offsets[number]):
+                f.write(_INDEX_ENTRY.pack(*entry))
+        os.replace(path + ".tmp", path)
+
+    def _open(self, number: int, segment: Segment):
+        """Index a segment, and make it the active one."""
+        times: List[float] = []
+        offsets: List[int] = []
+        count = 0
+        for offset, record in segment.scan():
+            if count % self.index_interval == 0:
+                times.append(record.created_at)
+                offsets.append(offset)
+            count += 1
+            self._last = max(self._last, record.created_at)
+        self._segments[number] = segment
+        self._times[number] = times
+        self._offsets[number] = offsets
+        self._active = number
+        self._count = count
+
+    def append(self, sender_id: int, client_id: int, text: str):
+        """Append a message.
+
+        Args:
+            sender_id (int): sender's client ID.
+            client_id (int): recipient's client ID, 0 for a broadcast.
+            text (str): message text.
+
+        Raises:
+            ValueError: when the message doesn't fit in a segment, or the log is closed.
+        """
+        value = _PARTIES.pack(sender_id, client_id) + text.encode()
+        if HEADER.size + len(value) > self.segment_size:
+            raise ValueError("message is too long for the history.")
+
+        with self._lock:
+            if self._closed:
+                raise ValueError("history is closed.")
+            created_at = self._last = max(self.clock(), self._last)
+            offset = self._segments[self._active].append(RecordKind.CHAT, created_at, b"", value)
+            if offset is None:
+                self._roll()
+                offset = self._segments[self._active].append(
+                    RecordKind.CHAT, created_at, b"", value
+                )
+            if self._count % self.index_interval == 0:
+                self._times[self._active].append(created_at)
+                self._offsets[self._active].append(offset)
+            self._count += 1
+
+    def _roll(self):
+        """Start a new active segment, and delete the oldest ones over the limit."""
+        full = self._active
+        self._segments[full].flush()
+        self._save_index(full)
+        self._open(full + 1, Segment(self._path(full + 1), self.segment_size))
+
+        while self.max_segments and len(self._segments) > self.max_segments:
+            number = next(iter(self._segments))
+            segment = self._segments.pop(number)
+            del self._times[number], self._offsets[number]
+            segment.close()
+            os.remove(segment.path)
+            os.remove(self._path(number, _INDEX_SUFFIX))
+
+    def join(self, client_id: int):
+        """Start the history of a client ID's new client.
+
+        Args:
+            client_id (int): client ID.
+        """
+        with self._lock:
+            self._joined[client_id] = (self._active, self._segments[self._active].end)
+
+    def leave(self, client_id: int):
+        """Forget the client of a client ID.
+
+        Args:
+            client_id (int): client ID.
+        """
+        with self._lock:
+            self._joined.pop(client_id, None)
+
+    def _read(self, number: int, block: int) -> Optional[List[Tuple[int, Record]]]:
+        """Read the records of an index block.
+
+        Args:
+            number (int): segment number.
+            block (int): index entry of the block.
+
+        Returns:
+            Optional[List[Tuple[int, Record]]]: offset and record of the chat
+                records, None if the block doesn't exist anymore.
+        """
+        with self._lock:
+            offsets = self._offsets.get(number)
+            if offsets is None or block >= len(offsets) or self._closed:
+                return None
+            segment = self._segments[number]
+            stop = offsets[block + 1] if block + 1 < len(offsets) else segment.end
+            return [
+                (offset, record)
+                for offset, record in segment.records(offsets[block], stop)
+                if record.kind == RecordKind.CHAT
+            ]
+
+    def recent(self, client_id: int, count: int) -> List[HistoryEntry]:
+        """Return the last messages a client can see: broadcasts, and its own since it joined.
+
+        Blocks are read from the newest one back, until there are enough.
+
+        Args:
+            client_id (int): client ID.
+            count (int): maximum number of messages.
+
+        Returns:
+            List[HistoryEntry]: messages, oldest first.
+        """
+        with self._lock:
+            blocks = [(number, len(offsets)) for number, offsets in self._offsets.items()]
+            joined = self._joined.get(client_id, _NOT_JOINED)
+
+        found: List[HistoryEntry] = []
+        for number, blocks_count in reversed(blocks):
+            for block in reversed(range(blocks_count)):
+                if len(found) >= count:
+                    return list(reversed(found[:count]))
+                records = self._read(number, block)
+                if records is None:
+                    break
+                entries = []
+                for offset, record in records:
+                    entry = _entry(record)
+                    if not entry.client_id or (
+                        client_id in (entry.sender_id, entry.client_id)
+                        and (number, offset) >= joined
+                    ):
+                        entries.append(entry)
+                found.extend(reversed(entries))
+        return list(reversed(found[:count]))
+
+    def conversation(self, client_id: int, peer_id: int, since: float) -> Iterator[HistoryEntry]:
+        """Stream the messages between two clients since the first one joined, oldest first.
+
+        The first block is found by a binary search of the index, and the
+        following ones are read on demand, up to the last block when the query
+        started.
+
+        Args:
+            client_id (int): a client ID.
+            peer_id (int): another client ID.
+            since (float): time of the first message.
+
+        Returns:
+            Iterator[HistoryEntry]: the messages.
+        """
+        with self._lock:
+            numbers = list(self._segments)
+            times = {number: list(self._times[number]) for number in numbers}
+            last_blocks = {number: len(self._offsets[number]) for number in numbers}
+            joined = self._joined.get(client_id, _NOT_JOINED)
+        numbers = [number for number in numbers if number >= joined[0]]
+
+        # Skip the segments whose next one starts before `since`.
+        first = 0
+        while first + 1 < len(numbers):
+            following = times[numbers[first + 1]]
+            if not following or following[0] >= since:
+                break
+            first += 1
+
+        parties = {client_id, peer_id}
+        for number in numbers[first:]:
+            block = max(bisect.bisect_left(times[number], since) - 1, 0)
+            for block in range(block, last_blocks[number]):
+                records = self._read(number, block)
+                if records is None:
+                    break
+                for offset, record in records:
+                    entry = _entry(record)
+                    if (
+                        entry.created_at >= since
+                        and entry.client_id
+                        and {entry.sender_id, entry.client_id} == parties
+                        and (number, offset) >= joined
+                    ):
+                        yield entry
+
+    def close(self):
+        """Flush and close the segments."""
+        with self._lock:
+            self._closed = True
+            for segment in self._segments.values():
+                segment.close()
@@ -0,0 +1,506 @@
+"""Offline message store module."""
+import hashlib
+import hmac
+import os
+import struct
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from rcr.exception import IdentityError
+from rcr.type import RecordKind
+
+from .segment import HEADER, Record, Segment
+
+# A stored message's value is its sender ID and its text.
+_SENDER = struct.Struct("!I")
+_SUFFIX = ".seg"
+# Every line of this file is an identity, and the salt and hash of its token.
+_IDENTITIES = "identities"
+# Every line of this file binds a client ID to an identity, or unbinds the
+# client ID when it's alone.
+_BINDINGS = "bindings"
+
+# (segment number, offset) of a stored message.
+_Location = Tuple[int, int]
+
+
+class StoredMessage(NamedTuple):
+    """A message which has been stored for an offline recipient."""
+
+    sender_id: int
+    text: str
+    created_at: float
+
+
+class OfflineStore:
+    """Direct messages of offline clients, kept until they come back.
+
+    Clients which have claimed an identity keep it when they leave, so a
+    message to their last client ID, until the ID is given to a new client,
+    or to the identity itself is stored for the identity, and it's delivered
+    when a client claims the identity again. The bindings are kept in a file
+    next to the segments, so they survive a restart too.
+
+    Messages are appended to memory-mapped segment files in `directory`, and
+    the recipients' queues are an index of their locations, which is rebuilt
+    from the segments when the store is opened; so queued messages survive a
+    restart. A delivery appends a record which empties the queue. Segments
+    whose messages have all been delivered are deleted, and when most of the
+    stored messages are dead, the live ones are rewritten in a new segment.
+
+    A recipient keeps its last `max_messages` messages, and messages older than
+    `ttl` seconds aren't delivered.
+
+    The first client which claims an identity sets its token, and the next
+    ones need the same token. Only a salted hash of it is kept, in a file next
+    to the segments. After `max_failures` wrong tokens in `failure_window`
+    seconds, an identity can't be claimed until the oldest of them is out of
+    the window, so its token can't be guessed quickly.
+    """
+
+    # PBKDF2 iterations to hash a token.
+    token_iterations = 100000
+
+    # Wrong tokens which lock an identity, and the seconds they count for.
+    max_failures = 5
+    failure_window = 60.0
+
+    def __init__(
+        self,
+        directory: str,
+        segment_size: int = 4 * 1024 * 1024,
+        max_messages: int = 1000,
+        ttl: float = 7 * 24 * 3600,
+        clock: Callable[[], float] = time.time,
+    ):
+        """Open or create a store.
+
+        Args:
+            directory (str): directory of the segment files. It's created if it's missing.
+            segment_size (int): size of a segment file. Defaults to 4 MiB.
+            max_messages (int): stored messages per recipient, 0 is unlimited.
+                Defaults to 1000.
+            ttl (float): seconds a message is kept, 0 is forever. Defaults to a week.
+            clock (Callable[[], float]): it returns the current time. Defaults to time.time.
+        """
+        if segment_size < HEADER.size * 16:
+            raise ValueError("segment_size is too small.")
+
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_messages = max_messages
+        self.ttl = ttl
+        self.clock = clock
+        # Messages dropped by the retention limit.
+        self.dropped = 0
+
+        self._lock = threading.Lock()
+        self._closed = False
+        # Segments by number, the last one is the active one.
+        self._segments: Dict[int, Segment] = {}
+        # Message records and live messages by segment.
+        self._records: Dict[int, int] = {}
+        self._live: Dict[int, int] = {}
+        self._index: Dict[str, Deque[_Location]] = {}
+        self._active = 0
+        # Client ID <-> identity of clients which have claimed one.
+        self._identities: Dict[int, str] = {}
+        self._clients: Dict[str, int] = {}
+        # Salt and token hash by identity.
+        self._tokens: Dict[str, Tuple[bytes, bytes]] = {}
+        # Times of the recent wrong tokens by identity.
+        self._failures: Dict[str, Deque[float]] = {}
+        self._load()
+
+    def _path(self, number: int) -> str:
+        """Return the file path of a segment."""
+        return os.path.join(self.directory, "{:08d}{}".format(number, _SUFFIX))
+
+    def _load(self):
+        """Open the segments and rebuild the index."""
+        numbers = sorted(
+            int(name[:-len(_SUFFIX)])
+            for name in os.listdir(self.directory)
+            if name.endswith(_SUFFIX) and name[:-len(_SUFFIX)].isdigit()
+        )
+        segments = [
+            (number, Segment(self._path(number), self.segment_size)) for number in numbers
+        ]
+
+        # A compacted segment replaces the older ones, which may be left over
+        # when the process has died right after compacting.
+        start = 0
+        for i, (_, segment) in enumerate(segments):
+            first = next(segment.records(), None)
+            if first is not None and first[1].kind == RecordKind.COMPACTED:
+                start = i
+        for _, segment in segments[:start]:
+            segment.close()
+            os.remove(segment.path)
+
+        for number, segment in segments[start:]:
+            self._open(number, segment)
+            for offset, record in segment.scan():
+                self._apply(number, offset, record)
+        if not self._segments:
+            self._open(0, Segment(self._path(0), self.segment_size))
+        self._collect()
+        self._load_tokens()
+        self._load_bindings()
+
+    def _load_tokens(self):
+        """Read the token hashes of the identities."""
+        try:
+            with open(os.path.join(self.directory, _IDENTITIES)) as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+        for line in lines:
+            fields = line.split()
+            # A line which was being written when the process died is skipped.
+            if len(fields) != 3 or not line.endswith("\n"):
+                continue
+            try:
+                self._tokens[fields[0]] = (bytes.fromhex(fields[1]), bytes.fromhex(fields[2]))
+            except ValueError:
+                continue
+
+    def _load_bindings(self):
+        """Replay the bindings of client IDs and identities, and rewrite them compacted."""
+        path = os.path.join(self.directory, _BINDINGS)
+        try:
+            with open(path) as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+        for line in lines:
+            fields = line.split()
+            # A line which was being written when the process died is skipped.
+            if not 1 <= len(fields) <= 2 or not fields[0].isdigit() or not line.endswith("\n"):
+                continue
+            client_id = int(fields[0])
+            if len(fields) == 2:
+                self._bind(client_id, fields[1], save=False)
+            else:
+                self._unbind(client_id, save=False)
+
+        with open(path + ".tmp", "w") as f:
+            f.writelines(
+                "{} {}\n".format(client_id, identity)
+                for client_id, identity in self._identities.items()
+            )
+        os.replace(path + ".tmp", path)
+
+    def _save_binding(self, client_id: int, identity: Optional[str] = None):
+        """Append a binding, or an unbinding without identity, to the bindings file."""
+        line = "{} {}\n".format(client_id, identity) if identity else "{}\n".format(client_id)
+        with open(os.path.join(self.directory, _BINDINGS), "a") as f:
+            f.write(line)
+
+    def _open(self, number: int, segment: Segment):
+        """Make a segment the active one."""
+        self._segments[number] = segment
+        self._records[number] = self._live[number] = 0
+        self._active = number
+
+    def _apply(self, number: int, offset: int, record: Record):
+        """Replay a record in the index."""
+        if record.kind == RecordKind.MESSAGE:
+            self._records[number] += 1
+            self._add(record.key.decode(), (number, offset))
+        elif record.kind == RecordKind.DELIVERED:
+            for location in self._index.pop(record.key.decode(), ()):
+                self._live[location[0]] -= 1
+
+    def _add(self, identity: str, location: _Location) -> bool:
+        """Add a message to its recipient's queue.
+
+        Returns:
+            bool: True if the oldest message of the queue has been dropped for it.
+        """
+        queue = self._index.get(identity)
+        if queue is None:
+            queue = self._index[identity] = deque()
+        queue.append(location)
+        self._live[location[0]] += 1
+        if self.max_messages and len(queue) > self.max_messages:
+            self._live[queue.popleft()[0]] -= 1
+            return True
+        return False
+
+    def _append(self, kind: int, created_at: float, key: bytes, value: bytes) -> _Location:
+        """Append a record to the active segment, or to a new one if it's full."""
+        offset = self._segments[self._active].append(kind, created_at, key, value)
+        if offset is None:
+            self._roll()
+            offset = self._segments[self._active].append(kind, created_at, key, value)
+        return self._active, offset
+
+    def _roll(self):
+        """Start a new active segment, and clean up the old ones."""
+        self._segments[self._active].flush()
+        self._open(self._active + 1, Segment(self._path(self._active + 1), self.segment_size))
+        self._collect()
+        if len(self._segments) > 2 and sum(self._live.values()) * 2 < sum(self._records.values()):
+            self._compact()
+
+    def _collect(self):
+        """Delete the oldest segments while none of their messages is live.
+
+        Only the oldest ones can go: a segment may hold the delivery records
+        of messages in an older one, which would come back without them.
+        """
+        for number in list(self._segments):
+            if number == self._active or self._live[number]:
+                return
+            segment = self._segments.pop(number)
+            del self._records[number], self._live[number]
+            segment.close()
+            os.remove(segment.path)
+
+    def _compact(self):
+        """Rewrite the live messages in a new segment, and delete the others."""
+        limit = self.clock() - self.ttl if self.ttl else None
+        kept: List[Tuple[str, Record]] = []
+        for identity, queue in self._index.items():
+            for number, offset in queue:
+                record = self._segments[number].read(offset)
+                if limit is None or record.created_at >= limit:
+                    kept.append((identity, record))
+        needed = HEADER.size * (len(kept) + 1) + sum(
+            len(record.key) + len(record.value) for _, record in kept
+        )
+
+        number = self._active + 1
+        path = self._path(number)
+        segment = Segment(path + ".tmp", max(self.segment_size, needed))
+        segment.append(RecordKind.COMPACTED, self.clock(), b"", b"")
+        index: Dict[str, Deque[_Location]] = {}
+        for identity, record in kept:
+            offset = segment.append(record.kind, record.created_at, record.key, record.value)
+            index.setdefault(identity, deque()).append((number, offset))
+        segment.flush()
+        os.replace(segment.path, path)
+        segment.path = path
+
+        for old in self._segments.values():
+            old.close()
+            os.remove(old.path)
+        self._segments, self._records, self._live = {}, {}, {}
+        self._open(number, segment)
+        self._records[number] = self._live[number] = len(kept)
+        self._index = index
+
+    def put(self, identity: str, sender_id: int, text: str):
+        """Store a message for an offline recipient.
+
+        Args:
+            identity (str): recipient identity.
+            sender_id (int): sender's client ID.
+            text (str): message text.
+
+        Raises:
+            ValueError: when the message doesn't fit in a segment, or the store is closed.
+        """
+        key = identity.encode()
+        value = _SENDER.pack(sender_id) + text.encode()
+        if len(key) > 0xFFFF or HEADER.size * 2 + len(key) + len(value) > self.segment_size:
+            raise ValueError("message is too long to be stored.")
+
+        with self._lock:
+            if self._closed:
+                raise ValueError("store is closed.")
+            location = self._append(RecordKind.MESSAGE, self.clock(), key, value)
+            self._records[location[0]] += 1
+            if self._add(identity, location):
+                self.dropped += 1
+
+    def take(self, identity: str) -> List[StoredMessage]:
+        """Take the stored messages of a recipient, to deliver them.
+
+        Args:
+            identity (str): recipient identity.
+
+        Returns:
+            List[StoredMessage]: the messages, oldest first. None are taken once
+                the store is closed, they stay for the next time it's opened.
+        """
+        with self._lock:
+            return self._take(identity)
+
+    def _take(self, identity: str) -> List[StoredMessage]:
+        """Take the stored messages of a recipient, under the lock."""
+        if self._closed:
+            return []
+        queue = self._index.pop(identity, None)
+        if not queue:
+            return []
+
+        limit = self.clock() - self.ttl if self.ttl else None
+        messages = []
+        for number, offset in queue:
+            self._live[number] -= 1
+            record = self._segments[number].read(offset)
+            if limit is not None and record.created_at < limit:
+                continue
+            (sender_id,) = _SENDER.unpack_from(record.value)
+            text = record.value[_SENDER.size:].decode()
+            messages.append(StoredMessage(sender_id, text, record.created_at))
+        self._append(RecordKind.DELIVERED, self.clock(), identity.encode(), b"")
+        self._collect()
+        return messages
+
+    def pending(self, identity: Optional[str] = None) -> int:
+        """Return the number of stored messages.
+
+        Args:
+            identity (Optional[str]): a recipient. Defaults to None (all of them).
+
+        Returns:
+            int: number of stored messages, including expired ones.
+        """
+        if identity is not None:
+            return len(self._index.get(identity, ()))
+        return sum(self._live.values())
+
+    def _hash(self, token: str, salt: bytes) -> bytes:
+        """Hash a token."""
+        return hashlib.pbkdf2_hmac("sha256", token.encode(), salt, self.token_iterations)
+
+    def claim(
+        self, client_id: int, identity: str, token: str, is_online: Callable[[int], bool]
+    ) -> List[StoredMessage]:
+        """Bind a client ID to an identity, and take its stored messages.
+
+        The first claim of an identity sets its token. The client's previous
+        identity and the identity's previous client ID are unbound.
+
+        Args:
+            client_id (int): client ID.
+            identity (str): identity.
+            token (str): secret of the identity.
+            is_online (Callable[[int], bool]): it returns True if a client ID is
+                connected, then its identity can't be claimed by another client.
+
+        Returns:
+            List[StoredMessage]: the messages, oldest first, see `take`.
+
+        Raises:
+            IdentityError: when the identity is used by another online client, the
+                token is wrong, or the identity is locked by wrong tokens.
+            ValueError: when the identity is empty or has spaces.
+        """
+        if identity.split() != [identity]:
+            raise ValueError("identity can't be empty or have spaces.")
+
+        # The hash takes a while, so it's computed out of the lock. The salt of
+        # an identity never changes once it's set.
+        with self._lock:
+            if self._locked(identity):
+                raise IdentityError(
+                    "too many wrong tokens for identity {}, try again later!".format(identity)
+                )
+            salt = self._tokens.get(identity, (os.urandom(16),))[0]
+        digest = self._hash(token, salt)
+
+        with self._lock:
+            holder = self._clients.get(identity)
+            if holder not in (None, client_id) and is_online(holder):
+                raise IdentityError("identity {} is in use!".format(identity))
+            expected = self._tokens.get(identity)
+            if expected is None:
+                with open(os.path.join(self.directory, _IDENTITIES), "a") as f:
+                    f.write("{} {} {}\n".format(identity, salt.hex(), digest.hex()))
+                self._tokens[identity] = (salt, digest)
+            elif not (expected[0] == salt and hmac.compare_digest(expected[1], digest)):
+                self._failures.setdefault(identity, deque()).append(self.clock())
+                raise IdentityError("wrong token for identity {}!".format(identity))
+
+            self._failures.pop(identity, None)
+            self._bind(client_id, identity)
+            return self._take(identity)
+
+    def _locked(self, identity: str) -> bool:
+        """Return True if an identity has had too many wrong tokens, under the lock."""
+        failures = self._failures.get(identity)
+        if failures is None:
+            return False
+        limit = self.clock() - self.failure_window
+        while failures and failures[0] < limit:
+            failures.popleft()
+        if not failures:
+            del self._failures[identity]
+        return len(failures) >= self.max_failures
+
+    def _bind(self, client_id: int, identity: str, save: bool = True):
+        """Bind a client ID to an identity, and unbind their previous ones."""
+        previous_client = self._clients.pop(identity, None)
+        if previous_client is not None:
+            self._identities.pop(previous_client, None)
+        previous_identity = self._identities.pop(client_id, None)
+        if previous_identity is not None:
+            self._clients.pop(previous_identity, None)
+        self._identities[client_id] = identity
+        self._clients[identity] = client_id
+        if save:
+            self._save_binding(client_id, identity)
+
+    def _unbind(self, client_id: int, save: bool = True):
+        """Unbind a client ID from its identity, if it has one."""
+        identity = self._identities.pop(client_id, None)
+        if identity is not None:
+            self._clients.pop(identity, None)
+            if save:
+                self._save_binding(client_id)
+
+    def release(self, client_id: int):
+        """Unbind a client ID, e.g. when it's given to a new client.
+
+        Args:
+            client_id (int): client ID.
+        """
+        with self._lock:
+            self._unbind(client_id)
+
+    def known(self, identity: str) -> bool:
+        """Return True if an identity has been claimed, so messages can be stored for it.
+
+        Args:
+            identity (str): identity.
+
+        Returns:
+            bool: it has been claimed or not.
+        """
+        return identity in self._tokens
+
+    def identity_of(self, client_id: int) -> Optional[str]:
+        """Return the identity of a client ID.
+
+        Args:
+            client_id (int): client ID.
+
+        Returns:
+            Optional[str]: its identity, None if it hasn't claimed one.
+        """
+        return self._identities.get(client_id)
+
+    def client_of(self, identity: str) -> Optional[int]:
+        """Return the last client ID of an identity.
+
+        Args:
+            identity (str): identity.
+
+        Returns:
+            Optional[int]: the client ID, None if nobody has claimed the identity.
+        """
+        return self._clients.get(identity)
+
+    def close(self):
+        """Flush and close the segments."""
+        with self._lock:
+            self._closed = True
+            for segment in self._segments.values():
+                segment.close()
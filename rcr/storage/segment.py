@@ -0,0 +1,163 @@
+"""Append-only segment file module.
+
+A segment is a file of a fixed size which is memory-mapped and filled with
+records from its start, the rest of it is zeros. A record is a fixed header
+followed by its key and value:
+
+    +--------------+--------+------+------------+------------+-------+-------+
+    | value length | crc32  | kind | created at | key length | key   | value |
+    | uint32       | uint32 | uint8| float64    | uint16     | bytes | bytes |
+    +--------------+--------+------+------------+------------+-------+-------+
+
+All numbers are in network byte order, and the checksum covers everything
+after it. The records end at the first one whose kind is 0 or whose checksum
+doesn't match, so a record which was being written when the process died is
+ignored.
+"""
+import mmap
+import os
+import struct
+import zlib
+from typing import Iterator, NamedTuple, Optional, Tuple
+
+HEADER = struct.Struct("!IIBdH")
+# The part of the header which is covered by the checksum.
+_CHECKED = HEADER.size - 4 - 4
+
+
+class Record(NamedTuple):
+    """A segment record."""
+
+    kind: int
+    created_at: float
+    key: bytes
+    value: bytes
+
+
+class Segment:
+    """A memory-mapped append-only file of records.
+
+    Writes go to the page cache through the map, so they survive the process
+    but not necessarily the machine until `flush`.
+    """
+
+    def __init__(self, path: str, size: int, end: Optional[int] = None):
+        """Open a segment, it's created with `size` bytes if it doesn't exist.
+
+        Args:
+            path (str): file path.
+            size (int): file size of a new segment. An existing one keeps its size.
+            end (Optional[int]): offset after the last record, if it's known.
+                Defaults to None (the segment is scanned to find it).
+        """
+        self.path = path
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size == 0:
+                os.ftruncate(fd, size)
+            self._map = mmap.mmap(fd, 0)
+        finally:
+            os.close(fd)
+        self.size = len(self._map)
+        # Offset of the next record.
+        self.end = 0
+        if end is None:
+            for _ in self.scan():
+                pass
+        else:
+            self.end = end
+
+    def scan(self) -> Iterator[Tuple[int, Record]]:
+        """Read records from the start, and find where the next one goes.
+
+        Returns:
+            Iterator[Tuple[int, Record]]: offset and record of every valid record.
+        """
+        end = 0
+        for offset, record in self.records():
+            end = offset + HEADER.size + len(record.key) + len(record.value)
+            yield offset, record
+        self.end = end
+
+    def records(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[int, Record]]:
+        """Read the records from an offset.
+
+        Args:
+            start (int): offset of a record. Defaults to 0.
+            stop (Optional[int]): offset to stop at. Defaults to None (after the last record).
+
+        Returns:
+            Iterator[Tuple[int, Record]]: offset and record of every valid record.
+        """
+        offset = start
+        while stop is None or offset < stop:
+            record = self._read(offset)
+            if record is None:
+                return
+            yield offset, record
+            offset += HEADER.size + len(record.key) + len(record.value)
+
+    def read(self, offset: int) -> Record:
+        """Read a record.
+
+        Args:
+            offset (int): offset of the record.
+
+        Returns:
+            Record: the record.
+
+        Raises:
+            ValueError: when there's no valid record at the offset.
+        """
+        record = self._read(offset)
+        if record is None:
+            raise ValueError("no record at offset {} of {}.".format(offset, self.path))
+        return record
+
+    def _read(self, offset: int) -> Optional[Record]:
+        """Read a record, None if there's no valid one."""
+        if offset + HEADER.size > self.size:
+            return None
+        length, crc, kind, created_at, key_length = HEADER.unpack_from(self._map, offset)
+        start = offset + HEADER.size
+        stop = start + key_length + length
+        if not kind or stop > self.size:
+            return None
+        checked = self._map[offset + 8:stop]
+        if zlib.crc32(checked) != crc:
+            return None
+        key_end = _CHECKED + key_length
+        return Record(kind, created_at, checked[_CHECKED:key_end], checked[key_end:])
+
+    def append(self, kind: int, created_at: float, key: bytes, value: bytes) -> Optional[int]:
+        """Write a record after the last one.
+
+        Args:
+            kind (int): record kind, see `rcr.type.RecordKind`.
+            created_at (float): creation time.
+            key (bytes): record key, up to 65535 bytes.
+            value (bytes): record value.
+
+        Returns:
+            Optional[int]: offset of the record, None if the segment is full.
+        """
+        stop = self.end + HEADER.size + len(key) + len(value)
+        if stop > self.size:
+            return None
+        checked = HEADER.pack(len(value), 0, kind, created_at, len(key))[8:] + key + value
+        offset = self.end
+        # The checksum goes last, so a partly written record doesn't pass it.
+        self._map[offset + 8:stop] = checked
+        self._map[offset:offset + 8] = struct.pack("!II", len(value), zlib.crc32(checked))
+        self.end = stop
+        return offset
+
+    def flush(self):
+        """Write the map to the disk."""
+        self._map.flush()
+
+    def close(self):
+        """Flush and unmap the segment."""
+        if not self._map.closed:
+            self._map.flush()
+            self._map.close()
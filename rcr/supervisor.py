@@ -0,0 +1,113 @@
+"""Multi-process server supervisor."""
+import logging
+import multiprocessing
+import os
+import signal
+from multiprocessing.connection import wait
+from typing import List, Optional
+
+
+def run_worker(worker: int, workers: int):
+    """Run a server worker, it's the entry point of worker processes.
+
+    Args:
+        worker (int): worker number.
+        workers (int): number of workers.
+    """
+    # Imported here, so the supervisor doesn't start anything of a server.
+    from rcr import config
+
+    if config.LOG_FILE:
+        # Workers don't rotate a shared file.
+        config.LOG_FILE = "{}.{}".format(config.LOG_FILE, worker)
+    if config.OFFLINE_DIR:
+        # Every worker has a store of its own.
+        config.OFFLINE_DIR = os.path.join(config.OFFLINE_DIR, str(worker))
+    if config.HISTORY_DIR:
+        config.HISTORY_DIR = os.path.join(config.HISTORY_DIR, str(worker))
+    from rcr.manager import Manager
+
+    # The supervisor stops workers by SIGTERM.
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    manager = Manager(True, worker, workers)
+    try:
+        manager.start()
+    except KeyboardInterrupt:
+        manager.shutdown()
+
+
+class Supervisor:
+    """Server workers supervisor.
+
+    It starts a server process per worker. All workers bind the same port with
+    `SO_REUSEPORT`, so the kernel spreads new connections among them, and they
+    reach clients of each other through their routers (see `rcr.router`).
+    A worker which dies is started again with the same number.
+    """
+
+    def __init__(self, workers: int):
+        """Initialize the class.
+
+        Args:
+            workers (int): number of worker processes.
+        """
+        if workers < 1:
+            raise ValueError("workers must be a positive number.")
+
+        self.workers = workers
+        self._log = logging.getLogger("supervisor")
+        # Workers don't share anything with the supervisor, and spawn doesn't copy
+        # its threads and locks into them.
+        self._context = multiprocessing.get_context("spawn")
+        self._processes: List[Optional[multiprocessing.Process]] = [None] * workers
+        self._shutdown = False
+
+    def _start_worker(self, worker: int):
+        """Start a worker process.
+
+        Args:
+            worker (int): worker number.
+        """
+        process = self._context.Process(
+            target=run_worker, args=(worker, self.workers), name="rcr-worker-{}".format(worker)
+        )
+        process.start()
+        self._processes[worker] = process
+
+    def start(self):
+        """Start workers and restart them until shutdown."""
+        for worker in range(self.workers):
+            self._start_worker(worker)
+
+        while not self._shutdown:
+            sentinels = {
+                process.sentinel: worker for worker, process in enumerate(self._processes)
+            }
+            for sentinel in wait(list(sentinels)):
+                if self._shutdown:
+                    break
+                worker = sentinels[sentinel]
+                self._log.warning(
+                    "worker %s exited with %s, restarting it.",
+                    worker,
+                    self._processes[worker].exitcode,
+                )
+                self._start_worker(worker)
+
+    def shutdown(self, timeout: float = 5):
+        """Stop workers.
+
+        Args:
+            timeout (float): seconds to wait for a worker before killing it. Defaults to 5.
+        """
+        self._shutdown = True
+        for process in self._processes:
+            if process is not None and process.is_alive():
+                process.terminate()
+        for process in self._processes:
+            if process is not None:
+                process.join(timeout)
+                if process.is_alive():
+                    process.kill()
+                    process.join()
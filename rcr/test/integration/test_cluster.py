@@ -0,0 +1,97 @@
+"""Cluster integration tests."""
+import time
+import unittest
+
+from rcr.bench.server import LineClient, start_cluster, stop_cluster
+
+
+class TestCluster(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.processes, cls.ports = start_cluster(2)
+        return super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        stop_cluster(cls.processes)
+        return super().tearDownClass()
+
+    def setUp(self) -> None:
+        self.clients = [LineClient("127.0.0.1", port) for port in self.ports]
+        for client in self.clients:
+            client.sock.settimeout(5)
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        for client in self.clients:
+            client.close()
+        return super().tearDown()
+
+    def online(self, client):
+        client.send_line("w")
+        online = {int(client.read_line())}
+        client.sock.settimeout(0.2)
+        try:
+            while True:
+                online.add(int(client.read_line()))
+        except OSError:
+            pass
+        finally:
+            client.sock.settimeout(5)
+        return online
+
+    def wait_for_members(self, client, members, timeout=5):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            online = self.online(client)
+            if members <= online:
+                return online
+            time.sleep(0.1)
+        self.fail("%s are not online." % members)
+
+    def test_namespaced_ids(self):
+        first, second = self.clients
+        # Node 0 owns odd IDs and node 1 owns even IDs.
+        self.assertEqual(first.client_id % 2, 1)
+        self.assertEqual(second.client_id % 2, 0)
+
+    def test_w(self):
+        members = {client.client_id for client in self.clients}
+        self.wait_for_members(self.clients[0], members)
+        self.wait_for_members(self.clients[1], members)
+
+    def test_msg(self):
+        first, second = self.clients
+        # Routes in both directions are up when both nodes know each other's clients.
+        self.wait_for_members(first, {second.client_id})
+        self.wait_for_members(second, {first.client_id})
+
+        first.send_line("msg {} hello node 1".format(second.client_id))
+        self.assertEqual(first.read_line(), "your message has been delivered")
+        self.assertTrue(second.read_line().endswith("{} hello node 1".format(first.client_id)))
+
+        second.send_line("msg {} hello node 0".format(first.client_id))
+        self.assertEqual(second.read_line(), "your message has been delivered")
+        self.assertTrue(first.read_line().endswith("{} hello node 0".format(second.client_id)))
+
+    def test_broadcast(self):
+        first, second = self.clients
+        self.wait_for_members(first, {second.client_id})
+        self.wait_for_members(second, {first.client_id})
+
+        second.send_line("broadcast hi all")
+        self.assertTrue(first.read_line().endswith("{} hi all".format(second.client_id)))
+        self.assertTrue(second.read_line().endswith("{} hi all".format(second.client_id)))
+        self.assertEqual(second.read_line(), "your message has been delivered")
+
+    def test_leave(self):
+        first = self.clients[0]
+        leaving = LineClient("127.0.0.1", self.ports[1])
+        self.wait_for_members(first, {leaving.client_id})
+
+        # Its node drops it from the contact book and tells the other node.
+        leaving.close()
+        deadline = time.monotonic() + 5
+        while leaving.client_id in self.online(first):
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.1)
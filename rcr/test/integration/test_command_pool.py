@@ -0,0 +1,76 @@
+"""Command actor pool integration tests."""
+import os
+import unittest
+from unittest import mock
+
+from rcr.bench.server import LineClient, start_cluster, stop_cluster
+
+
+class TestCommandPool(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        # A single node cluster is a server in a process of its own.
+        with mock.patch.dict(os.environ, {"COMMAND_ACTORS": "4"}):
+            cls.processes, cls.ports = start_cluster(1)
+        return super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        stop_cluster(cls.processes)
+        return super().tearDownClass()
+
+    def test_commands_stay_ordered(self):
+        clients = [LineClient("127.0.0.1", self.ports[0]) for _ in range(8)]
+        try:
+            for client in clients:
+                client.sock.settimeout(10)
+                client.sock.sendall(
+                    "".join(
+                        "msg {} {}\r\n".format(client.client_id, i) for i in range(200)
+                    ).encode()
+                )
+
+            for client in clients:
+                received = []
+                while len(received) < 200:
+                    line = client.read_line()
+                    if line != "your message has been delivered":
+                        received.append(int(line.rsplit(" ", 1)[1]))
+                self.assertEqual(received, list(range(200)))
+        finally:
+            for client in clients:
+                client.close()
+
+    def test_mixed_commands_stay_ordered(self):
+        # Cheap `msg` commands don't overtake the same client's expensive `fib` ones.
+        fibonacci = [0, 1]
+        while len(fibonacci) < 100:
+            fibonacci.append(fibonacci[-1] + fibonacci[-2])
+        clients = [LineClient("127.0.0.1", self.ports[0]) for _ in range(4)]
+        try:
+            for client in clients:
+                client.sock.settimeout(10)
+                client.sock.sendall(
+                    "".join(
+                        "fib {} {}\r\n".format(client.client_id, i)
+                        if i % 2
+                        else "msg {} m{}\r\n".format(client.client_id, i)
+                        for i in range(100)
+                    ).encode()
+                )
+
+            expected = [str(fibonacci[i]) if i % 2 else "m{}".format(i) for i in range(100)]
+            for client in clients:
+                received = []
+                while len(received) < 100:
+                    line = client.read_line()
+                    if line != "your message has been delivered":
+                        received.append(line.rsplit(" ", 1)[1])
+                self.assertEqual(received, expected)
+        finally:
+            for client in clients:
+                client.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+"""Chat history integration tests."""
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from rcr.bench.server import LineClient, start_cluster, stop_cluster
+
+
+class TestHistory(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.processes = []
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        stop_cluster(self.processes)
+        self.directory.cleanup()
+        return super().tearDown()
+
+    def start(self):
+        stop_cluster(self.processes)
+        # A single node cluster is a server in a process of its own.
+        with mock.patch.dict(os.environ, {"HISTORY_DIR": self.directory.name}):
+            self.processes, ports = start_cluster(1)
+        self.port = ports[0]
+
+    def connect(self) -> LineClient:
+        client = LineClient("127.0.0.1", self.port)
+        client.sock.settimeout(5)
+        self.addCleanup(client.close)
+        return client
+
+    def read_history(self, client: LineClient):
+        lines = []
+        while True:
+            line = client.read_line()
+            if line.startswith("end of history"):
+                return lines, line
+            lines.append(line)
+
+    def test_history(self):
+        since = int(time.time())
+        self.start()
+        amy, bob, eve = self.connect(), self.connect(), self.connect()
+        amy.send_line("msg {} hi bob".format(bob.client_id))
+        self.assertEqual(amy.read_line(), "your message has been delivered")
+        self.assertTrue(bob.read_line().endswith("hi bob"))
+        eve.send_line("broadcast hello all")
+        for client in (amy, bob, eve):
+            self.assertTrue(client.read_line().endswith("hello all"))
+        self.assertEqual(eve.read_line(), "your message has been delivered")
+        bob.send_line("msg {} hi amy".format(amy.client_id))
+        self.assertEqual(bob.read_line(), "your message has been delivered")
+        self.assertTrue(amy.read_line().endswith("hi amy"))
+
+        amy.send_line("history 10")
+        lines, end = self.read_history(amy)
+        self.assertEqual(end, "end of history, 3 messages.")
+        self.assertTrue(lines[0].endswith("{} > {}: hi bob".format(amy.client_id, bob.client_id)))
+        self.assertTrue(lines[1].endswith("{} > all: hello all".format(eve.client_id)))
+        self.assertTrue(lines[2].endswith("{} > {}: hi amy".format(bob.client_id, amy.client_id)))
+
+        amy.send_line("history {} {}".format(bob.client_id, since))
+        self.assertEqual(len(self.read_history(amy)[0]), 2)
+        amy.send_line("history {} {}".format(bob.client_id, since + 3600))
+        self.assertEqual(self.read_history(amy), ([], "end of history, 0 messages."))
+        amy.send_line("history 1 2 3")
+        self.assertEqual(amy.read_line(), "invalid format to read the history!")
+
+        # The history survives a restart, but the new clients of the same IDs
+        # only get the broadcasts.
+        self.start()
+        amy = self.connect()
+        amy.send_line("history 10")
+        lines, end = self.read_history(amy)
+        self.assertEqual(end, "end of history, 1 messages.")
+        self.assertTrue(lines[0].endswith("hello all"))
+
+    def test_reused_id(self):
+        self.start()
+        amy, bob = self.connect(), self.connect()
+        amy.send_line("msg {} a secret".format(bob.client_id))
+        self.assertEqual(amy.read_line(), "your message has been delivered")
+        self.assertTrue(bob.read_line().endswith("a secret"))
+        bob_id = bob.client_id
+        bob.close()
+
+        # The server gives bob's ID to a new client once it has noticed bob left.
+        deadline = time.monotonic() + 5
+        while True:
+            mallory = self.connect()
+            if mallory.client_id == bob_id or time.monotonic() > deadline:
+                break
+            time.sleep(0.05)
+        self.assertEqual(mallory.client_id, bob_id)
+
+        mallory.send_line("history 50")
+        self.assertEqual(self.read_history(mallory), ([], "end of history, 0 messages."))
+        mallory.send_line("history {} 0".format(amy.client_id))
+        self.assertEqual(self.read_history(mallory), ([], "end of history, 0 messages."))
+        amy.send_line("history {} 0".format(bob_id))
+        self.assertEqual(len(self.read_history(amy)[0]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,27 @@
+"""Load generator integration tests."""
+import json
+import subprocess
+import sys
+import unittest
+
+
+class TestLoad(unittest.TestCase):
+    def test_small_load(self):
+        # The server runs in the generator's process, so it gets a process of its own.
+        output = subprocess.run(
+            [sys.executable, "-m", "rcr.bench.load", "-c", "20", "-d", "1"]
+            + ["-m", "msg=5,fib=2,w=2,broadcast=1", "--json", "-"],
+            check=True,
+            stdout=subprocess.PIPE,
+            timeout=60,
+        ).stdout
+        report = json.loads(output)
+
+        self.assertEqual(report["ramp"]["clients"], 20)
+        throughput = report["throughput"]
+        self.assertGreater(throughput["commands"], 0)
+        self.assertEqual((throughput["errors"], throughput["timeouts"]), (0, 0))
+        for verb in ("all", "msg", "fib", "w", "broadcast"):
+            latency = report["latency"][verb]
+            self.assertGreater(latency["count"], 0)
+            self.assertLessEqual(latency["p50_ms"], latency["p999_ms"])
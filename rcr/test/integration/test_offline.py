@@ -0,0 +1,119 @@
+"""Offline message store integration tests."""
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from rcr.bench.server import LineClient, start_cluster, stop_cluster
+
+
+class TestOffline(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.processes = []
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        stop_cluster(self.processes)
+        self.directory.cleanup()
+        return super().tearDown()
+
+    def start(self) -> LineClient:
+        stop_cluster(self.processes)
+        # A single node cluster is a server in a process of its own.
+        with mock.patch.dict(os.environ, {"OFFLINE_DIR": self.directory.name}):
+            self.processes, ports = start_cluster(1)
+        self.port = ports[0]
+        return self.connect()
+
+    def connect(self) -> LineClient:
+        client = LineClient("127.0.0.1", self.port)
+        client.sock.settimeout(5)
+        self.addCleanup(client.close)
+        return client
+
+    def test_delivery_after_restart(self):
+        bob = self.start()
+        bob.send_line("identify bob")
+        self.assertEqual(bob.read_line(), "invalid format to identify yourself!")
+        bob.send_line("identify bob bob-secret")
+        self.assertEqual(bob.read_line(), "you are bob, 0 stored messages.")
+        amy = self.connect()
+        bob_id = bob.client_id
+        bob.close()
+
+        # The server notices the closed connection a bit later.
+        deadline = time.monotonic() + 5
+        while True:
+            amy.send_line("msg {} are you there?".format(bob_id))
+            reply = amy.read_line()
+            if reply.endswith("the message has been stored") or time.monotonic() > deadline:
+                break
+            self.assertEqual(reply, "your message has been delivered")
+            time.sleep(0.05)
+        self.assertEqual(reply, "client {} is offline, the message has been stored".format(bob_id))
+
+        # Stored messages survive a restart.
+        bob = self.start()
+        intruder = self.connect()
+        # The name isn't enough to get bob's messages.
+        intruder.send_line("identify bob guess-guess")
+        self.assertEqual(intruder.read_line(), "wrong token for identity bob!")
+        bob.send_line("identify bob bob-secret")
+        self.assertEqual(bob.read_line(), "you are bob, 1 stored messages.")
+        self.assertTrue(bob.read_line().endswith("are you there?"))
+        intruder.send_line("identify bob bob-secret")
+        self.assertEqual(intruder.read_line(), "identity bob is in use!")
+
+    def test_message_to_identity(self):
+        self.start()
+        bob = self.connect()
+        bob.send_line("identify bob bob-secret")
+        self.assertEqual(bob.read_line(), "you are bob, 0 stored messages.")
+        amy = self.connect()
+        amy.send_line("tell bob hello")
+        self.assertTrue(bob.read_line().endswith("hello"))
+        self.assertEqual(amy.read_line(), "your message has been delivered")
+        amy.send_line("tell nobody hello")
+        self.assertEqual(amy.read_line(), "identity nobody is unknown!")
+
+        bob_id = bob.client_id
+        bob.close()
+        # A new client gets bob's old ID once the server has noticed that bob
+        # has left, the name still reaches bob.
+        deadline = time.monotonic() + 5
+        while True:
+            carol = self.connect()
+            if carol.client_id == bob_id or time.monotonic() > deadline:
+                break
+            carol.close()
+            time.sleep(0.05)
+        self.assertEqual(carol.client_id, bob_id)
+        amy.send_line("tell bob are you there?")
+        self.assertEqual(amy.read_line(), "bob is offline, the message has been stored")
+        amy.send_line("msg {} hi carol".format(bob_id))
+        self.assertTrue(carol.read_line().endswith("hi carol"))
+
+        self.start()
+        bob = self.connect()
+        bob.send_line("identify bob bob-secret")
+        self.assertEqual(bob.read_line(), "you are bob, 1 stored messages.")
+        self.assertTrue(bob.read_line().endswith("are you there?"))
+        bob_id = bob.client_id
+
+        # Bindings survive a restart, so bob's last ID still reaches bob.
+        amy = self.start()
+        self.assertNotEqual(amy.client_id, bob_id)
+        amy.send_line("msg {} after the restart".format(bob_id))
+        self.assertEqual(
+            amy.read_line(), "client {} is offline, the message has been stored".format(bob_id)
+        )
+        bob = self.connect()
+        bob.send_line("identify bob bob-secret")
+        self.assertEqual(bob.read_line(), "you are bob, 1 stored messages.")
+        self.assertTrue(bob.read_line().endswith("after the restart"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+"""Asyncio server unit tests."""
+import socket
+import threading
+import time
+import unittest
+from collections import defaultdict
+from unittest.mock import Mock, call
+
+from rcr.connection.asyncio_client import AsyncioClient
+from rcr.connection.asyncio_server import AsyncioServer
+from rcr.type import ConnectionEvent, Protocol
+
+PORT = 9096
+
+
+class TestAsyncioServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        events = defaultdict(lambda: lambda *args: 0)
+
+        # Mock events.
+        cls.event_on_bind = Mock()
+        cls.event_on_disconnect = Mock()
+        cls.event_on_join = Mock()
+        cls.event_on_message = Mock()
+
+        events.update(
+            {
+                ConnectionEvent.ON_BIND: cls.event_on_bind,
+                ConnectionEvent.ON_DISCONNECT: cls.event_on_disconnect,
+                ConnectionEvent.ON_JOIN: cls.event_on_join,
+                ConnectionEvent.ON_MESSAGE: cls.event_on_message,
+            }
+        )
+        cls.server = AsyncioServer("", PORT, Protocol.TCP, events)
+        cls.server_thread = threading.Thread(target=cls.server.bind)
+        cls.server_thread.start()
+
+        time.sleep(0.5)  # just a short nap for the bind.
+
+        # Simple client.
+        cls.client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        cls.client.connect(("127.0.0.1", PORT))
+
+        time.sleep(0.5)  # just a short nap for the connection.
+
+    def test_1_on_bind(self):
+        self.event_on_bind.assert_called_once_with(self.server._conn)
+
+    def test_2_on_join(self):
+        self.event_on_join.assert_called_once()
+
+    def test_3_on_message(self):
+        self.client.sendall(b"test\r\n")
+        time.sleep(0.5)  # a short nap for the message.
+        conn, message = self.event_on_message.call_args[0]
+        self.assertEqual(message, "test")
+
+        # Reply through the connection object given to the callbacks.
+        self.server.send((("127.0.0.1", 0), conn), "pong\r\n")
+        self.assertEqual(self.client.recv(1024), b"pong\r\n")
+
+    def test_4_asyncio_client(self):
+        received = threading.Event()
+        events = defaultdict(lambda: lambda *args: 0)
+        events[ConnectionEvent.ON_MESSAGE] = lambda conn, message: received.set()
+
+        client = AsyncioClient("127.0.0.1", PORT, Protocol.TCP, events)
+        client_thread = threading.Thread(target=client.connect)
+        client_thread.start()
+        time.sleep(0.5)  # a short nap for the connection.
+
+        conn = self.event_on_join.call_args[0][0]
+        self.server.send((("127.0.0.1", 0), conn), "hello\r\n")
+        self.assertTrue(received.wait(5))
+
+        client.shutdown()
+        client_thread.join(5)
+        self.assertFalse(client_thread.is_alive())
+
+    def test_5_on_disconnect(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server_thread.join(5)
+        self.assertFalse(self.server_thread.is_alive())
+        # Every client connection, then the server's.
+        self.assertEqual(self.event_on_disconnect.call_args, call(self.server._conn))
+        self.assertEqual(
+            self.event_on_disconnect.call_count, self.event_on_join.call_count + 1
+        )
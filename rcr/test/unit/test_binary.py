@@ -0,0 +1,45 @@
+"""Binary protocol module's unit tests."""
+import unittest
+
+from rcr.connection.binary import HEADER, Frame, FrameBuffer, encode_frame
+from rcr.exception import FrameTooLongError
+from rcr.type import Opcode
+
+
+class TestFrameBuffer(unittest.TestCase):
+    def test_encode(self):
+        data = encode_frame(Opcode.MSG, 7, 0, b"hi")
+        self.assertEqual(len(data), HEADER.size + 2)
+        self.assertEqual(FrameBuffer().feed(data), [Frame(Opcode.MSG, 7, 0, "hi")])
+
+    def test_split_frame(self):
+        data = encode_frame(Opcode.BROADCAST, 0, 3, "héllo".encode())
+        buffer = FrameBuffer()
+        self.assertEqual(buffer.feed(data[:5]), [])
+        self.assertEqual(buffer.feed(memoryview(data)[5:-1]), [])
+        self.assertEqual(buffer.feed(data[-1:]), [Frame(Opcode.BROADCAST, 0, 3, "héllo")])
+        self.assertEqual(len(buffer), 0)
+
+    def test_pipelined_frames(self):
+        data = encode_frame(Opcode.W) + encode_frame(Opcode.FIB, 2, 0, b"10")
+        buffer = FrameBuffer()
+        self.assertEqual(
+            buffer.feed(memoryview(data + data[:3])),
+            [Frame(Opcode.W, 0, 0, ""), Frame(Opcode.FIB, 2, 0, "10")],
+        )
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual(
+            buffer.feed(data[3:]), [Frame(Opcode.W, 0, 0, ""), Frame(Opcode.FIB, 2, 0, "10")]
+        )
+
+    def test_invalid_utf8(self):
+        frames = FrameBuffer().feed(encode_frame(Opcode.MSG, 1, 0, b"\xffhi"))
+        self.assertEqual(frames[0].payload, "�hi")
+
+    def test_max_payload_length(self):
+        buffer = FrameBuffer(max_payload_length=4)
+        self.assertEqual(len(buffer.feed(encode_frame(Opcode.MSG, 1, 0, b"1234"))), 1)
+        # The header is enough to reject a frame.
+        self.assertRaises(
+            FrameTooLongError, buffer.feed, encode_frame(Opcode.MSG, 1, 0, b"12345")[:HEADER.size]
+        )
@@ -1,4 +1,5 @@
 """Contact module's unit tests."""
+import threading
 import unittest
 
 from rcr.contact import Contact
@@ -43,3 +44,58 @@ class TestContact(unittest.TestCase):
 
     def test_8_list_after_new_add(self):
         self.assertEqual(self.contact.list(), [2, 3, 1, 4])
+
+    def test_9_get_by_connection(self):
+        self.assertEqual(self.contact.get_by_connection("connection12"), 4)
+        self.assertEqual(self.contact.get_by_connection("connection"), 3)
+        self.assertRaises(ValueError, self.contact.get_by_connection, "unknown")
+
+        self.assertTrue(self.contact.remove(4))
+        self.assertRaises(ValueError, self.contact.get_by_connection, "connection12")
+
+
+class TestContactConcurrency(unittest.TestCase):
+    def test_concurrent_join_leave(self):
+        contact = Contact(shards=4)
+        ids = []
+        ids_lock = threading.Lock()
+
+        def join_leave():
+            own = []
+            for i in range(500):
+                own.append(contact.add((("localhost", i), object())))
+                if i % 2:
+                    self.assertTrue(contact.remove(own.pop()))
+                contact.list()
+            with ids_lock:
+                ids.extend(own)
+
+        threads = [threading.Thread(target=join_leave) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(set(ids)), 1000)
+        self.assertEqual(sorted(contact.list()), sorted(ids))
+        for contact_id in ids:
+            self.assertEqual(contact.get_by_connection(contact.get(contact_id)[1]), contact_id)
+            self.assertTrue(contact.remove(contact_id))
+        self.assertEqual(contact.list(), [])
+
+
+class TestContactIds(unittest.TestCase):
+    def tearDown(self) -> None:
+        Contact.configure_ids()
+        return super().tearDown()
+
+    def test_interleaved_ids(self):
+        Contact.configure_ids(2, 3)
+        contact = Contact()
+        self.assertEqual([contact.add((("", i), i)) for i in range(3)], [2, 5, 8])
+
+        self.assertTrue(contact.remove(5))
+        self.assertEqual(contact.add((("", 3), 3)), 5)
+        self.assertEqual(contact.add((("", 4), 4)), 11)
+
+        self.assertRaises(ValueError, Contact.configure_ids, 4, 3)
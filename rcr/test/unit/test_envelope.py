@@ -0,0 +1,21 @@
+"""Actor message envelopes' unit tests."""
+import json
+import unittest
+
+from rcr.actor.envelope import Inbound, Outbound
+
+
+class TestEnvelope(unittest.TestCase):
+    def test_defaults(self):
+        message = Outbound(2, "hello")
+        self.assertEqual((message.sender_id, message.routed), (0, False))
+        self.assertFalse(Inbound(None, "w").deferred)
+
+    def test_no_instance_dict(self):
+        with self.assertRaises(AttributeError):
+            Outbound(2, "hello").extra = True
+
+    def test_routed(self):
+        # A worker sends the first three fields, the owner marks it as routed.
+        data = json.loads(json.dumps(Outbound(2, "hello", 1)[:3]))
+        self.assertEqual(Outbound(*data, routed=True), Outbound(2, "hello", 1, True))
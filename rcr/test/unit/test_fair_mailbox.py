@@ -0,0 +1,122 @@
+"""Fair actor mailbox unit tests."""
+import unittest
+
+from rcr.actor.fair_mailbox import FairMailbox
+from rcr.actor.mailbox import SHUTDOWN
+from rcr.type import MailboxPolicy
+
+
+def _mailbox(**kwargs) -> FairMailbox:
+    # Items are (key, text), texts starting with "fib" are expensive.
+    return FairMailbox(lambda item: item[0], lambda item: item[1].startswith("fib"), **kwargs)
+
+
+class TestFairMailbox(unittest.TestCase):
+    def test_round_robin(self):
+        mailbox = _mailbox()
+        for i in range(4):
+            mailbox.put(("a", "msg %d" % i))
+        mailbox.put(("b", "msg 0"))
+        mailbox.put(("c", "msg 0"))
+        self.assertEqual(
+            list(mailbox.get_batch()),
+            [("a", "msg 0"), ("b", "msg 0"), ("c", "msg 0")]
+            + [("a", "msg %d" % i) for i in range(1, 4)],
+        )
+        self.assertTrue(mailbox.empty())
+
+    def test_cheap_first(self):
+        mailbox = _mailbox(cheap_ratio=2)
+        for i in range(3):
+            mailbox.put(("a", "fib %d" % i))
+        for i in range(5):
+            mailbox.put(("b", "msg %d" % i))
+        self.assertEqual(
+            [text for _, text in mailbox.get_batch()],
+            ["msg 0", "msg 1", "fib 0", "msg 2", "msg 3", "fib 1", "msg 4", "fib 2"],
+        )
+
+    def test_key_order(self):
+        # A key's cheap message doesn't overtake its expensive one.
+        mailbox = _mailbox()
+        mailbox.put(("a", "fib 0"))
+        mailbox.put(("a", "msg 0"))
+        mailbox.put(("a", "fib 1"))
+        mailbox.put(("b", "msg 0"))
+        mailbox.put(("b", "msg 1"))
+        self.assertEqual(
+            list(mailbox.get_batch()),
+            [("b", "msg 0"), ("b", "msg 1"), ("a", "fib 0"), ("a", "msg 0"), ("a", "fib 1")],
+        )
+
+    def test_batch_size(self):
+        mailbox = _mailbox(batch_size=2)
+        for i in range(3):
+            mailbox.put(("a", "msg %d" % i))
+        self.assertEqual(len(mailbox.get_batch()), 2)
+        self.assertEqual(mailbox.qsize(), 1)
+
+    def test_close_after_pending(self):
+        mailbox = _mailbox(batch_size=2)
+        for i in range(3):
+            mailbox.put(("a", "msg %d" % i))
+        mailbox.close()
+        self.assertNotIn(SHUTDOWN, mailbox.get_batch())
+        self.assertEqual(list(mailbox.get_batch()), [("a", "msg 2"), SHUTDOWN])
+        self.assertEqual(len(mailbox.get_batch(timeout=0.01)), 0)
+
+    def test_drop_oldest_of_longest(self):
+        mailbox = _mailbox(maxsize=4, policy=MailboxPolicy.DROP_OLDEST)
+        mailbox.put(("b", "msg 0"))
+        for i in range(3):
+            mailbox.put(("a", "msg %d" % i))
+        self.assertTrue(mailbox.put(("c", "msg 0")))
+        self.assertEqual(mailbox.dropped, 1)
+        self.assertEqual(
+            list(mailbox.get_batch()),
+            [("b", "msg 0"), ("a", "msg 1"), ("c", "msg 0"), ("a", "msg 2")],
+        )
+
+    def test_reject(self):
+        mailbox = _mailbox(maxsize=1, policy=MailboxPolicy.REJECT)
+        self.assertTrue(mailbox.put(("a", "msg 0")))
+        self.assertFalse(mailbox.put(("b", "msg 0")))
+        self.assertTrue(mailbox.put(("b", "msg 0"), force=True))
+        self.assertEqual(mailbox.qsize(), 2)
+
+    def test_key_saturated_and_drain(self):
+        drained = []
+        mailbox = _mailbox(batch_size=1, key_high_water=4, on_drain=lambda: drained.append(1))
+        for i in range(4):
+            self.assertFalse(mailbox.saturated("a"))
+            mailbox.put(("a", "msg %d" % i))
+        mailbox.put(("b", "msg 0"))
+        self.assertTrue(mailbox.saturated("a"))
+        self.assertFalse(mailbox.saturated("b"))
+
+        # "a" has to be down to half of its high-water mark.
+        mailbox.get_batch()
+        mailbox.get_batch()
+        self.assertEqual(drained, [])
+        mailbox.get_batch()
+        self.assertEqual(drained, [1])
+        mailbox.get_batch()
+        self.assertEqual(drained, [1])
+
+    def test_stamping(self):
+        mailbox = _mailbox()
+        mailbox.put(("a", "msg 0"))
+        mailbox.set_stamping(True)
+        mailbox.put(("b", "msg 0"))
+        batch = mailbox.get_batch()
+        self.assertEqual(len(mailbox.batch_stamps), len(batch))
+        self.assertTrue(all(isinstance(stamp, float) for stamp in mailbox.batch_stamps))
+
+        mailbox.set_stamping(False)
+        mailbox.put(("a", "msg 1"))
+        mailbox.get_batch()
+        self.assertIsNone(mailbox.batch_stamps)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+"""Fetcher unit tests."""
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from rcr.exception import FetchError
+from rcr.fetcher import Fetcher
+
+PAGE = b"x" * 200000
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    requests = []
+
+    def do_GET(self):
+        Handler.requests.append((self.client_address, self.path))
+        path = self.path.split("?")[0]
+        if path == "/page":
+            self.reply(200, PAGE)
+        elif path == "/redirect":
+            self.reply(302, b"", {"Location": "/page"})
+        elif path == "/slow":
+            time.sleep(1)
+            self.reply(200, b"late")
+        elif path == "/drip":
+            # A byte at a time, each one within the socket timeout.
+            body = b"x" * 20
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            for i in range(len(body)):
+                self.wfile.write(body[i:i + 1])
+                self.wfile.flush()
+                time.sleep(0.1)
+        else:
+            self.reply(404, b"not found")
+
+    def reply(self, status, body, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # The slow page is written after the client has given up.
+        pass
+
+
+class TestFetcher(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = Server(("127.0.0.1", 0), Handler)
+        cls.server_thread = threading.Thread(target=cls.server.serve_forever)
+        cls.server_thread.start()
+        cls.base_url = "http://127.0.0.1:{}".format(cls.server.server_address[1])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.server_thread.join()
+
+    def setUp(self):
+        Handler.requests.clear()
+        self.fetcher = Fetcher(workers=2, timeout=0.5)
+
+    def tearDown(self):
+        self.fetcher.shutdown()
+
+    def test_size_and_keep_alive(self):
+        self.assertEqual(self.fetcher.submit(self.base_url + "/page").result(5), len(PAGE))
+        self.assertEqual(self.fetcher.submit(self.base_url + "/page?a=1").result(5), len(PAGE))
+        self.assertEqual(len(Handler.requests), 2)
+        self.assertEqual(Handler.requests[0][0], Handler.requests[1][0])
+
+    def test_cache(self):
+        self.fetcher.submit(self.base_url + "/page").result(5)
+        future = self.fetcher.submit(self.base_url + "/page")
+        self.assertTrue(future.done())
+        self.assertEqual(future.result(), len(PAGE))
+        self.assertEqual(len(Handler.requests), 1)
+
+        self.fetcher.cache_ttl = 0
+        self.fetcher.submit(self.base_url + "/page?b=1").result(5)
+        self.fetcher.submit(self.base_url + "/page?b=1").result(5)
+        self.assertEqual(len(Handler.requests), 3)
+
+    def test_redirect(self):
+        self.assertEqual(self.fetcher.submit(self.base_url + "/redirect").result(5), len(PAGE))
+        self.assertEqual([path for _, path in Handler.requests], ["/redirect", "/page"])
+
+    def test_errors(self):
+        self.assertRaises(ValueError, self.fetcher.submit, "ftp://127.0.0.1/")
+        self.assertRaises(ValueError, self.fetcher.submit, "not a url")
+        with self.assertRaises(FetchError):
+            self.fetcher.submit(self.base_url + "/missing").result(5)
+        with self.assertRaises(OSError):
+            self.fetcher.submit(self.base_url + "/slow").result(5)
+
+    def test_deadline(self):
+        self.fetcher.deadline = 0.6
+        started_at = time.monotonic()
+        with self.assertRaisesRegex(FetchError, "longer than 0.6 seconds"):
+            self.fetcher.submit(self.base_url + "/drip").result(5)
+        self.assertLess(time.monotonic() - started_at, 1.5)
+
+        self.fetcher.deadline = 5
+        self.assertEqual(self.fetcher.submit(self.base_url + "/drip?whole").result(5), 20)
+
+    def test_max_size(self):
+        self.fetcher.max_size = len(PAGE) - 1
+        with self.assertRaisesRegex(FetchError, "larger than"):
+            self.fetcher.submit(self.base_url + "/page").result(5)
+        self.fetcher.max_size = len(PAGE)
+        self.assertEqual(self.fetcher.submit(self.base_url + "/page?a=2").result(5), len(PAGE))
@@ -0,0 +1,36 @@
+"""Fibonacci service unit tests."""
+import unittest
+
+from rcr.fibonacci import Fibonacci, fib_fast_doubling, fib_linear
+
+
+class TestFibonacci(unittest.TestCase):
+    def test_implementations(self):
+        self.assertEqual([fib_linear(n) for n in range(10)], [0, 1, 1, 2, 3, 5, 8, 13, 21, 34])
+        for n in range(500):
+            self.assertEqual(fib_fast_doubling(n), fib_linear(n))
+
+    def test_inline_and_cache(self):
+        service = Fibonacci(cache_size=2)
+        future = service.submit(1000)
+        self.assertTrue(future.done())
+        self.assertEqual(future.result(), str(fib_linear(1000)))
+
+        service.submit(10)
+        service.submit(1000)
+        service.submit(20)
+        self.assertEqual(list(service._cache), [1000, 20])
+
+    def test_max_n(self):
+        service = Fibonacci(max_n=100)
+        self.assertRaises(ValueError, service.submit, 101)
+        self.assertRaises(ValueError, service.submit, -1)
+
+    def test_worker_pool(self):
+        service = Fibonacci(inline_max_n=10, workers=1)
+        try:
+            future = service.submit(30000)
+            self.assertEqual(future.result(timeout=30)[-10:], str(fib_linear(30000) % 10**10))
+            self.assertIn(30000, service._cache)
+        finally:
+            service.shutdown()
@@ -0,0 +1,31 @@
+"""Framing module's unit tests."""
+import unittest
+
+from rcr.connection.framing import LineBuffer
+from rcr.exception import FrameTooLongError
+
+
+class TestLineBuffer(unittest.TestCase):
+    def test_split_line(self):
+        buffer = LineBuffer()
+        self.assertEqual(buffer.feed(b"msg 1 hel"), [])
+        self.assertEqual(buffer.feed(b"lo\r"), [])
+        self.assertEqual(buffer.feed(b"\n"), [b"msg 1 hello"])
+        self.assertEqual(len(buffer), 0)
+
+    def test_pipelined_lines(self):
+        buffer = LineBuffer()
+        self.assertEqual(
+            buffer.feed(memoryview(b"w\r\nmsg 1 a\n\r\nbroadcast b\r\nfib")),
+            [b"w", b"msg 1 a", b"broadcast b"],
+        )
+        self.assertEqual(buffer.feed(b" 1 10\n"), [b"fib 1 10"])
+
+    def test_max_line_length(self):
+        buffer = LineBuffer(max_line_length=5)
+        self.assertEqual(buffer.feed(b"12345\r\n"), [b"12345"])
+        self.assertRaises(FrameTooLongError, buffer.feed, b"123456\n")
+
+        buffer = LineBuffer(max_line_length=5)
+        self.assertEqual(buffer.feed(b"12345\r"), [])
+        self.assertRaises(FrameTooLongError, buffer.feed, b"6")
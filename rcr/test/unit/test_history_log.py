@@ -0,0 +1,145 @@
+"""Chat history unit tests."""
+import os
+import tempfile
+import unittest
+
+from rcr.storage import HistoryEntry, HistoryLog
+
+
+class TestHistoryLog(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.now = 1000.0
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+        return super().tearDown()
+
+    def open(self, **kwargs) -> HistoryLog:
+        kwargs.setdefault("segment_size", 4096)
+        kwargs.setdefault("index_interval", 4)
+        history = HistoryLog(self.directory.name, clock=lambda: self.now, **kwargs)
+        for client_id in (1, 2, 3):
+            history.join(client_id)
+        return history
+
+    def fill(self, history: HistoryLog, count: int):
+        """Append messages among clients 1, 2 and 3, and broadcasts, a second apart."""
+        for i in range(count):
+            self.now = 1000.0 + i
+            sender_id, client_id = [(1, 2), (2, 1), (2, 3), (3, 0)][i % 4]
+            history.append(sender_id, client_id, "m{}".format(i))
+
+    def files(self, suffix: str):
+        return sorted(name for name in os.listdir(self.directory.name) if name.endswith(suffix))
+
+    def test_recent(self):
+        history = self.open()
+        self.fill(history, 10)
+        self.assertEqual(
+            history.recent(1, 3),
+            [
+                HistoryEntry(1007.0, 3, 0, "m7"),
+                HistoryEntry(1008.0, 1, 2, "m8"),
+                HistoryEntry(1009.0, 2, 1, "m9"),
+            ],
+        )
+        texts = [entry.text for entry in history.recent(3, 100)]
+        self.assertEqual(texts, ["m2", "m3", "m6", "m7"])
+        self.assertEqual(history.recent(1, 0), [])
+        history.close()
+
+    def test_conversation(self):
+        history = self.open()
+        self.fill(history, 300)
+        self.assertGreater(len(self.files(".seg")), 2)
+
+        texts = [entry.text for entry in history.conversation(2, 1, 1250)]
+        expected = ["m{}".format(i) for i in range(250, 300) if i % 4 in (0, 1)]
+        self.assertEqual(texts, expected)
+        self.assertEqual(len(list(history.conversation(3, 2, 0))), 75)
+        self.assertEqual(list(history.conversation(1, 3, 0)), [])
+        history.close()
+
+    def test_reused_id(self):
+        history = self.open()
+        self.fill(history, 8)
+        history.leave(2)
+        history.join(2)
+        # The new client 2 only gets broadcasts of the earlier messages.
+        self.assertEqual([entry.text for entry in history.recent(2, 100)], ["m3", "m7"])
+        self.assertEqual(list(history.conversation(2, 1, 0)), [])
+        self.assertEqual(len(list(history.conversation(1, 2, 0))), 4)
+
+        history.append(1, 2, "new")
+        self.assertEqual([entry.text for entry in history.recent(2, 100)], ["m3", "m7", "new"])
+        self.assertEqual([entry.text for entry in history.conversation(2, 1, 0)], ["new"])
+        history.leave(2)
+        self.assertEqual(list(history.conversation(2, 1, 0)), [])
+        history.close()
+
+    def test_survives_restart(self):
+        history = self.open()
+        self.fill(history, 300)
+        broadcasts = [entry for entry in history.recent(2, 1000) if not entry.client_id]
+        history.close()
+        # Full segments have a saved index, the active one is scanned.
+        self.assertEqual(len(self.files(".idx")), len(self.files(".seg")) - 1)
+
+        # Clients are new after a restart, they get the broadcasts only.
+        history = self.open()
+        self.assertEqual(len(broadcasts), 75)
+        self.assertEqual(history.recent(2, 1000), broadcasts)
+        self.assertEqual(list(history.conversation(1, 2, 0)), [])
+        self.now = 2000.0
+        history.append(1, 2, "after")
+        self.assertEqual(history.recent(1, 1), [HistoryEntry(2000.0, 1, 2, "after")])
+        self.assertEqual(len(list(history.conversation(2, 1, 0))), 1)
+        history.close()
+
+    def test_broken_index(self):
+        history = self.open()
+        self.fill(history, 300)
+        history.close()
+        with open(os.path.join(self.directory.name, self.files(".idx")[0]), "ab") as f:
+            f.write(b"x")
+
+        history = self.open()
+        self.assertEqual(len(history.recent(1, 1000)), 75)
+        history.close()
+
+    def test_retention(self):
+        history = self.open(max_segments=2)
+        self.fill(history, 300)
+        self.assertEqual(len(self.files(".seg")), 2)
+        self.assertEqual(len(self.files(".idx")), 1)
+        texts = [entry.text for entry in history.conversation(1, 2, 0)]
+        self.assertEqual(texts[-1], "m297")
+        self.assertNotIn("m0", texts)
+        history.close()
+
+    def test_clock_goes_back(self):
+        history = self.open()
+        history.append(1, 2, "first")
+        self.now = 900.0
+        history.append(2, 1, "second")
+        self.assertEqual(
+            [entry.created_at for entry in history.conversation(1, 2, 1000)], [1000.0, 1000.0]
+        )
+        history.close()
+
+    def test_errors(self):
+        history = self.open()
+        with self.assertRaises(ValueError):
+            history.append(1, 2, "x" * 4096)
+        history.close()
+        with self.assertRaises(ValueError):
+            history.append(1, 2, "closed")
+        self.assertEqual(history.recent(1, 10), [])
+        with self.assertRaises(ValueError):
+            self.open(segment_size=64)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+"""Connection liveness unit tests."""
+import unittest
+
+from rcr.connection.liveness import Liveness
+
+
+class TestLiveness(unittest.TestCase):
+    def test_disabled(self):
+        liveness = Liveness()
+        liveness.add("a", 0)
+        self.assertEqual(len(liveness), 0)
+        self.assertIsNone(liveness.next_deadline())
+
+    def test_idle_timeout(self):
+        liveness = Liveness(idle_timeout=10)
+        liveness.add("a", 0)
+        liveness.add("b", 1)
+        liveness.touch("a", 5)
+        self.assertEqual(liveness.next_deadline(), 10)
+        # "a" has been active, so it's only moved to its next deadline.
+        self.assertEqual(liveness.expire(10), ([], []))
+        self.assertEqual(liveness.expire(11), ([], ["b"]))
+        self.assertEqual(liveness.next_deadline(), 15)
+        self.assertEqual(liveness.expire(15), ([], ["a"]))
+        self.assertEqual(len(liveness), 0)
+
+    def test_ping(self):
+        liveness = Liveness(idle_timeout=10, ping_interval=4)
+        liveness.add("a", 0)
+        self.assertEqual(liveness.expire(4), (["a"], []))
+        self.assertEqual(liveness.expire(7), ([], []))
+        self.assertEqual(liveness.expire(8), (["a"], []))
+        liveness.touch("a", 9)
+        self.assertEqual(liveness.expire(12), ([], []))
+        self.assertEqual(liveness.expire(13), (["a"], []))
+        self.assertEqual(liveness.expire(19), ([], ["a"]))
+
+    def test_remove(self):
+        liveness = Liveness(ping_interval=1)
+        liveness.add("a", 0)
+        liveness.remove("a")
+        self.assertIsNone(liveness.next_deadline())
+
+        # A re-added connection has a single heap entry.
+        liveness.add("a", 0)
+        liveness.remove("a")
+        liveness.add("a", 0.5)
+        self.assertEqual(liveness.expire(2), (["a"], []))
@@ -0,0 +1,69 @@
+"""Logging pipeline unit tests."""
+import io
+import logging
+import os
+import queue
+import tempfile
+import unittest
+
+from rcr.log import (
+    BatchQueueListener,
+    BatchRotatingFileHandler,
+    BatchStreamHandler,
+    DroppingQueueHandler,
+)
+
+
+def record(text: str, level: int = logging.INFO) -> logging.LogRecord:
+    return logging.makeLogRecord({"msg": text, "levelno": level})
+
+
+class CountingStream(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.flushes = 0
+
+    def flush(self):
+        self.flushes += 1
+
+
+class TestPipeline(unittest.TestCase):
+    def test_drop_when_full(self):
+        handler = DroppingQueueHandler(queue.Queue(2))
+        for i in range(5):
+            handler.handle(record("line %d" % i))
+        self.assertEqual(handler.queue.qsize(), 2)
+        self.assertEqual(handler.dropped, 3)
+
+    def test_batch_single_flush(self):
+        stream = CountingStream()
+        sink = BatchStreamHandler(stream)
+        sink.setLevel(logging.INFO)
+        source = DroppingQueueHandler(queue.Queue(3))
+        for i in range(4):
+            source.handle(record("line %d" % i))
+        source.handle(record("debug", logging.DEBUG))
+        listener = BatchQueueListener(source.queue, sink, source=source)
+
+        listener.start()
+        listener.stop()
+
+        self.assertEqual(
+            stream.getvalue().splitlines(),
+            ["line 0", "line 1", "line 2", "2 log records have been dropped."],
+        )
+        self.assertEqual(stream.flushes, 1)
+
+    def test_rotating_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "rcr.log")
+            sink = BatchRotatingFileHandler(path, maxBytes=20, backupCount=2)
+            sink.emit_batch([record("line %d" % i) for i in range(5)])
+            sink.close()
+
+            with open(path) as f:
+                self.assertEqual(f.read(), "line 4\n")
+            with open(path + ".1") as f:
+                self.assertEqual(f.read(), "line 2\nline 3\n")
+            with open(path + ".2") as f:
+                self.assertEqual(f.read(), "line 0\nline 1\n")
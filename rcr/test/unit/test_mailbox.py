@@ -0,0 +1,110 @@
+"""Actor mailbox unit tests."""
+import threading
+import time
+import unittest
+
+from rcr.actor.mailbox import SHUTDOWN, Mailbox
+from rcr.type import MailboxPolicy
+
+
+class TestMailbox(unittest.TestCase):
+    def test_fifo_batch(self):
+        mailbox = Mailbox(batch_size=3)
+        for i in range(5):
+            mailbox.put(i)
+        self.assertEqual(list(mailbox.get_batch()), [0, 1, 2])
+        self.assertEqual(list(mailbox.get_batch()), [3, 4])
+        self.assertTrue(mailbox.empty())
+
+    def test_timeout(self):
+        mailbox = Mailbox()
+        self.assertEqual(len(mailbox.get_batch(timeout=0.01)), 0)
+
+    def test_wakeup(self):
+        mailbox = Mailbox()
+        received = []
+
+        def consumer():
+            received.extend(mailbox.get_batch(timeout=5))
+
+        thread = threading.Thread(target=consumer)
+        thread.start()
+        time.sleep(0.05)
+        started_at = time.monotonic()
+        mailbox.put("hello")
+        thread.join()
+        self.assertEqual(received, ["hello"])
+        self.assertLess(time.monotonic() - started_at, 0.05)
+
+    def test_close(self):
+        mailbox = Mailbox()
+        mailbox.put("last")
+        mailbox.close()
+        self.assertEqual(list(mailbox.get_batch()), ["last", SHUTDOWN])
+
+    def test_stamping(self):
+        mailbox = Mailbox(batch_size=2)
+        mailbox.put("before")
+        started_at = time.monotonic()
+        mailbox.set_stamping(True)
+        mailbox.put("after")
+        mailbox.put("last")
+        self.assertEqual(list(mailbox.get_batch()), ["before", "after"])
+        self.assertEqual(len(mailbox.batch_stamps), 2)
+        self.assertTrue(all(stamp >= started_at for stamp in mailbox.batch_stamps))
+        self.assertEqual(list(mailbox.get_batch()), ["last"])
+        self.assertEqual(len(mailbox.batch_stamps), 1)
+
+        mailbox.set_stamping(False)
+        mailbox.put("plain")
+        self.assertEqual(list(mailbox.get_batch()), ["plain"])
+        self.assertIsNone(mailbox.batch_stamps)
+
+    def test_reject(self):
+        mailbox = Mailbox(maxsize=2, policy=MailboxPolicy.REJECT)
+        self.assertTrue(mailbox.put(1))
+        self.assertTrue(mailbox.put(2))
+        self.assertFalse(mailbox.put(3))
+        self.assertTrue(mailbox.put(4, force=True))
+        self.assertEqual(list(mailbox.get_batch()), [1, 2, 4])
+        self.assertEqual(mailbox.dropped, 1)
+
+    def test_drop_oldest(self):
+        mailbox = Mailbox(maxsize=2, policy=MailboxPolicy.DROP_OLDEST)
+        for i in range(4):
+            self.assertTrue(mailbox.put(i))
+        self.assertEqual(list(mailbox.get_batch()), [2, 3])
+        self.assertEqual(mailbox.dropped, 2)
+
+    def test_block(self):
+        mailbox = Mailbox(maxsize=1)
+        mailbox.put(1)
+        thread = threading.Thread(target=mailbox.put, args=(2,))
+        thread.start()
+        time.sleep(0.05)
+        self.assertTrue(thread.is_alive())
+        self.assertEqual(list(mailbox.get_batch()), [1])
+        thread.join(5)
+        self.assertEqual(list(mailbox.get_batch()), [2])
+
+        # A closed mailbox doesn't keep producers waiting.
+        mailbox.put(3)
+        thread = threading.Thread(target=mailbox.put, args=(4,))
+        thread.start()
+        mailbox.close()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+
+    def test_saturated_and_drain(self):
+        drained = []
+        mailbox = Mailbox(batch_size=2, maxsize=8, on_drain=lambda: drained.append(True))
+        for i in range(5):
+            mailbox.put(i)
+            self.assertFalse(mailbox.saturated())
+        mailbox.put(5)
+        self.assertTrue(mailbox.saturated())
+
+        mailbox.get_batch()
+        self.assertEqual(drained, [])
+        mailbox.get_batch()
+        self.assertEqual(drained, [True])
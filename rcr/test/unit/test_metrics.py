@@ -0,0 +1,83 @@
+"""Metrics module's unit tests."""
+import threading
+import unittest
+import urllib.error
+import urllib.request
+
+from rcr.metrics import Registry, serve
+
+
+class TestRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_counter_threads(self):
+        counter = self.registry.counter("rcr_test_total", "Test counter.")
+
+        def work():
+            for _ in range(10000):
+                counter.inc()
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        counter.inc(5)
+        self.assertEqual(counter.value(), 40005)
+
+    def test_histogram(self):
+        histogram = self.registry.histogram("rcr_test_seconds", "Test.", buckets=(1, 2))
+        for value in (0.5, 1, 1.5, 3):
+            histogram.observe(value)
+        self.assertEqual(histogram.snapshot(), ([2, 3, 4], 6.0))
+
+    def test_labels(self):
+        family = self.registry.gauge("rcr_test_depth", "Test.", ("actor",))
+        family.labels("log", fn=lambda: 3)
+        self.assertIs(family.labels("log"), family.labels("log"))
+        with self.assertRaises(ValueError):
+            family.labels()
+        # Registering it again returns the same family.
+        self.assertIs(self.registry.gauge("rcr_test_depth", "Test.", ("actor",)), family)
+        with self.assertRaises(ValueError):
+            self.registry.counter("rcr_test_depth", "Test.")
+
+    def test_render(self):
+        self.registry.counter("rcr_test_total", "Test counter.").inc(2)
+        self.registry.histogram(
+            "rcr_test_seconds", "Test histogram.", ("command",), buckets=(0.5,)
+        ).labels('say "hi"').observe(0.25)
+        self.assertEqual(
+            self.registry.render(),
+            "# HELP rcr_test_total Test counter.\n"
+            "# TYPE rcr_test_total counter\n"
+            "rcr_test_total 2\n"
+            "# HELP rcr_test_seconds Test histogram.\n"
+            "# TYPE rcr_test_seconds histogram\n"
+            'rcr_test_seconds_bucket{command="say \\"hi\\"",le="0.5"} 1\n'
+            'rcr_test_seconds_bucket{command="say \\"hi\\"",le="+Inf"} 1\n'
+            'rcr_test_seconds_sum{command="say \\"hi\\""} 0.25\n'
+            'rcr_test_seconds_count{command="say \\"hi\\""} 1\n',
+        )
+        self.assertEqual(
+            self.registry.summary(),
+            [
+                "rcr_test_total 2",
+                'rcr_test_seconds_sum{command="say \\"hi\\""} 0.25',
+                'rcr_test_seconds_count{command="say \\"hi\\""} 1',
+            ],
+        )
+
+    def test_serve(self):
+        self.registry.gauge("rcr_test_clients", "Test.", fn=lambda: 7)
+        server = serve(self.registry, "127.0.0.1", 0)
+        try:
+            base = "http://127.0.0.1:{}".format(server.server_address[1])
+            with urllib.request.urlopen(base + "/metrics", timeout=5) as response:
+                self.assertIn(b"rcr_test_clients 7\n", response.read())
+            with self.assertRaises(urllib.error.HTTPError):
+                urllib.request.urlopen(base + "/", timeout=5)
+        finally:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,215 @@
+"""Offline message store unit tests."""
+import os
+import tempfile
+import unittest
+
+from rcr.exception import IdentityError
+from rcr.storage import OfflineStore, StoredMessage
+
+
+class TestOfflineStore(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.now = 1000.0
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+        return super().tearDown()
+
+    def open(self, **kwargs) -> OfflineStore:
+        kwargs.setdefault("segment_size", 4096)
+        store = OfflineStore(self.directory.name, clock=lambda: self.now, **kwargs)
+        store.token_iterations = 10
+        return store
+
+    @staticmethod
+    def offline(client_id: int) -> bool:
+        return False
+
+    def segments(self):
+        return sorted(os.listdir(self.directory.name))
+
+    def test_take(self):
+        store = self.open()
+        store.put("bob", 3, "hello")
+        store.put("amy", 4, "hi")
+        store.put("bob", 4, "world")
+        self.assertEqual(store.pending(), 3)
+        self.assertEqual(
+            store.take("bob"),
+            [StoredMessage(3, "hello", 1000.0), StoredMessage(4, "world", 1000.0)],
+        )
+        self.assertEqual(store.take("bob"), [])
+        self.assertEqual(store.pending(), 1)
+        store.close()
+
+    def test_survives_restart(self):
+        store = self.open()
+        store.put("bob", 3, "hello")
+        store.put("amy", 4, "hi")
+        store.take("amy")
+        store.close()
+
+        store = self.open()
+        self.assertEqual(store.pending(), 1)
+        self.assertEqual(store.take("amy"), [])
+        self.assertEqual([message.text for message in store.take("bob")], ["hello"])
+        store.close()
+
+        store = self.open()
+        self.assertEqual(store.pending(), 0)
+        store.close()
+
+    def test_retention(self):
+        store = self.open(max_messages=2, ttl=60)
+        for i in range(3):
+            store.put("bob", 3, str(i))
+        self.assertEqual(store.dropped, 1)
+        store.close()
+
+        store = self.open(max_messages=2, ttl=60)
+        self.assertEqual(store.pending("bob"), 2)
+        self.now += 30
+        store.put("bob", 3, "3")
+        self.now += 31
+        self.assertEqual([message.text for message in store.take("bob")], ["3"])
+        store.close()
+
+    def test_segments_are_collected_and_compacted(self):
+        store = self.open()
+        # A message which is never delivered pins its segment.
+        store.put("amy", 4, "pinned")
+        for i in range(500):
+            store.put("bob", 3, "x" * 100)
+            if i % 10 == 9:
+                self.assertEqual(len(store.take("bob")), 10)
+        self.assertLessEqual(len(self.segments()), 3)
+        store.close()
+
+        store = self.open()
+        self.assertEqual([message.text for message in store.take("amy")], ["pinned"])
+        self.assertEqual(store.pending(), 0)
+        store.close()
+
+    def test_interrupted_compaction(self):
+        store = self.open()
+        store.put("amy", 4, "pinned")
+        for _ in range(100):
+            store.put("bob", 3, "x" * 100)
+            store.take("bob")
+        # The segments before the compacted one have been deleted.
+        compacted = self.segments()[0]
+        self.assertNotEqual(compacted, "00000000.seg")
+        store.close()
+
+        # Leftovers of the segments which have been compacted.
+        with open(os.path.join(self.directory.name, "00000000.seg"), "wb") as f:
+            f.truncate(4096)
+        store = self.open()
+        self.assertEqual(self.segments()[0], compacted)
+        self.assertEqual(store.pending(), 1)
+        store.close()
+
+    def test_identities(self):
+        store = self.open()
+        store.claim(1, "bob", "bob-token", self.offline)
+        self.assertEqual(store.identity_of(1), "bob")
+        store.claim(2, "bob", "bob-token", self.offline)
+        self.assertIsNone(store.identity_of(1))
+        self.assertEqual(store.client_of("bob"), 2)
+        store.claim(2, "amy", "amy-token", self.offline)
+        self.assertIsNone(store.client_of("bob"))
+        store.release(2)
+        self.assertIsNone(store.identity_of(2))
+        self.assertIsNone(store.client_of("amy"))
+        store.close()
+
+    def test_bindings_survive_restart(self):
+        store = self.open()
+        store.claim(1, "bob", "bob-token", self.offline)
+        store.claim(2, "amy", "amy-token", self.offline)
+        store.claim(3, "amy", "amy-token", self.offline)
+        store.claim(4, "eve", "eve-token", self.offline)
+        store.release(4)
+        store.close()
+
+        store = self.open()
+        self.assertEqual(store.identity_of(1), "bob")
+        self.assertIsNone(store.identity_of(2))
+        self.assertEqual(store.client_of("amy"), 3)
+        self.assertIsNone(store.client_of("eve"))
+        self.assertTrue(store.known("eve"))
+        self.assertFalse(store.known("joe"))
+        store.release(1)
+        store.close()
+
+        # The file is compacted when the store is opened.
+        store = self.open()
+        self.assertIsNone(store.client_of("bob"))
+        with open(os.path.join(self.directory.name, "bindings")) as f:
+            self.assertEqual(f.read(), "3 amy\n")
+        store.close()
+
+    def test_claim(self):
+        store = self.open()
+        store.put("bob", 3, "hello")
+        self.assertEqual(
+            store.claim(1, "bob", "bob-token", self.offline),
+            [StoredMessage(3, "hello", 1000.0)],
+        )
+        store.put("bob", 3, "again")
+
+        # The online client keeps its identity, even against its token.
+        with self.assertRaisesRegex(IdentityError, "in use"):
+            store.claim(2, "bob", "bob-token", lambda client_id: client_id == 1)
+        with self.assertRaisesRegex(IdentityError, "wrong token"):
+            store.claim(2, "bob", "guess-guess", self.offline)
+        self.assertEqual(store.identity_of(1), "bob")
+        self.assertIsNone(store.identity_of(2))
+        self.assertEqual(store.pending("bob"), 1)
+        with self.assertRaises(ValueError):
+            store.claim(2, "bo b", "bob-token", self.offline)
+        store.close()
+
+        # Tokens survive a restart, and only their hash is kept.
+        with open(os.path.join(self.directory.name, "identities")) as f:
+            self.assertNotIn("bob-token", f.read())
+        store = self.open()
+        with self.assertRaisesRegex(IdentityError, "wrong token"):
+            store.claim(2, "bob", "guess-guess", self.offline)
+        messages = store.claim(2, "bob", "bob-token", self.offline)
+        self.assertEqual([message.text for message in messages], ["again"])
+        store.close()
+
+    def test_wrong_tokens_lock_identity(self):
+        store = self.open()
+        store.max_failures = 2
+        store.claim(1, "bob", "bob-token", self.offline)
+        for _ in range(2):
+            with self.assertRaisesRegex(IdentityError, "wrong token"):
+                store.claim(2, "bob", "guess-guess", self.offline)
+        # Even the right token is refused until the failures are old enough.
+        with self.assertRaisesRegex(IdentityError, "too many wrong tokens"):
+            store.claim(2, "bob", "bob-token", self.offline)
+        store.claim(2, "amy", "amy-token", self.offline)
+
+        self.now += store.failure_window + 1
+        store.claim(2, "bob", "bob-token", self.offline)
+        with self.assertRaisesRegex(IdentityError, "wrong token"):
+            store.claim(3, "bob", "guess-guess", self.offline)
+        store.close()
+
+    def test_too_long_or_closed(self):
+        store = self.open()
+        with self.assertRaises(ValueError):
+            store.put("bob", 3, "x" * 4096)
+        store.put("bob", 3, "hello")
+        store.close()
+        with self.assertRaises(ValueError):
+            store.put("bob", 3, "hello")
+        self.assertEqual(store.take("bob"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+"""Rate limiter unit tests."""
+import unittest
+
+from rcr.rate_limit import RateLimiter
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_burst_then_rate(self):
+        limiter = RateLimiter(rate=10, burst=3)
+        self.assertEqual([limiter.allow(1, 100.0) for _ in range(4)], [True, True, True, False])
+        # A token every 0.1 second.
+        self.assertFalse(limiter.allow(1, 100.05))
+        self.assertTrue(limiter.allow(1, 100.11))
+        self.assertFalse(limiter.allow(1, 100.12))
+
+    def test_keys_are_independent(self):
+        limiter = RateLimiter(rate=1, burst=1)
+        self.assertTrue(limiter.allow(1, 100.0))
+        self.assertFalse(limiter.allow(1, 100.0))
+        self.assertTrue(limiter.allow(2, 100.0))
+
+    def test_refill_is_capped(self):
+        limiter = RateLimiter(rate=10, burst=2)
+        limiter.allow(1, 100.0)
+        self.assertEqual([limiter.allow(1, 200.0) for _ in range(3)], [True, True, False])
+
+    def test_prune(self):
+        limiter = RateLimiter(rate=10, burst=2)
+        limiter.allow(1, 100.0)
+        limiter.allow(2, 100.5)
+        self.assertEqual(len(limiter), 2)
+        limiter.allow(3, 101.2)
+        self.assertEqual(len(limiter), 2)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            RateLimiter(rate=0, burst=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
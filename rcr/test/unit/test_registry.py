@@ -0,0 +1,105 @@
+"""Command registry unit tests."""
+import unittest
+
+from rcr.actor.command import Command
+from rcr.actor.registry import CLIENT_ID, TEXT, WORD, CommandRegistry
+from rcr.connection.binary import Frame
+from rcr.type import Opcode
+
+
+class TestCommandRegistry(unittest.TestCase):
+    def test_builtin_commands(self):
+        parse = Command.commands.parse
+        self.assertEqual(parse("msg 12 hello  there")[1], [12, "hello  there"])
+        self.assertEqual(parse("broadcast hi all")[1], ["hi all"])
+        self.assertEqual(parse("fib 3 1000")[1], [3, 1000])
+        self.assertEqual(parse("url 3 http://a/b c")[1], [3, "http://a/b c"])
+        self.assertEqual(parse("identify bob bob-secret")[1], ["bob", "bob-secret"])
+        self.assertEqual(parse("tell bob@home hi there")[1], ["bob@home", "hi there"])
+        self.assertEqual(parse("history 20")[1], [(20,)])
+        self.assertEqual(parse("history 3 1700000000")[1], [(3, 1700000000)])
+        self.assertEqual(parse("w")[1], [])
+        self.assertEqual(parse("w")[0].verb, "w")
+
+    def test_invalid_arguments(self):
+        parse = Command.commands.parse
+        for line in (
+            "msg",
+            "msg 1",
+            "msg x hi",
+            "msg  1 hi",
+            "msg 0 hi",
+            "msg 01 hi",
+            "fib 0 5",
+            "url 0 http://a/b",
+            "fib 1 -5",
+            "fib 1 5 6",
+            "w 1",
+            "history",
+            "history 1 x",
+            "history 1  2",
+            "identify bob",
+            "identify bob short",
+            "tell bob",
+            "tell bo/b hi",
+        ):
+            spec, args = parse(line)
+            self.assertIsNotNone(spec, line)
+            self.assertIsNone(args, line)
+
+    def test_unknown_verb(self):
+        self.assertEqual(Command.commands.parse("msgs 1 hi"), (None, None))
+        self.assertEqual(Command.commands.parse(""), (None, None))
+
+    def test_builtin_frames(self):
+        parse_frame = Command.commands.parse_frame
+        self.assertEqual(
+            parse_frame(Frame(Opcode.MSG, 12, 0, "hello  there"))[1], [12, "hello  there"]
+        )
+        self.assertEqual(parse_frame(Frame(Opcode.BROADCAST, 0, 0, "hi all"))[1], ["hi all"])
+        self.assertEqual(parse_frame(Frame(Opcode.FIB, 3, 0, "1000"))[1], [3, 1000])
+        self.assertEqual(parse_frame(Frame(Opcode.W, 0, 0, ""))[0].verb, "w")
+
+        for frame in (
+            Frame(Opcode.MSG, 1, 0, ""),
+            Frame(Opcode.MSG, 0, 0, "hi"),
+            Frame(Opcode.FIB, 0, 0, "5"),
+            Frame(Opcode.FIB, 1, 0, "-5"),
+            Frame(Opcode.W, 0, 0, "1"),
+        ):
+            spec, args = parse_frame(frame)
+            self.assertIsNotNone(spec, frame)
+            self.assertIsNone(args, frame)
+
+        self.assertEqual(parse_frame(Frame(Opcode.MESSAGE, 1, 0, "hi")), (None, None))
+
+    def test_is_expensive(self):
+        is_expensive = Command.commands.is_expensive
+        self.assertTrue(is_expensive("fib 1 30"))
+        self.assertTrue(is_expensive("url 1 http://example.com"))
+        self.assertTrue(is_expensive(Frame(Opcode.FIB, 1, 0, "30")))
+        self.assertTrue(is_expensive("history 10"))
+        self.assertTrue(is_expensive("identify bob bob-secret"))
+        for text in ("msg 1 hi", "w", "fibs 1 30", "", Frame(Opcode.MSG, 1, 0, "hi")):
+            self.assertFalse(is_expensive(text), text)
+
+    def test_register(self):
+        registry = CommandRegistry()
+
+        @registry.register("nick", ("name", WORD), usage="usage: nick <name>")
+        def nick(actor, sender_id, name):
+            return name
+
+        @registry.register("tell", ("client_id", CLIENT_ID), ("message", TEXT), opcode=100)
+        def tell(actor, sender_id, client_id, message):
+            return client_id, message
+
+        self.assertIn("nick", registry)
+        spec, args = registry.parse("nick bob")
+        self.assertEqual(spec.handler(None, 1, *args), "bob")
+        self.assertEqual(registry.parse("nick bob smith")[1], None)
+        self.assertEqual(spec.usage, "usage: nick <name>")
+        self.assertEqual(registry.parse("tell 2 hi\tthere")[1], [2, "hi\tthere"])
+        self.assertEqual([spec.verb for spec in registry], ["nick", "tell"])
+        self.assertEqual(registry.parse_frame(Frame(100, 2, 0, "hi"))[1], [2, "hi"])
+        self.assertEqual(registry.parse_frame(Frame(101, 2, 0, "hi")), (None, None))
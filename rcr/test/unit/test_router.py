@@ -0,0 +1,246 @@
+"""Router module's unit tests."""
+import hashlib
+import hmac
+import json
+import queue
+import tempfile
+import time
+import unittest
+
+from rcr.router import Router, cluster_addresses, unix_addresses
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class TestRouter(unittest.TestCase):
+    secret = ""
+
+    def addresses(self):
+        return unix_addresses(self.directory.name, "test", 2)
+
+    def router(self, slot, addresses):
+        return Router(
+            slot,
+            addresses,
+            self.delivered[slot].put,
+            lambda: self.members[slot],
+            self.secret,
+        )
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.members = [[1, 3], [2]]
+        self.delivered = [queue.Queue(), queue.Queue()]
+        addresses = self.addresses()
+        self.routers = [self.router(slot, addresses) for slot in range(2)]
+        for router in self.routers:
+            router.start()
+        self.assertTrue(wait_for(lambda: all(len(r._peers) == 1 for r in self.routers)))
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        for router in self.routers:
+            router.shutdown()
+        self.directory.cleanup()
+        return super().tearDown()
+
+    def test_owner(self):
+        self.assertEqual(self.routers[0].owner(1), 0)
+        self.assertEqual(self.routers[0].owner(4), 1)
+        self.assertTrue(self.routers[1].is_local(6))
+        self.assertFalse(self.routers[1].is_local(7))
+
+    def test_send(self):
+        data = [2, "hello", 1]
+        self.assertTrue(self.routers[0].send(2, data))
+        self.assertEqual(self.delivered[1].get(timeout=5), data)
+        self.assertTrue(self.delivered[0].empty())
+
+    def test_broadcast(self):
+        data = [0, "hi" * 100000, 2]
+        self.routers[1].broadcast(data)
+        self.assertEqual(self.delivered[0].get(timeout=5), data)
+
+    def test_members(self):
+        self.assertTrue(wait_for(lambda: self.routers[0].remote_snapshot() == (2,)))
+        self.assertTrue(wait_for(lambda: self.routers[1].remote_snapshot() == (1, 3)))
+
+        self.routers[1].join(4)
+        self.routers[0].leave(1)
+        self.assertTrue(wait_for(lambda: self.routers[0].remote_snapshot() == (2, 4)))
+        self.assertTrue(wait_for(lambda: self.routers[1].remote_snapshot() == (3,)))
+
+    def test_peer_restart(self):
+        addresses = self.routers[1].addresses
+        self.routers[1].shutdown()
+        self.assertTrue(wait_for(lambda: self.routers[0].remote_snapshot() == ()))
+
+        self.members[1] = [6]
+        self.routers[1] = self.router(1, addresses)
+        self.routers[1].start()
+        self.assertTrue(wait_for(lambda: self.routers[0].remote_snapshot() == (6,)))
+        self.assertTrue(
+            wait_for(lambda: self.routers[0].send(6, [6, "back", 0]))
+        )
+        self.assertEqual(self.delivered[1].get(timeout=5)[1], "back")
+
+    def fake_peer(self):
+        """Replace router 1 with a listening socket."""
+        address = self.routers[1].addresses[1]
+        self.routers[1].shutdown()
+        listener = Router._socket(address)
+        listener.bind(address)
+        listener.listen(4)
+        listener.settimeout(5)
+        return listener
+
+    def test_stalled_peer(self):
+        # A peer which accepts connections and never reads them.
+        with self.fake_peer() as listener:
+            router = self.routers[0]
+            router.send_queue_size = 1024 * 1024
+            # The connection to the old peer breaks and router 0 connects again.
+            conn, _ = listener.accept()
+            conn.sendall(b'{"op":"challenge","nonce":"n"}\n')
+            self.assertTrue(wait_for(lambda: router._peers))
+
+            data = [2, "x" * 64 * 1024, 1]
+            started_at = time.monotonic()
+            sent = [router.send(2, data) for _ in range(100)]
+            # Sending doesn't wait for the peer, which is dropped when it's too far behind.
+            self.assertLess(time.monotonic() - started_at, 1)
+            self.assertTrue(sent[0])
+            self.assertFalse(all(sent))
+            conn.close()
+
+    def sync(self, slot, ids, secret=None, nonce=None):
+        """Return a `sync` frame for the nonce of a challenge, as `intrude` takes it."""
+
+        def frame(challenge_nonce):
+            message = "{}:{}".format(nonce or challenge_nonce, slot).encode()
+            proof = hmac.new(
+                (self.secret if secret is None else secret).encode(), message, hashlib.sha256
+            ).hexdigest()
+            return self.frame(op="sync", slot=slot, proof=proof, ids=ids)
+
+        return frame
+
+    @staticmethod
+    def frame(**frame):
+        return json.dumps(frame).encode() + b"\n"
+
+    def intrude(self, *frames):
+        """Send frames to router 0 from a new connection, and wait until it's closed.
+
+        A frame can be a function of the nonce of the router's challenge.
+        """
+        address = self.routers[0].addresses[0]
+        with Router._socket(address) as intruder:
+            intruder.settimeout(5)
+            intruder.connect(address)
+            with intruder.makefile("rb") as reader:
+                challenge = json.loads(reader.readline())
+            self.assertEqual(challenge["op"], "challenge")
+            frames = [
+                frame(challenge["nonce"]) if callable(frame) else frame for frame in frames
+            ]
+            try:
+                intruder.sendall(b"".join(frames))
+                # The router closes the connection.
+                self.assertEqual(intruder.recv(1), b"")
+            except ConnectionError:
+                # It has been closed before all the frames have been sent.
+                pass
+
+    def test_malformed_frames(self):
+        self.assertTrue(wait_for(lambda: self.routers[0].remote_snapshot() == (2,)))
+        sync = self.sync(1, [2])
+        for frames in (
+            [b"not json\n"],
+            [b"[1, 2]\n"],
+            [b'{"op":"join"}\n'],
+            [sync, b"not json\n"],
+            [sync, b'{"op":"join"}\n'],
+            [sync, b'{"op":"join","id":"x"}\n'],
+            [sync, b'{"op":"deliver"}\n'],
+            [sync, b'{"op":"deliver","data":[1,"hi"]}\n'],
+            [sync, b'{"op":"deliver","data":{"client_id":1}}\n'],
+            [sync, self.sync(0, [])],
+            [self.sync(7, [])],
+            [self.sync(1, ["x"])],
+        ):
+            self.intrude(*frames)
+
+        # The router still serves its peer. Closing a connection which has
+        # claimed its slot drops their connections, so they connect again.
+        self.assertTrue(wait_for(lambda: self.routers[1].send(1, [1, "still there", 2])))
+        self.assertEqual(self.delivered[0].get(timeout=5), [1, "still there", 2])
+        self.assertTrue(self.delivered[0].empty())
+
+    def test_long_frame_before_sync(self):
+        self.intrude(b"x" * (Router.sync_frame_length + 1024))
+
+    def test_single_slot(self):
+        router = Router(0, ["unused"])
+        router.start()
+        self.assertTrue(router.is_local(5))
+        self.assertEqual(router.remote_snapshot(), ())
+        router.broadcast([0, "nobody", 0])
+        router.shutdown()
+
+
+class TestClusterRouter(TestRouter):
+    secret = "secret"
+
+    def addresses(self):
+        return cluster_addresses(["127.0.0.1:9210", "127.0.0.1:9220"])
+
+    def test_cluster_addresses(self):
+        self.assertEqual(
+            cluster_addresses(["10.0.0.1:9000", "10.0.0.2:9000"], 2),
+            [("10.0.0.1", 9000), ("10.0.0.1", 9001), ("10.0.0.2", 9000), ("10.0.0.2", 9001)],
+        )
+
+    def test_wrong_secret(self):
+        self.assertTrue(wait_for(lambda: self.routers[0].remote_snapshot() == (2,)))
+        for frame in (
+            b'{"op":"deliver","data":{"client_id":1,"text":"spam"}}\n',
+            self.sync(1, [], secret="wrong"),
+            self.sync(1, [], secret=""),
+            # A replayed answer to another challenge.
+            self.sync(1, [], nonce="0" * 32),
+            self.frame(op="sync", slot=1, proof=1, ids=[]),
+            # The secret itself isn't an answer.
+            self.frame(op="sync", slot=1, secret=self.secret, ids=[]),
+        ):
+            self.intrude(frame)
+        # A forged sync without the answer, followed by a message.
+        self.intrude(
+            b'{"op":"sync","slot":1,"ids":[]}\n', b'{"op":"deliver","data":[1,"forged",99]}\n'
+        )
+
+        self.assertTrue(self.delivered[0].empty())
+        self.assertEqual(self.routers[0].remote_snapshot(), (2,))
+
+    def test_challenge(self):
+        # The secret doesn't go over the wire, the proof answers this connection's nonce.
+        with self.fake_peer() as listener:
+            conn, _ = listener.accept()
+            with conn, conn.makefile("rb") as reader:
+                conn.sendall(self.frame(op="challenge", nonce="abc"))
+                line = reader.readline()
+        self.assertNotIn(self.secret.encode(), line)
+        self.assertEqual(json.loads(line), json.loads(self.sync(0, [1, 3])("abc")))
+
+    def test_empty_secret(self):
+        with self.assertRaises(ValueError):
+            Router(0, self.addresses())
+        with self.assertRaises(ValueError):
+            Router(0, self.addresses(), secret="")
@@ -0,0 +1,67 @@
+"""Storage segment unit tests."""
+import os
+import tempfile
+import unittest
+
+from rcr.storage.segment import HEADER, Segment
+
+
+class TestSegment(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "00000000.seg")
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+        return super().tearDown()
+
+    def test_append_and_read(self):
+        segment = Segment(self.path, 1024)
+        first = segment.append(1, 10.0, b"bob", b"hello")
+        second = segment.append(2, 11.0, b"bob", b"")
+        self.assertEqual(first, 0)
+        self.assertEqual(second, HEADER.size + 8)
+        self.assertEqual(segment.read(first), (1, 10.0, b"bob", b"hello"))
+        self.assertEqual(segment.read(second), (2, 11.0, b"bob", b""))
+        with self.assertRaises(ValueError):
+            segment.read(segment.end)
+        segment.close()
+
+    def test_reopen(self):
+        segment = Segment(self.path, 1024)
+        segment.append(1, 10.0, b"bob", b"hello")
+        end = segment.end
+        segment.close()
+
+        segment = Segment(self.path, 4096)
+        self.assertEqual(segment.size, 1024)
+        self.assertEqual(segment.end, end)
+        self.assertEqual([record.value for _, record in segment.scan()], [b"hello"])
+        segment.close()
+
+    def test_full(self):
+        segment = Segment(self.path, HEADER.size * 2 + 8)
+        self.assertIsNotNone(segment.append(1, 0.0, b"a", b"b"))
+        self.assertIsNone(segment.append(1, 0.0, b"abcd", b"efgh"))
+        self.assertIsNotNone(segment.append(1, 0.0, b"a", b"b"))
+        segment.close()
+
+    def test_torn_record(self):
+        segment = Segment(self.path, 1024)
+        segment.append(1, 10.0, b"bob", b"hello")
+        offset = segment.append(1, 11.0, b"bob", b"world")
+        segment.close()
+        # The process died while writing the second record.
+        with open(self.path, "r+b") as f:
+            f.seek(offset + HEADER.size + 5)
+            f.write(b"x")
+
+        segment = Segment(self.path, 1024)
+        self.assertEqual([record.value for _, record in segment.scan()], [b"hello"])
+        self.assertEqual(segment.end, offset)
+        segment.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
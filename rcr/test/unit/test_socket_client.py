@@ -20,6 +20,7 @@ shutdown = False
 # Echo server.
 def start_echo_server():
     with socket.socket(socket.AF_INET, Protocol.TCP.value) as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         sock.setblocking(False)
         sock.bind(("", PORT))
         sock.listen(1)
@@ -89,7 +90,7 @@ class TestSocketClient(unittest.TestCase):
         self.event_on_message.assert_called_once_with(self.client._conn, "test123")
 
     def test_4_on_disconnect(self):
-        self.client.shutdown = True
+        self.client.shutdown()
         self.client_thread.join()
         time.sleep(1)  # a short nap for the client to be stoped.
         self.event_on_disconnect.assert_called_once_with(self.client._conn)
@@ -4,10 +4,12 @@ import threading
 import time
 import unittest
 from collections import defaultdict
-from unittest.mock import Mock
+from unittest.mock import Mock, call
 
+from rcr.connection.binary import MAGIC, Frame, encode_frame
+from rcr.connection.socket_client import SocketClient
 from rcr.connection.socket_server import SocketServer
-from rcr.type import ConnectionEvent, Protocol
+from rcr.type import ConnectionEvent, Opcode, Protocol
 
 PORT = 9095
 
@@ -52,11 +54,223 @@ class TestSocketServer(unittest.TestCase):
     def test_3_on_message(self):
         self.client.sendall(b"test")
         time.sleep(1)  # a short nap for the message.
-        self.event_on_message.assert_called_once()
+        self.event_on_message.assert_not_called()
+
+        # A message is complete at its line break; pipelined lines are split.
+        self.client.sendall(b"123\r\nw\nmsg 1 hi\r\n")
+        time.sleep(1)  # a short nap for the message.
+        self.assertEqual(
+            [call[0][1] for call in self.event_on_message.call_args_list],
+            ["test123", "w", "msg 1 hi"],
+        )
 
     def test_4_on_disconnect(self):
         self.client.close()
-        self.server.shutdown = True
+        self.server.shutdown()
         self.server_thread.join()
         time.sleep(1)  # a short nap for the server to be stoped.
-        self.event_on_disconnect.assert_called_once_with(self.server._conn)
+        # The client's connection first, then the server's.
+        conn = self.event_on_join.call_args[0][0]
+        self.assertEqual(
+            self.event_on_disconnect.call_args_list, [call(conn), call(self.server._conn)]
+        )
+
+
+class TestSocketServerBackpressure(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = SocketServer(
+            "", PORT + 1, Protocol.TCP, None, send_high_water_mark=64 * 1024
+        )
+        cls.server_thread = threading.Thread(target=cls.server.bind)
+        cls.server_thread.start()
+
+        time.sleep(0.5)  # just a short nap for the bind.
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server_thread.join()
+
+    def connect(self):
+        client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        client.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        client.connect(("127.0.0.1", PORT + 1))
+        time.sleep(0.2)  # just a short nap for the connection.
+        return client, list(self.server._write_buffers)[-1]
+
+    def test_slow_consumer_is_disconnected(self):
+        slow_client, slow_conn = self.connect()
+        fast_client, fast_conn = self.connect()
+
+        # Kernel buffers absorb a few megabytes before anything is queued.
+        chunk = b"x" * 1024
+        for _ in range(64 * 1024):
+            if not self.server.send((None, slow_conn), chunk):
+                break
+        self.assertGreater(self.server.slow_consumers, 0)
+        self.assertLessEqual(self.server.queued_bytes, 64 * 1024)
+
+        # Other connections are not affected.
+        self.assertTrue(self.server.send((None, fast_conn), b"hello\r\n"))
+        self.assertEqual(fast_client.recv(1024), b"hello\r\n")
+
+        time.sleep(0.2)  # a short nap for the disconnection.
+        self.assertNotIn(slow_conn, self.server._write_buffers)
+        slow_client.close()
+        fast_client.close()
+
+    def test_send_many(self):
+        clients, conns = zip(*(self.connect() for _ in range(3)))
+        self.server.send_many([(None, conn) for conn in conns], "hi all\r\n")
+        for client in clients:
+            self.assertEqual(client.recv(1024), b"hi all\r\n")
+            client.close()
+
+
+class TestSocketServerBinary(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.joined = []
+        cls.messages = []
+        events = defaultdict(lambda: lambda *args: 0)
+        events.update(
+            {
+                ConnectionEvent.ON_JOIN: lambda conn, addr: cls.joined.append(conn),
+                ConnectionEvent.ON_MESSAGE: cls.echo,
+            }
+        )
+        cls.server = SocketServer("", PORT + 2, Protocol.TCP, events)
+        cls.server_thread = threading.Thread(target=cls.server.bind)
+        cls.server_thread.start()
+
+        time.sleep(0.5)  # just a short nap for the bind.
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server_thread.join()
+
+    def setUp(self) -> None:
+        self.joined.clear()
+        self.messages.clear()
+        return super().setUp()
+
+    @classmethod
+    def echo(cls, conn, message):
+        cls.messages.append(message)
+        if cls.server.is_binary(conn):
+            payload = message.payload.encode()
+            cls.server.send((None, conn), encode_frame(Opcode.MESSAGE, message.target, 1, payload))
+
+    def test_negotiation(self):
+        text_client = socket.create_connection(("127.0.0.1", PORT + 2))
+        binary_client = socket.create_connection(("127.0.0.1", PORT + 2))
+        binary_client.sendall(bytes((MAGIC,)) + encode_frame(Opcode.MSG, 5, 0, b"hi"))
+        time.sleep(0.2)  # a short nap for the negotiation.
+
+        self.assertEqual(len(self.joined), 2)
+        self.assertTrue(self.server.is_binary(self.joined[0]))
+        self.assertFalse(self.server.is_binary(self.joined[1]))
+        self.assertIn(Frame(Opcode.MSG, 5, 0, "hi"), self.messages)
+        self.assertEqual(binary_client.recv(1024), encode_frame(Opcode.MESSAGE, 5, 1, b"hi"))
+        text_client.close()
+        binary_client.close()
+
+    def test_binary_client(self):
+        frames = []
+        events = defaultdict(lambda: lambda *args: 0)
+        events[ConnectionEvent.ON_MESSAGE] = lambda conn, frame: frames.append(frame)
+        client = SocketClient("127.0.0.1", PORT + 2, Protocol.TCP, events, binary=True)
+        client_thread = threading.Thread(target=client.connect)
+        client_thread.start()
+        time.sleep(0.2)  # a short nap for the connection.
+
+        client.send_frame(Opcode.BROADCAST, 0, "hi all")
+        client.send_frame(Opcode.FIB, 3, b"10")
+        time.sleep(0.2)  # a short nap for the replies.
+        client.shutdown()
+        client_thread.join()
+
+        self.assertEqual(
+            frames,
+            [Frame(Opcode.MESSAGE, 0, 1, "hi all"), Frame(Opcode.MESSAGE, 3, 1, "10")],
+        )
+
+
+class TestSocketServerLiveness(unittest.TestCase):
+    def test_ping_and_idle_timeout(self):
+        disconnects = []
+        events = defaultdict(lambda: lambda *args: 0)
+        events[ConnectionEvent.ON_DISCONNECT] = disconnects.append
+        server = SocketServer(
+            "", PORT + 3, Protocol.TCP, events, idle_timeout=0.6, ping_interval=0.2
+        )
+        server_thread = threading.Thread(target=server.bind)
+        server_thread.start()
+        time.sleep(0.5)  # just a short nap for the bind.
+
+        text_client = socket.create_connection(("127.0.0.1", PORT + 3))
+        binary_client = socket.create_connection(("127.0.0.1", PORT + 3))
+        binary_client.sendall(bytes((MAGIC,)))
+        try:
+            text_client.settimeout(5)
+            binary_client.settimeout(5)
+            self.assertEqual(text_client.recv(1024), b"\r\n")
+            self.assertEqual(binary_client.recv(1024), encode_frame(Opcode.PING))
+
+            # An active connection stays, a quiet one is closed.
+            for _ in range(8):
+                text_client.sendall(b"\r\n")
+                time.sleep(0.1)
+            self.assertEqual(len(disconnects), 1)
+            while binary_client.recv(1024):
+                pass
+            time.sleep(0.8)
+            self.assertEqual(len(disconnects), 2)
+        finally:
+            text_client.close()
+            binary_client.close()
+            server.shutdown()
+            server_thread.join()
+
+
+class TestSocketServerPause(unittest.TestCase):
+    def test_pause_and_resume(self):
+        received = []
+        accepting = threading.Event()
+        accepting.set()
+
+        def on_message(conn, message):
+            received.append(message)
+            # A saturated consumer takes the message and asks for a pause.
+            return accepting.is_set() or len(received) < 3
+
+        events = defaultdict(lambda: lambda *args: 0)
+        events[ConnectionEvent.ON_MESSAGE] = on_message
+        server = SocketServer("", PORT + 4, Protocol.TCP, events)
+        server_thread = threading.Thread(target=server.bind)
+        server_thread.start()
+        time.sleep(0.5)  # just a short nap for the bind.
+
+        client = socket.create_connection(("127.0.0.1", PORT + 4))
+        try:
+            accepting.clear()
+            client.sendall(b"".join(b"line %d\r\n" % i for i in range(10)))
+            time.sleep(0.3)
+            # The rest of the lines wait, and the connection isn't read anymore.
+            self.assertEqual(received, ["line 0", "line 1", "line 2"])
+            client.sendall(b"more\r\n")
+            time.sleep(0.3)
+            self.assertEqual(len(received), 3)
+            self.assertEqual(len(server._paused), 1)
+
+            accepting.set()
+            server.resume_reading()
+            time.sleep(0.3)
+            self.assertEqual(received, ["line %d" % i for i in range(10)] + ["more"])
+            self.assertFalse(server._paused)
+        finally:
+            client.close()
+            server.shutdown()
+            server_thread.join()
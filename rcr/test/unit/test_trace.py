@@ -0,0 +1,100 @@
+"""Actor tracing unit tests."""
+import time
+import unittest
+from types import SimpleNamespace
+
+from rcr.actor.base import Base
+from rcr.actor.envelope import Outbound
+from rcr.actor.trace import Tracer
+from rcr.metrics import Registry
+
+
+def sleepy(seconds: float):
+    time.sleep(seconds)
+
+
+class Sleeper(Base):
+    def process(self, msg: str):
+        if msg == "slow" or isinstance(msg, Outbound):
+            sleepy(0.2)
+
+
+class TestTracer(unittest.TestCase):
+    def setUp(self) -> None:
+        self.registry = Registry()
+        self.tracer = Tracer(self.registry)
+        self.actor = Sleeper(SimpleNamespace(_metrics=self.registry, _tracer=self.tracer))
+        self.actor.start()
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.actor.shutdown()
+        self.actor._start_thread.join(5)
+        self.tracer.shutdown()
+        return super().tearDown()
+
+    def wait_idle(self):
+        deadline = time.monotonic() + 5
+        while (self.actor.inbox.qsize() or self.actor._trace.current) and (
+            time.monotonic() < deadline
+        ):
+            time.sleep(0.01)
+
+    def samples(self):
+        return "\n".join(self.registry.summary())
+
+    def test_off(self):
+        self.actor.inbox.put("fast")
+        self.wait_idle()
+        self.assertIsNone(self.actor.inbox.batch_stamps)
+        self.assertNotIn("rcr_actor_process_seconds_count", self.samples())
+
+    def test_slow_message(self):
+        self.tracer.set_threshold(0.05)
+        with self.assertLogs("actor", "WARNING") as logs:
+            self.actor.inbox.put("fast")
+            self.actor.inbox.put("slow")
+            self.wait_idle()
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("slow str on sleeper actor", logs.output[0])
+        # The stack has been sampled while the message was being processed.
+        self.assertIn("in sleepy", logs.output[0])
+
+        samples = self.samples()
+        self.assertIn('rcr_actor_process_seconds_count{actor="sleeper",message="str"} 2', samples)
+        self.assertIn(
+            'rcr_actor_queue_wait_seconds_count{actor="sleeper",message="str"} 2', samples
+        )
+        self.assertIn('rcr_actor_slow_messages_total{actor="sleeper"} 1', samples)
+
+    def test_message_text_isnt_logged(self):
+        self.tracer.set_threshold(0.05)
+        with self.assertLogs("actor", "WARNING") as logs:
+            self.actor.inbox.put(Outbound(3, "a secret", 5))
+            self.wait_idle()
+
+        self.assertIn("slow Outbound from client 5 on sleeper actor", logs.output[0])
+        self.assertNotIn("a secret", logs.output[0])
+
+    def test_toggle(self):
+        self.tracer.toggle(0.05)
+        self.assertEqual(self.tracer.threshold, 0.05)
+        self.tracer.toggle(0.05)
+        self.assertEqual(self.tracer.threshold, 0)
+
+    def test_switch_off(self):
+        self.tracer.set_threshold(0.05)
+        self.actor.inbox.put("fast")
+        self.wait_idle()
+        self.tracer.set_threshold(0)
+        self.actor.inbox.put("fast")
+        self.wait_idle()
+
+        self.assertIn(
+            'rcr_actor_process_seconds_count{actor="sleeper",message="str"} 1', self.samples()
+        )
+        self.assertIsNone(self.tracer._sampler)
+
+    def test_negative_threshold(self):
+        self.assertRaises(ValueError, self.tracer.set_threshold, -1)
@@ -0,0 +1,118 @@
+"""UDP server unit tests."""
+import socket
+import threading
+import time
+import unittest
+from collections import defaultdict
+from unittest.mock import Mock
+
+from rcr.connection.udp_client import UdpClient
+from rcr.connection.udp_server import UdpServer
+from rcr.type import ConnectionEvent, Protocol
+
+PORT = 9097
+
+
+def wait_for(condition, timeout: float = 5) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestUdpServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.joins = []
+        cls.messages = []
+        cls.disconnects = []
+        events = defaultdict(lambda: lambda *args: 0)
+        events.update(
+            {
+                ConnectionEvent.ON_JOIN: lambda conn, addr: cls.joins.append(addr),
+                ConnectionEvent.ON_MESSAGE: lambda conn, text: cls.messages.append((conn, text)),
+                ConnectionEvent.ON_DISCONNECT: cls.disconnects.append,
+            }
+        )
+        cls.server = UdpServer(
+            "127.0.0.1", PORT, Protocol.UDP, events, max_line_length=16, session_timeout=0.5
+        )
+        cls.server_thread = threading.Thread(target=cls.server.bind)
+        cls.server_thread.start()
+        time.sleep(0.2)  # just a short nap for the bind.
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server_thread.join()
+
+    def setUp(self):
+        del self.joins[:], self.messages[:], self.disconnects[:]
+        self.client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.client.settimeout(5)
+        self.client.connect(("127.0.0.1", PORT))
+        self.addr = self.client.getsockname()
+
+    def tearDown(self):
+        self.client.close()
+
+    def test_messages(self):
+        self.client.send(b"\r\n")
+        self.client.send(b"w\r\n")
+        self.client.send(b"x" * 17)
+        self.client.send(b"msg 1 hi")
+        self.assertTrue(wait_for(lambda: len(self.messages) == 2))
+        self.assertEqual(self.joins, [self.addr])
+        self.assertEqual(self.messages, [(self.addr, "w"), (self.addr, "msg 1 hi")])
+
+    def test_send(self):
+        self.client.send(b"\r\n")
+        self.assertTrue(wait_for(lambda: self.joins))
+        self.assertTrue(self.server.send((self.addr, self.addr), "hello\r\n"))
+        self.server.send_many([(self.addr, self.addr)] * 2, b"all\r\n")
+        self.assertEqual(
+            [self.client.recv(1024) for _ in range(3)], [b"hello\r\n", b"all\r\n", b"all\r\n"]
+        )
+
+    def test_expiry(self):
+        self.client.send(b"\r\n")
+        self.assertTrue(wait_for(lambda: self.joins))
+        # Keep-alives keep the session.
+        for _ in range(3):
+            time.sleep(0.3)
+            self.client.send(b"\r\n")
+        self.assertEqual(self.disconnects, [])
+        self.assertTrue(wait_for(lambda: self.disconnects == [self.addr]))
+
+        self.client.send(b"w")
+        self.assertTrue(wait_for(lambda: len(self.joins) == 2))
+
+
+class TestUdpClient(unittest.TestCase):
+    def test_receive(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        server.bind(("127.0.0.1", PORT + 1))
+        server.settimeout(5)
+
+        on_message = Mock()
+        events = defaultdict(lambda: lambda *args: 0)
+        events[ConnectionEvent.ON_MESSAGE] = on_message
+        client = UdpClient("127.0.0.1", PORT + 1, Protocol.UDP, events)
+        client_thread = threading.Thread(target=client.connect)
+        client_thread.start()
+        try:
+            # It joins with an empty line.
+            data, addr = server.recvfrom(1024)
+            self.assertEqual(data, b"\r\n")
+            server.sendto(b"Your client ID: 1\r\n", addr)
+            self.assertTrue(wait_for(lambda: on_message.called))
+            self.assertEqual(on_message.call_args[0][1], "Your client ID: 1")
+
+            client.send("w\r\n")
+            self.assertEqual(server.recv(1024), b"w\r\n")
+        finally:
+            client.shutdown()
+            client_thread.join()
+            server.close()
@@ -0,0 +1,57 @@
+"""Write buffer unit tests."""
+import socket
+import unittest
+
+from rcr.connection.write_buffer import WriteBuffer
+
+
+class TestWriteBuffer(unittest.TestCase):
+    def setUp(self):
+        self.reader, self.writer = socket.socketpair()
+        self.writer.setblocking(False)
+        self.reader.setblocking(False)
+
+    def tearDown(self):
+        self.reader.close()
+        self.writer.close()
+
+    def read_all(self) -> bytes:
+        data = b""
+        try:
+            while True:
+                chunk = self.reader.recv(65536)
+                if not chunk:
+                    break
+                data += chunk
+        except BlockingIOError:
+            pass
+        return data
+
+    def test_gathered_flush(self):
+        buffer = WriteBuffer()
+        with buffer.lock:
+            buffer.append(b"a\r\n")
+            buffer.append(b"")
+            buffer.append(b"bc\r\n")
+            self.assertEqual(buffer.size, 7)
+            self.assertTrue(buffer.flush(self.writer))
+        self.assertFalse(buffer)
+        self.assertEqual(buffer.size, 0)
+        self.assertEqual(self.read_all(), b"a\r\nbc\r\n")
+
+    def test_partial_flush(self):
+        payload = b"x" * (4 * 1024 * 1024)
+        buffer = WriteBuffer()
+        with buffer.lock:
+            buffer.append(payload)
+            buffer.append(b"end")
+            self.assertFalse(buffer.flush(self.writer))
+            self.assertTrue(0 < buffer.size < len(payload) + 3)
+
+        received = b""
+        while buffer:
+            received += self.read_all()
+            with buffer.lock:
+                buffer.flush(self.writer)
+        received += self.read_all()
+        self.assertEqual(received, payload + b"end")
@@ -1,5 +1,5 @@
 """List of custom types."""
-from enum import Enum
+from enum import Enum, IntEnum
 from socket import SOCK_DGRAM, SOCK_STREAM
 
 
@@ -15,6 +15,47 @@ class ConnectionEvent(Enum):
 
     ON_BIND = 1  # callback parameters: (socket object)
     ON_CONNECT = 2  # callback parameters: (socket object)
-    ON_DISCONNECT = 3  # callback parameters: (socket object)
+    ON_DISCONNECT = 3  # callback parameters: (socket object), a server's or a client's
     ON_JOIN = 4  # callback parameters: (socket object, address tuple)
-    ON_MESSAGE = 5  # callback parameters: (socket object, payload str)
+    # callback parameters: (socket object, payload str or binary Frame). It returns False to
+    # pause reading from the connection until the server's `resume_reading`.
+    ON_MESSAGE = 5
+
+
+class SlowConsumerPolicy(Enum):
+    """What a server does when a connection's outbound buffer is over its limit."""
+
+    DROP = 1  # drop the new message.
+    DISCONNECT = 2  # close the connection.
+
+
+class MailboxPolicy(Enum):
+    """What an actor mailbox does with a new message when it's full."""
+
+    BLOCK = 1  # wait for room.
+    DROP_OLDEST = 2  # drop the oldest message to make room.
+    REJECT = 3  # drop the new message.
+
+
+class RecordKind(IntEnum):
+    """Record kinds of storage segments (see `rcr.storage.segment`)."""
+
+    MESSAGE = 1  # key: recipient identity, value: a stored message.
+    DELIVERED = 2  # key: recipient identity, the messages before it have been delivered.
+    COMPACTED = 3  # the first record of a compacted segment, older segments are obsolete.
+    CHAT = 4  # value: a `msg` or `broadcast` of the chat history.
+
+
+class Opcode(IntEnum):
+    """Binary protocol opcodes (see `rcr.connection.binary`)."""
+
+    # Client commands, they are dispatched like their text verbs.
+    W = 1
+    MSG = 2  # target: recipient, payload: message.
+    BROADCAST = 3  # payload: message.
+    URL = 4  # target: recipient, payload: url.
+    FIB = 5  # target: recipient, payload: n.
+
+    # Server frames.
+    MESSAGE = 16  # target: recipient, sender: sender or 0 for replies, payload: text.
+    PING = 17  # keep-alive of a quiet connection, it can be ignored.